@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import json
+import heapq
 from datetime import date, datetime
+from functools import lru_cache
 import sqlite3
 from typing import Any
 
+import pandas as pd
 import streamlit as st
 
 from action_tracking.data.repositories import (
@@ -23,6 +25,9 @@ FIELD_LABELS = {
     "active": "Aktywny",
 }
 
+OPEN_ACTIONS_LIMIT = 200
+_CLOSED_STATUSES: frozenset[str] = frozenset({"done", "cancelled"})
+
 
 def _format_value(field: str, value: Any) -> str:
     if value is None:
@@ -33,44 +38,189 @@ def _format_value(field: str, value: Any) -> str:
 
 
 def _format_changes(event_type: str, changes: dict[str, Any]) -> str:
+    get_label = FIELD_LABELS.get
     if event_type == "UPDATE":
         parts = []
         for field, payload in changes.items():
-            label = FIELD_LABELS.get(field, field)
+            label = get_label(field, field)
             before = _format_value(field, payload.get("from"))
             after = _format_value(field, payload.get("to"))
             parts.append(f"{label}: {before} → {after}")
         return "; ".join(parts) if parts else "Brak zmian."
     parts = []
     for field, value in changes.items():
-        label = FIELD_LABELS.get(field, field)
+        label = get_label(field, field)
         parts.append(f"{label}: {_format_value(field, value)}")
     return "; ".join(parts) if parts else "Brak danych."
 
 
-def _format_project_type_counts(type_counts: dict[str, int]) -> str:
-    return " | ".join(
-        [
-            f"SL: {type_counts.get('SL', 0)}",
-            f"RL: {type_counts.get('RL', 0)}",
-            f"FL: {type_counts.get('FL', 0)}",
-            f"Other: {type_counts.get('Other', 0)}",
-        ]
+@lru_cache(maxsize=1024)
+def _format_project_type_counts(sl: int, rl: int, fl: int, other: int) -> str:
+    return f"SL: {sl} | RL: {rl} | FL: {fl} | Other: {other}"
+
+
+def _actions_frame(
+    actions: list[dict[str, Any]],
+    project_names: dict[str, Any],
+    date_field: str,
+    date_label: str,
+) -> pd.DataFrame:
+    titles: list[str] = []
+    project_labels: list[Any] = []
+    statuses: list[str] = []
+    due_dates: list[str] = []
+    dates: list[str] = []
+    for action in actions:
+        titles.append(action.get("title") or "—")
+        project_labels.append(
+            action.get("project_name") or project_names.get(action.get("project_id"), "—")
+        )
+        statuses.append(action.get("status") or "—")
+        due_dates.append(action.get("due_date") or "—")
+        dates.append(action.get(date_field) or "—")
+    return pd.DataFrame(
+        {
+            "Tytuł": titles,
+            "Projekt": project_labels,
+            "Status": statuses,
+            "Termin": due_dates,
+            date_label: dates,
+        }
     )
 
 
+@lru_cache(maxsize=4096)
 def _parse_date(value: Any) -> date | None:
-    if value in (None, ""):
+    if not value:
         return None
-    if isinstance(value, date):
+    if type(value) is date:
         return value
+    if isinstance(value, datetime):
+        return value.date()
+    text = value if isinstance(value, str) else str(value)
     try:
-        return date.fromisoformat(str(value))
+        if len(text) > 10:
+            return datetime.fromisoformat(text).date()
+        return date.fromisoformat(text)
     except ValueError:
-        try:
-            return datetime.fromisoformat(str(value)).date()
-        except ValueError:
-            return None
+        return None
+
+
+def _render_champion_form(
+    repo: ChampionRepository,
+    champions_by_id: dict[str, dict[str, Any]],
+    champion_labels: dict[str, str],
+    projects: list[dict[str, Any]],
+    project_names: dict[str, Any],
+) -> None:
+    st.subheader("Dodaj / Edytuj champion")
+    selected_id = st.selectbox(
+        "Wybierz championa do edycji",
+        ["(nowy)"] + list(champion_labels),
+        format_func=lambda cid: "(nowy)" if cid == "(nowy)" else champion_labels[cid],
+    )
+    editing = selected_id != "(nowy)"
+    selected = champions_by_id.get(selected_id) if editing else {}
+
+    assigned_default = repo.get_assigned_projects_with_fallback(selected_id) if editing else []
+    hire_date_value = None
+    if selected.get("hire_date"):
+        hire_date_value = date.fromisoformat(selected["hire_date"])
+
+    with st.form("champion_form"):
+        first_name = st.text_input("Imię", value=selected.get("first_name", ""))
+        last_name = st.text_input("Nazwisko", value=selected.get("last_name", ""))
+        email = st.text_input("Adres email", value=selected.get("email", "") or "")
+        no_hire_date = st.checkbox(
+            "Brak daty zatrudnienia",
+            value=hire_date_value is None,
+        )
+        hire_date = st.date_input(
+            "Data zatrudnienia",
+            value=hire_date_value or date.today(),
+            disabled=no_hire_date,
+        )
+        position = st.text_input("Stanowisko", value=selected.get("position", "") or "")
+        active = st.checkbox(
+            "Aktywny",
+            value=bool(selected.get("active", 1)),
+        )
+        assigned_projects = st.multiselect(
+            "Przypisane projekty",
+            options=[project["id"] for project in projects],
+            default=assigned_default,
+            format_func=lambda pid: project_names.get(pid, pid),
+        )
+        submitted = st.form_submit_button("Zapisz")
+
+    if submitted:
+        if not first_name.strip() or not last_name.strip():
+            st.error("Imię i nazwisko są wymagane.")
+        else:
+            payload = {
+                "first_name": first_name.strip(),
+                "last_name": last_name.strip(),
+                "email": email.strip() or None,
+                "hire_date": None if no_hire_date else hire_date.isoformat(),
+                "position": position.strip() or None,
+                "active": 1 if active else 0,
+            }
+            repo.save_with_assignments(
+                selected_id if editing else None,
+                payload,
+                assigned_projects,
+            )
+            if editing:
+                st.success("Champion zaktualizowany.")
+            else:
+                st.success("Champion dodany.")
+            st.rerun()
+
+
+def _render_changelog(repo: ChampionRepository) -> None:
+    st.subheader("Changelog")
+    with st.expander("Changelog", expanded=False):
+        changelog_entries = repo.list_changelog(limit=50)
+        if not changelog_entries:
+            st.caption("Brak wpisów w changelogu.")
+        for entry in changelog_entries:
+            # Repository already parsed changes_json and extracted names in SQL.
+            changes = entry.get("changes")
+            if not isinstance(changes, dict):
+                changes = {}
+            champion_name = " ".join(
+                [
+                    entry.get("first_name") or changes.get("first_name", ""),
+                    entry.get("last_name") or changes.get("last_name", ""),
+                ]
+            ).strip()
+            if not champion_name:
+                champion_name = entry.get("champion_id", "Nieznany champion")
+            st.markdown(
+                f"**{entry['event_at']}** · {entry['event_type']} · {champion_name}"
+            )
+            st.caption(_format_changes(entry["event_type"], changes))
+
+
+def _load_projects(
+    project_repo: ProjectRepository,
+) -> tuple[list[dict[str, Any]], dict[str, Any], dict[str, dict[str, Any]]]:
+    projects = project_repo.list_projects()
+    project_names: dict[str, Any] = {}
+    projects_by_id: dict[str, dict[str, Any]] = {}
+    for project in projects:
+        project_id = project["id"]
+        projects_by_id[project_id] = project
+        project_names[project_id] = project.get("name") or project_id
+    return projects, project_names, projects_by_id
+
+
+def _render_empty_state(repo: ChampionRepository, project_repo: ProjectRepository) -> None:
+    st.header("Champions")
+    st.caption("Brak championów. Dodaj pierwszego championa poniżej.")
+    projects, project_names, _ = _load_projects(project_repo)
+    _render_champion_form(repo, {}, {}, projects, project_names)
+    _render_changelog(repo)
 
 
 def render(con: sqlite3.Connection) -> None:
@@ -78,16 +228,25 @@ def render(con: sqlite3.Connection) -> None:
     project_repo = ProjectRepository(con)
     action_repo = ActionRepository(con)
 
-    projects = project_repo.list_projects()
-    project_names = {project["id"]: project.get("name") or project["id"] for project in projects}
-    projects_by_id = {project["id"]: project for project in projects}
-
     champions = repo.list_champions()
-    champions_by_id = {champion["id"]: champion for champion in champions}
+    if not champions:
+        _render_empty_state(repo, project_repo)
+        return
+
+    projects, project_names, projects_by_id = _load_projects(project_repo)
+
+    champions_by_id: dict[str, dict[str, Any]] = {}
+    champion_ids: list[str] = []
+    champion_labels: dict[str, str] = {}
+    for champion in champions:
+        champion_id = champion["id"]
+        champion_ids.append(champion_id)
+        champions_by_id[champion_id] = champion
+        champion_labels[champion_id] = f"{champion['first_name']} {champion['last_name']}"
 
     selected_focus = st.selectbox(
         "Wybierz championa",
-        ["(brak)"] + [champion["id"] for champion in champions],
+        ["(brak)"] + champion_ids,
         index=0,
         format_func=lambda cid: "(brak)"
         if cid == "(brak)"
@@ -123,11 +282,13 @@ def render(con: sqlite3.Connection) -> None:
             champion_id=selected_focus,
             is_draft=False,
         )
-        open_actions = [
-            action
-            for action in all_actions
-            if (action.get("status") or "").lower() not in {"done", "cancelled"}
-        ]
+        open_actions: list[dict[str, Any]] = []
+        closed_actions: list[dict[str, Any]] = []
+        for action in all_actions:
+            if (action.get("status") or "").lower() in _CLOSED_STATUSES:
+                closed_actions.append(action)
+            else:
+                open_actions.append(action)
         today = date.today()
 
         def _open_sort_key(action: dict[str, Any]) -> tuple[int, date]:
@@ -136,154 +297,84 @@ def render(con: sqlite3.Connection) -> None:
             created = _parse_date(action.get("created_at")) or date.max
             return (0 if is_overdue else 1, created)
 
-        open_actions_sorted = sorted(open_actions, key=_open_sort_key)
-        open_rows = []
-        for action in open_actions_sorted:
-            project_name = action.get("project_name") or project_names.get(
-                action.get("project_id"), "—"
-            )
-            open_rows.append(
-                {
-                    "Tytuł": action.get("title") or "—",
-                    "Projekt": project_name,
-                    "Status": action.get("status") or "—",
-                    "Termin": action.get("due_date") or "—",
-                    "Data utworzenia": action.get("created_at") or "—",
-                }
-            )
-        if open_rows:
+        # Sort key computed once per action; only the rendered window is ordered.
+        keyed_actions = [
+            (_open_sort_key(action), index, action)
+            for index, action in enumerate(open_actions)
+        ]
+        open_actions_sorted = [
+            action for _, _, action in heapq.nsmallest(OPEN_ACTIONS_LIMIT, keyed_actions)
+        ]
+        open_rows = _actions_frame(
+            open_actions_sorted, project_names, "created_at", "Data utworzenia"
+        )
+        if not open_rows.empty:
             st.dataframe(open_rows, use_container_width=True)
+            if len(open_actions) > OPEN_ACTIONS_LIMIT:
+                st.caption(
+                    f"Pokazano {OPEN_ACTIONS_LIMIT} z {len(open_actions)} otwartych akcji."
+                )
         else:
             st.caption("Brak otwartych akcji.")
 
         st.subheader("Akcje zamknięte")
         with st.expander("Akcje zamknięte", expanded=False):
-            closed_actions = [
-                action
-                for action in all_actions
-                if (action.get("status") or "").lower() in {"done", "cancelled"}
-            ]
-            closed_rows = []
-            for action in closed_actions:
-                project_name = action.get("project_name") or project_names.get(
-                    action.get("project_id"), "—"
-                )
-                closed_rows.append(
-                    {
-                        "Tytuł": action.get("title") or "—",
-                        "Projekt": project_name,
-                        "Status": action.get("status") or "—",
-                        "Termin": action.get("due_date") or "—",
-                        "Data zamknięcia": action.get("closed_at") or "—",
-                    }
-                )
-            if closed_rows:
+            closed_rows = _actions_frame(
+                closed_actions, project_names, "closed_at", "Data zamknięcia"
+            )
+            if not closed_rows.empty:
                 st.dataframe(closed_rows, use_container_width=True)
             else:
                 st.caption("Brak zamkniętych akcji.")
 
-    table_rows = []
+    type_counts_by_champion = repo.get_project_type_counts_bulk()
+    empty_type_counts = {"SL": 0, "RL": 0, "FL": 0, "Other": 0}
+    first_names: list[Any] = []
+    last_names: list[Any] = []
+    emails: list[Any] = []
+    hire_dates: list[Any] = []
+    positions: list[Any] = []
+    active_labels: list[str] = []
+    project_counts: list[int] = []
+    type_labels: list[str] = []
     for champion in champions:
-        assigned_ids = repo.get_assigned_projects_with_fallback(champion["id"])
-        assigned_projects = [projects_by_id[pid] for pid in assigned_ids if pid in projects_by_id]
-        type_counts = {"SL": 0, "RL": 0, "FL": 0, "Other": 0}
-        for project in assigned_projects:
-            raw_type = (project.get("type") or "").strip().upper()
-            if raw_type in {"SL", "RL", "FL"}:
-                type_counts[raw_type] += 1
-            else:
-                type_counts["Other"] += 1
-        table_rows.append(
-            {
-                "Imię": champion["first_name"],
-                "Nazwisko": champion["last_name"],
-                "Adres email": champion["email"],
-                "Data zatrudnienia": champion["hire_date"],
-                "Stanowisko": champion["position"],
-                "Aktywny": "Tak" if int(champion["active"]) == 1 else "Nie",
-                "Liczba projektów": len(assigned_ids),
-                "Typy projektów": _format_project_type_counts(type_counts),
-            }
+        type_counts = type_counts_by_champion.get(champion["id"], empty_type_counts)
+        first_names.append(champion["first_name"])
+        last_names.append(champion["last_name"])
+        emails.append(champion["email"])
+        hire_dates.append(champion["hire_date"])
+        positions.append(champion["position"])
+        active_labels.append("Tak" if int(champion["active"]) == 1 else "Nie")
+        project_counts.append(sum(type_counts.values()))
+        type_labels.append(
+            _format_project_type_counts(
+                type_counts["SL"], type_counts["RL"], type_counts["FL"], type_counts["Other"]
+            )
         )
+    table_rows = pd.DataFrame(
+        {
+            "Imię": first_names,
+            "Nazwisko": last_names,
+            "Adres email": emails,
+            "Data zatrudnienia": hire_dates,
+            "Stanowisko": positions,
+            "Aktywny": active_labels,
+            "Liczba projektów": project_counts,
+            "Typy projektów": type_labels,
+        }
+    )
 
     st.subheader("Lista championów")
     st.caption(f"Liczba championów: {len(champions)}")
     st.dataframe(table_rows, use_container_width=True)
 
-    st.subheader("Dodaj / Edytuj champion")
-    champion_options = ["(nowy)"] + [
-        champion["id"] for champion in champions
-    ]
-    selected_id = st.selectbox(
-        "Wybierz championa do edycji",
-        champion_options,
-        format_func=lambda cid: "(nowy)"
-        if cid == "(nowy)"
-        else f"{champions_by_id[cid]['first_name']} {champions_by_id[cid]['last_name']}",
-    )
-    editing = selected_id != "(nowy)"
-    selected = champions_by_id.get(selected_id) if editing else {}
-
-    assigned_default = repo.get_assigned_projects_with_fallback(selected_id) if editing else []
-    hire_date_value = None
-    if selected.get("hire_date"):
-        hire_date_value = date.fromisoformat(selected["hire_date"])
-
-    with st.form("champion_form"):
-        first_name = st.text_input("Imię", value=selected.get("first_name", ""))
-        last_name = st.text_input("Nazwisko", value=selected.get("last_name", ""))
-        email = st.text_input("Adres email", value=selected.get("email", "") or "")
-        no_hire_date = st.checkbox(
-            "Brak daty zatrudnienia",
-            value=hire_date_value is None,
-        )
-        hire_date = st.date_input(
-            "Data zatrudnienia",
-            value=hire_date_value or date.today(),
-            disabled=no_hire_date,
-        )
-        position = st.text_input("Stanowisko", value=selected.get("position", "") or "")
-        active = st.checkbox(
-            "Aktywny",
-            value=bool(selected.get("active", 1)),
-        )
-        assigned_projects = st.multiselect(
-            "Przypisane projekty",
-            options=[project["id"] for project in projects],
-            default=assigned_default,
-            format_func=lambda pid: project_names.get(pid, pid),
-        )
-        submitted = st.form_submit_button("Zapisz")
-
-    if submitted:
-        if not first_name.strip() or not last_name.strip():
-            st.error("Imię i nazwisko są wymagane.")
-        else:
-            payload = {
-                "first_name": first_name.strip(),
-                "last_name": last_name.strip(),
-                "email": email.strip() or None,
-                "hire_date": None if no_hire_date else hire_date.isoformat(),
-                "position": position.strip() or None,
-                "active": 1 if active else 0,
-            }
-            if editing:
-                repo.update_champion(selected_id, payload)
-                champion_id = selected_id
-                st.success("Champion zaktualizowany.")
-            else:
-                champion_id = repo.create_champion(payload)
-                st.success("Champion dodany.")
-            repo.set_assigned_projects(champion_id, assigned_projects)
-            st.rerun()
+    _render_champion_form(repo, champions_by_id, champion_labels, projects, project_names)
 
     st.subheader("Usuń championa")
     delete_id = st.selectbox(
         "Wybierz championa do usunięcia",
-        ["(brak)"] + [champion["id"] for champion in champions],
-        format_func=lambda cid: "(brak)"
-        if cid == "(brak)"
-        else f"{champions_by_id[cid]['first_name']} {champions_by_id[cid]['last_name']}",
+        ["(brak)"] + champion_ids,
+        format_func=lambda cid: "(brak)" if cid == "(brak)" else champion_labels[cid],
         key="delete_select",
     )
     confirm_delete = st.checkbox(
@@ -295,22 +386,4 @@ def render(con: sqlite3.Connection) -> None:
         st.success("Champion usunięty.")
         st.rerun()
 
-    st.subheader("Changelog")
-    with st.expander("Changelog", expanded=False):
-        changelog_entries = repo.list_changelog(limit=50)
-        if not changelog_entries:
-            st.caption("Brak wpisów w changelogu.")
-        for entry in changelog_entries:
-            changes = json.loads(entry["changes_json"])
-            champion_name = " ".join(
-                [
-                    entry.get("first_name") or changes.get("first_name", ""),
-                    entry.get("last_name") or changes.get("last_name", ""),
-                ]
-            ).strip()
-            if not champion_name:
-                champion_name = entry.get("champion_id", "Nieznany champion")
-            st.markdown(
-                f"**{entry['event_at']}** · {entry['event_type']} · {champion_name}"
-            )
-            st.caption(_format_changes(entry["event_type"], changes))
+    _render_changelog(repo)
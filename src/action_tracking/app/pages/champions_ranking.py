@@ -1,21 +1,31 @@
 from __future__ import annotations
 
 import sqlite3
-from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from statistics import median
+from datetime import date, timedelta
 from typing import Any
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint, run_read_queries
 from action_tracking.data.repositories import (
     ActionRepository,
     ChampionRepository,
     GlobalSettingsRepository,
+    RANKING_IMPACT_METRICS,
+    RANKING_UNASSIGNED_KEY,
     ProjectRepository,
     SettingsRepository,
 )
+from action_tracking.services.action_dates import parse_date_column
+from action_tracking.services.normalize import normalize_key
+
+try:
+    # shipped with streamlit; lets drilldown tables skip the pandas -> Arrow step
+    import pyarrow as pa  # type: ignore
+except Exception:  # pragma: no cover
+    pa = None
 
 DELIVERY_WEIGHT = 0.55
 IMPACT_WEIGHT = 0.45
@@ -34,195 +44,344 @@ TTC_PENALTY_CAP = 20
 MISSING_MANUAL_PENALTY_PER = 2
 MISSING_MANUAL_PENALTY_CAP = 20
 
+_TERMINAL_STATUSES = frozenset(("done", "cancelled"))
+
+# Rows shown per drilldown table (the widgets only display a few at a time).
+DRILLDOWN_LIMIT = 200
+
+
+_STATS_COLUMNS = [
+    "open_now",
+    "overdue_now",
+    "closed_in_window",
+    "closed_on_time",
+    "durations",
+    "impact_pln",
+    "impact_eur",
+    "missing_manual",
+    "missing_scope",
+]
+
+_RANKING_ROW_COLUMNS = [
+    "id",
+    "title",
+    "project_id",
+    "project_name",
+    "owner_champion_id",
+    "category",
+    "status",
+    "created_at",
+    "closed_at",
+    "due_date",
+    "manual_savings_amount",
+    "manual_savings_currency",
+    "effectiveness_metric",
+    "effectiveness_delta",
+]
+
+
+def _date_objects(values: pd.Series) -> pd.Series:
+    return values.dt.date.astype(object).where(values.notna(), None)
+
+
+def _parse_actions(
+    columns: list[str],
+    rows: list[tuple[Any, ...]],
+) -> tuple[pd.DataFrame, int]:
+    frame = pd.DataFrame.from_records(rows, columns=columns or _RANKING_ROW_COLUMNS)
+    frame = frame.reindex(columns=_RANKING_ROW_COLUMNS)
+    frame = frame.astype(object).where(frame.notna(), None)
+    created = parse_date_column(frame["created_at"])
+    valid = created.notna()
+    parsed = pd.DataFrame(
+        {
+            "action_id": frame["id"].fillna("").astype(str),
+            "title": frame["title"].fillna("").astype(str),
+            "project_id": frame["project_id"],
+            "project_name": frame["project_name"],
+            "champion_id": frame["owner_champion_id"],
+            "category": frame["category"],
+            "status": frame["status"].fillna("").astype(str),
+            "created": created,
+            "closed": parse_date_column(frame["closed_at"]),
+            "due": parse_date_column(frame["due_date"]),
+            "manual_savings_amount": frame["manual_savings_amount"],
+            "manual_savings_currency": frame["manual_savings_currency"],
+            "effectiveness_metric": frame["effectiveness_metric"],
+            "effectiveness_delta": frame["effectiveness_delta"],
+        }
+    )
+    return parsed.loc[valid].reset_index(drop=True), int((~valid).sum())
 
-@dataclass(frozen=True)
-class RankingAction:
-    action_id: str
-    title: str
-    project_id: str | None
-    project_name: str | None
-    champion_id: str | None
-    category: str | None
-    status: str
-    created: date
-    closed: date | None
-    due: date | None
-    manual_savings_amount: float | None
-    manual_savings_currency: str | None
-    effectiveness_metric: str | None
-    effectiveness_delta: float | None
-
-
-def _parse_date(value: Any) -> date | None:
-    if value in (None, ""):
-        return None
-    if isinstance(value, date) and not isinstance(value, datetime):
-        return value
-    if isinstance(value, datetime):
-        return value.date()
-    s = str(value)
-    try:
-        return date.fromisoformat(s)
-    except ValueError:
-        try:
-            return datetime.fromisoformat(s).date()
-        except ValueError:
-            return None
-
-
-def _parse_actions(rows: list[dict[str, Any]]) -> tuple[list[RankingAction], int]:
-    parsed: list[RankingAction] = []
-    issues = 0
-    for row in rows:
-        created = _parse_date(row.get("created_at"))
-        if created is None:
-            issues += 1
-            continue
-        parsed.append(
-            RankingAction(
-                action_id=str(row.get("id", "")),
-                title=str(row.get("title") or ""),
-                project_id=row.get("project_id"),
-                project_name=row.get("project_name"),
-                champion_id=row.get("owner_champion_id"),
-                category=row.get("category"),
-                status=str(row.get("status") or ""),
-                created=created,
-                closed=_parse_date(row.get("closed_at")),
-                due=_parse_date(row.get("due_date")),
-                manual_savings_amount=row.get("manual_savings_amount"),
-                manual_savings_currency=row.get("manual_savings_currency"),
-                effectiveness_metric=row.get("effectiveness_metric"),
-                effectiveness_delta=row.get("effectiveness_delta"),
-            )
+
+def _display_table(columns: dict[str, pd.Series]) -> Any:
+    """Drilldown table for st.dataframe; date columns are shown as plain dates."""
+    if pa is None:
+        return pd.DataFrame(
+            {
+                name: (
+                    _date_objects(values)
+                    if pd.api.types.is_datetime64_any_dtype(values)
+                    else values
+                ).to_numpy()
+                for name, values in columns.items()
+            }
         )
-    return parsed, issues
+    arrays = {}
+    for name, values in columns.items():
+        if pd.api.types.is_datetime64_any_dtype(values):
+            arrays[name] = pa.array(values).cast(pa.date32())
+        else:
+            arrays[name] = pa.array(values, from_pandas=True)
+    return pa.table(arrays)
 
 
-def _impact_delta_pln(action: RankingAction) -> float | None:
-    metric = action.effectiveness_metric
-    if metric not in {"scrap_cost", "scrap_pln", "scrap_cost_pln", "scrap_cost_amount"}:
+def _median_days(durations: list[int]) -> float | None:
+    if not durations:
         return None
-    delta = action.effectiveness_delta
-    if isinstance(delta, (int, float)):
-        return float(delta)
-    return None
+    return float(np.median(np.fromiter(durations, dtype=np.int64, count=len(durations))))
 
 
-def _clamp(value: float, lower: float = 0.0, upper: float = 100.0) -> float:
-    return max(lower, min(upper, value))
-
+def _category_rule_lookups(
+    rules_repo: GlobalSettingsRepository,
+) -> tuple[dict[str, str], dict[str, bool]]:
+    rules_map = rules_repo.get_category_rule_map()
+    savings_by_category = {
+        key: rule.get("savings_model") or "NONE" for key, rule in rules_map.items()
+    }
+    scope_by_category = {
+        key: bool(rule.get("requires_scope_link")) for key, rule in rules_map.items()
+    }
+    return savings_by_category, scope_by_category
+
+
+def _action_details(
+    actions: pd.DataFrame,
+    rules_repo: GlobalSettingsRepository,
+    date_from: date | None,
+    date_to: date | None,
+) -> pd.DataFrame:
+    savings_by_category, _ = _category_rule_lookups(rules_repo)
+    actions = actions.loc[actions["status"].ne("cancelled")]
+    savings_model = (
+        actions["category"].fillna("").map(normalize_key).map(savings_by_category).fillna("NONE")
+    )
 
-def _closed_in_window(action: RankingAction, date_from: date | None, date_to: date | None) -> bool:
-    if action.closed is None:
-        return False
-    if date_from and action.closed < date_from:
-        return False
-    if date_to and action.closed > date_to:
-        return False
-    return True
+    created = actions["created"]
+    closed = actions["closed"]
+    is_closed = closed.notna()
+    is_open = ~actions["status"].isin(_TERMINAL_STATUSES) & closed.isna()
+    if date_from:
+        start = pd.Timestamp(date_from)
+        is_closed &= closed >= start
+        is_open &= created >= start
+    if date_to:
+        end = pd.Timestamp(date_to)
+        is_closed &= closed <= end
+        is_open &= created <= end
+
+    auto_mask = is_closed & savings_model.eq("AUTO_SCRAP_COST")
+    manual_mask = is_closed & savings_model.eq("MANUAL_REQUIRED")
+
+    metric_ok = actions["effectiveness_metric"].isin(RANKING_IMPACT_METRICS)
+    auto_delta = pd.to_numeric(actions["effectiveness_delta"], errors="coerce")
+    impact_auto = (-auto_delta).clip(lower=0.0).where(metric_ok & auto_delta.notna(), 0.0)
+    manual_amount = pd.to_numeric(actions["manual_savings_amount"], errors="coerce")
+    manual_positive = manual_amount.clip(lower=0.0).fillna(0.0)
+    currency = actions["manual_savings_currency"].fillna("").astype(str).str.upper()
+    has_manual = manual_amount.notna()
+
+    impact_pln = impact_auto.where(auto_mask, 0.0)
+    impact_pln += manual_positive.where(manual_mask & has_manual & currency.eq("PLN"), 0.0)
+    impact_eur = manual_positive.where(manual_mask & has_manual & currency.eq("EUR"), 0.0)
+
+    details = pd.DataFrame(
+        {
+            "id": actions["action_id"],
+            "title": actions["title"],
+            "project_name": actions["project_name"],
+            "category": actions["category"],
+            "created": created,
+            "closed": closed,
+            "due": actions["due"],
+            "status": actions["status"],
+            "is_open": is_open,
+            "is_closed": is_closed,
+            "impact_pln": impact_pln,
+            "impact_eur": impact_eur,
+            "missing_manual": manual_mask & ~has_manual,
+        }
+    )
+    return details
 
 
-def _open_in_window(action: RankingAction, date_from: date | None, date_to: date | None) -> bool:
-    if action.status in {"done", "cancelled"} or action.closed is not None:
-        return False
-    if date_from and action.created < date_from:
-        return False
-    if date_to and action.created > date_to:
-        return False
-    return True
+def _delivery_score(
+    open_now: np.ndarray,
+    overdue_now: np.ndarray,
+    on_time_rate: np.ndarray,
+    median_ttc_days: np.ndarray,
+) -> np.ndarray:
+    overdue_penalty = np.minimum(OVERDUE_PENALTY_CAP, overdue_now * OVERDUE_PENALTY_PER)
+    open_penalty = np.minimum(
+        OPEN_PENALTY_CAP, np.maximum(0, open_now - OPEN_TOLERANCE) * OPEN_PENALTY_PER
+    )
+    on_time_bonus = np.clip(
+        (on_time_rate - ON_TIME_BASELINE) * 100, -ON_TIME_BONUS_CAP, ON_TIME_BONUS_CAP
+    )
+    ttc_value = np.nan_to_num(median_ttc_days, nan=0.0)
+    ttc_penalty = np.clip((ttc_value - TTC_BASELINE_DAYS) * TTC_PENALTY_PER_DAY, 0, TTC_PENALTY_CAP)
+    return np.clip(100 - overdue_penalty - open_penalty - ttc_penalty + on_time_bonus, 0, 100)
 
 
-def _delivery_score(
-    open_now: int,
-    overdue_now: int,
-    on_time_rate: float,
-    median_ttc_days: float | None,
-) -> float:
-    overdue_penalty = min(OVERDUE_PENALTY_CAP, overdue_now * OVERDUE_PENALTY_PER)
-    open_penalty = min(OPEN_PENALTY_CAP, max(0, open_now - OPEN_TOLERANCE) * OPEN_PENALTY_PER)
-    on_time_bonus = _clamp((on_time_rate - ON_TIME_BASELINE) * 100, -ON_TIME_BONUS_CAP, ON_TIME_BONUS_CAP)
-    ttc_value = median_ttc_days or 0.0
-    ttc_penalty = _clamp((ttc_value - TTC_BASELINE_DAYS) * TTC_PENALTY_PER_DAY, 0, TTC_PENALTY_CAP)
-    return _clamp(100 - overdue_penalty - open_penalty - ttc_penalty + on_time_bonus)
-
-
-def _impact_score(impact_pln: float, max_pln: float, missing_manual: int) -> float:
+def _impact_score(impact_pln: np.ndarray, max_pln: float, missing_manual: np.ndarray) -> np.ndarray:
     if max_pln <= 0:
-        base = 0.0
+        base = np.zeros_like(impact_pln, dtype=float)
     else:
         base = 100 * (impact_pln / max_pln)
-    missing_penalty = min(MISSING_MANUAL_PENALTY_CAP, missing_manual * MISSING_MANUAL_PENALTY_PER)
-    return _clamp(base - missing_penalty)
-
-
-def render(con: sqlite3.Connection) -> None:
-    st.title("Champions ranking")
-    st.caption("Transparentny ranking championów oparty o reguły kategorii i okna czasowe.")
-
-    action_repo = ActionRepository(con)
-    project_repo = ProjectRepository(con)
-    champion_repo = ChampionRepository(con)
-    settings_repo = SettingsRepository(con)
-    rules_repo = GlobalSettingsRepository(con)
-
-    today = date.today()
-
-    timeframe_options = {
-        "Last 90 days": 90,
-        "Last 180 days": 180,
-        "One year": 365,
-        "Total": None,
-    }
-
-    projects = project_repo.list_projects(include_counts=False)
-    champions = champion_repo.list_champions()
-
-    project_names = {p["id"]: (p.get("name") or p.get("project_name") or p["id"]) for p in projects}
-    champion_names = {c["id"]: (c.get("display_name") or c.get("name") or c["id"]) for c in champions}
-
-    active_rule_rows = rules_repo.get_category_rules(only_active=True)
-    active_categories = [row["category_label"] for row in active_rule_rows]
-    if not active_categories:
-        active_categories = [c["name"] for c in settings_repo.list_action_categories(active_only=True)]
-
-    st.subheader("Filters")
-    c1, c2, c3, c4 = st.columns([1.2, 1.4, 1.3, 1.1])
-    selected_timeframe = c1.selectbox("Timeframe", list(timeframe_options.keys()), index=0)
-    project_options = ["(All)"] + [p["id"] for p in projects]
-    category_options = ["(All)"] + active_categories
-    selected_project = c2.selectbox(
-        "Project",
-        project_options,
-        index=0,
-        format_func=lambda pid: pid if pid == "(All)" else project_names.get(pid, pid),
+    missing_penalty = np.minimum(
+        MISSING_MANUAL_PENALTY_CAP, missing_manual * MISSING_MANUAL_PENALTY_PER
     )
-    selected_category = c3.selectbox("Category", category_options, index=0)
-    include_unassigned = c4.checkbox("Include unassigned", value=False)
+    return np.clip(base - missing_penalty, 0, 100)
+
+
+def _compute_scores(
+    stats_df: pd.DataFrame,
+    on_time_rate: pd.Series,
+    median_ttc: pd.Series,
+    max_pln: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Delivery, impact and weighted total score arrays for all champions at once."""
+    delivery = _delivery_score(
+        stats_df["open_now"].to_numpy(dtype=float),
+        stats_df["overdue_now"].to_numpy(dtype=float),
+        on_time_rate.to_numpy(dtype=float),
+        median_ttc.to_numpy(dtype=float),
+    )
+    impact = _impact_score(
+        stats_df["impact_pln"].to_numpy(dtype=float),
+        max_pln,
+        stats_df["missing_manual"].to_numpy(dtype=float),
+    )
+    total = delivery * DELIVERY_WEIGHT
+    total += impact * IMPACT_WEIGHT
+    return delivery, impact, total
+
+
+def _leaderboard_frame(
+    champion_stats: dict[str, dict[str, Any]],
+    champion_names: dict[str, str],
+) -> pd.DataFrame:
+    stats_df = pd.DataFrame.from_dict(champion_stats, orient="index", columns=_STATS_COLUMNS)
+    max_pln = float(stats_df["impact_pln"].max()) if not stats_df.empty else 0.0
+    stats_df = stats_df.loc[
+        (stats_df["open_now"] > 0)
+        | (stats_df["overdue_now"] > 0)
+        | (stats_df["closed_in_window"] > 0)
+    ]
 
-    date_from: date | None
-    date_to: date | None
-    window_days = timeframe_options[selected_timeframe]
-    if window_days is None:
-        date_from = None
-        date_to = None
-    else:
-        date_to = today
-        date_from = today - timedelta(days=window_days)
+    closed_total = stats_df["closed_in_window"]
+    has_closed = closed_total > 0
+    on_time_rate = (stats_df["closed_on_time"] / closed_total.where(has_closed)).fillna(0.0)
+    median_ttc = pd.Series(
+        [_median_days(durations) for durations in stats_df["durations"]],
+        index=stats_df.index,
+        dtype="float64",
+    )
+    delivery_score, impact_score, total_score = _compute_scores(
+        stats_df, on_time_rate, median_ttc, max_pln
+    )
 
-    project_filter = None if selected_project == "(All)" else selected_project
-    category_filter = None if selected_category == "(All)" else selected_category
+    missing_scope = stats_df["missing_scope"]
+    scope_text = missing_scope.astype(str) + " missing scope"
+    scope_note = np.select(
+        [missing_scope >= 3, missing_scope > 0],
+        ["⚠️ " + scope_text, scope_text],
+        default="",
+    )
+    champion_keys = stats_df.index.to_series(index=stats_df.index)
+    labels = champion_keys.map(lambda key: champion_names.get(key, key)).where(
+        champion_keys.ne(RANKING_UNASSIGNED_KEY), "Unassigned"
+    )
 
-    ranking_rows = action_repo.list_actions_for_ranking(
+    leaderboard = pd.DataFrame(
+        {
+            "Champion": labels,
+            "Open now": stats_df["open_now"],
+            "Overdue now": stats_df["overdue_now"],
+            "Closed (window)": closed_total,
+            "On-time % (window)": (on_time_rate * 100).where(has_closed),
+            "Median TTC (days)": median_ttc,
+            "Impact PLN (window)": stats_df["impact_pln"],
+            "Impact EUR (window)": stats_df["impact_eur"],
+            "Delivery Score": delivery_score,
+            "Impact Score": impact_score,
+            "Total Score": total_score,
+            "Scope issues": scope_note,
+            "Champion key": champion_keys,
+        },
+        index=stats_df.index,
+    )
+    return leaderboard.round(
+        {
+            "On-time % (window)": 1,
+            "Median TTC (days)": 1,
+            "Impact PLN (window)": 2,
+            "Impact EUR (window)": 2,
+            "Delivery Score": 1,
+            "Impact Score": 1,
+            "Total Score": 1,
+        }
+    ).reset_index(drop=True)
+
+
+@st.cache_data(
+    show_spinner=False,
+    max_entries=16,
+    hash_funcs={sqlite3.Connection: lambda _: "sqlite"},
+)
+def _load_detail_actions(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    project_filter: str | None,
+    category_filter: str | None,
+    champion_id: str,
+) -> pd.DataFrame:
+    """
+    Parsed drilldown actions for one champion, independent of the timeframe:
+    window flags are applied afterwards by _action_details, so switching the
+    timeframe reuses the cached frame instead of re-querying and re-parsing.
+    """
+    columns, rows = ActionRepository(con).list_actions_for_ranking_columns(
         project_id=project_filter,
         category=category_filter,
-        date_from=date_from,
-        date_to=date_to,
+        champion_id=champion_id,
     )
-    ranking_actions, ranking_issues = _parse_actions(ranking_rows)
+    actions, _ = _parse_actions(columns, rows)
+    return actions
 
+
+@st.cache_data(
+    show_spinner=False,
+    max_entries=32,
+    hash_funcs={sqlite3.Connection: lambda _: "sqlite"},
+)
+def _compute_champion_stats(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    project_filter: str | None,
+    category_filter: str | None,
+    date_from: date | None,
+    date_to: date | None,
+    today: date,
+    include_unassigned: bool,
+) -> tuple[dict[str, dict[str, Any]], int]:
+    """
+    Per-champion ranking counters for one filter set.
+
+    Cached per filters; db_fingerprint changes on every committed write, so a
+    stale result is never served after the data changes.
+    """
     champion_stats: dict[str, dict[str, Any]] = {}
-    action_details: list[dict[str, Any]] = []
 
     def _ensure_stats(champion_key: str) -> dict[str, Any]:
         if champion_key not in champion_stats:
@@ -239,134 +398,60 @@ def render(con: sqlite3.Connection) -> None:
             }
         return champion_stats[champion_key]
 
-    for action in ranking_actions:
-        if action.status == "cancelled":
-            continue
-        if not include_unassigned and action.champion_id is None:
-            continue
-        champion_key = action.champion_id or "unassigned"
-        stats = _ensure_stats(champion_key)
-
-        rule = rules_repo.resolve_category_rule(action.category or "")
-        savings_model = (rule or {}).get("savings_model", "NONE")
-        requires_scope = bool((rule or {}).get("requires_scope_link"))
-
-        if requires_scope and not action.project_id:
-            stats["missing_scope"] += 1
-
-        is_open = _open_in_window(action, date_from, date_to)
-        is_closed = _closed_in_window(action, date_from, date_to)
-
-        impact_pln = 0.0
-        impact_eur = 0.0
-        missing_manual = False
-
-        if is_open:
-            stats["open_now"] += 1
-            if action.due and action.due < today:
-                stats["overdue_now"] += 1
-
-        if is_closed:
-            stats["closed_in_window"] += 1
-            if action.due is None or action.closed <= action.due:
-                stats["closed_on_time"] += 1
-            if action.closed and action.created:
-                stats["durations"].append((action.closed - action.created).days)
-
-            if savings_model == "AUTO_SCRAP_COST":
-                impact_delta = _impact_delta_pln(action)
-                if impact_delta is not None:
-                    impact_pln = max(0.0, -impact_delta)
-            elif savings_model == "MANUAL_REQUIRED":
-                manual_amount = action.manual_savings_amount
-                currency = (action.manual_savings_currency or "").upper()
-                if isinstance(manual_amount, (int, float)):
-                    if currency == "PLN":
-                        impact_pln = max(0.0, float(manual_amount))
-                    elif currency == "EUR":
-                        impact_eur = max(0.0, float(manual_amount))
-                else:
-                    missing_manual = True
-
-            stats["impact_pln"] += impact_pln
-            stats["impact_eur"] += impact_eur
-            if missing_manual:
-                stats["missing_manual"] += 1
-
-        action_details.append(
-            {
-                "champion_key": champion_key,
-                "id": action.action_id,
-                "title": action.title,
-                "project_name": action.project_name,
-                "category": action.category,
-                "created": action.created,
-                "closed": action.closed,
-                "due": action.due,
-                "status": action.status,
-                "is_open": is_open,
-                "is_closed": is_closed,
-                "impact_pln": impact_pln,
-                "impact_eur": impact_eur,
-                "missing_manual": missing_manual,
-            }
-        )
-
-    if include_unassigned and "unassigned" not in champion_stats:
-        _ensure_stats("unassigned")
-
-    max_pln = max((stats["impact_pln"] for stats in champion_stats.values()), default=0.0)
-
-    leaderboard_rows: list[dict[str, Any]] = []
-    for champion_id, stats in champion_stats.items():
-        if not (stats["open_now"] or stats["overdue_now"] or stats["closed_in_window"]):
-            continue
-
-        closed_total = stats["closed_in_window"]
-        on_time_rate = stats["closed_on_time"] / closed_total if closed_total else 0.0
-        median_ttc = float(median(stats["durations"])) if stats["durations"] else None
-
-        delivery_score = _delivery_score(
-            open_now=stats["open_now"],
-            overdue_now=stats["overdue_now"],
-            on_time_rate=on_time_rate,
-            median_ttc_days=median_ttc,
-        )
-        impact_score = _impact_score(stats["impact_pln"], max_pln, stats["missing_manual"])
-        total_score = round(DELIVERY_WEIGHT * delivery_score + IMPACT_WEIGHT * impact_score, 1)
-
-        label = (
-            "Unassigned"
-            if champion_id == "unassigned"
-            else champion_names.get(champion_id, champion_id)
-        )
-        scope_note = ""
-        if stats["missing_scope"] >= 3:
-            scope_note = f"⚠️ {stats['missing_scope']} missing scope"
-        elif stats["missing_scope"]:
-            scope_note = f"{stats['missing_scope']} missing scope"
-
-        leaderboard_rows.append(
-            {
-                "Champion": label,
-                "Open now": stats["open_now"],
-                "Overdue now": stats["overdue_now"],
-                "Closed (window)": stats["closed_in_window"],
-                "On-time % (window)": round(on_time_rate * 100, 1) if closed_total else None,
-                "Median TTC (days)": round(median_ttc, 1) if median_ttc is not None else None,
-                "Impact PLN (window)": round(stats["impact_pln"], 2),
-                "Impact EUR (window)": round(stats["impact_eur"], 2),
-                "Delivery Score": round(delivery_score, 1),
-                "Impact Score": round(impact_score, 1),
-                "Total Score": total_score,
-                "Scope issues": scope_note,
-                "Champion key": champion_id,
-                "Missing manual": stats["missing_manual"],
-                "On-time rate": on_time_rate,
-                "Median TTC raw": median_ttc,
-            }
-        )
-
+    rules_repo = GlobalSettingsRepository(con)
+    ranking_filters = {
+        "project_id": project_filter,
+        "category": category_filter,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    # Counters are aggregated in SQLite per (champion, category); only the
+    # category rule (savings model / scope requirement) is applied here.
+    aggregate_rows, duration_rows, ranking_issues = run_read_queries(
+        con,
+        ActionRepository,
+        (
+            lambda repo: repo.aggregate_for_ranking(
+                **ranking_filters,
+                today=today,
+                include_unassigned=include_unassigned,
+            ),
+            lambda repo: repo.list_ranking_durations(
+                **ranking_filters,
+                include_unassigned=include_unassigned,
+            ),
+            lambda repo: repo.count_ranking_invalid_created(**ranking_filters),
+        ),
+    )
+    savings_by_category, scope_by_category = _category_rule_lookups(rules_repo)
+    for row in aggregate_rows:
+        stats = _ensure_stats(row["champion_key"])
+        category_key = normalize_key(row["category"])
+        savings_model = savings_by_category.get(category_key, "NONE")
+        requires_scope = scope_by_category.get(category_key, False)
+
+        if requires_scope:
+            stats["missing_scope"] += row["without_project"]
+        stats["open_now"] += row["open_now"]
+        stats["overdue_now"] += row["overdue_now"]
+        stats["closed_in_window"] += row["closed_in_window"]
+        stats["closed_on_time"] += row["closed_on_time"]
+        if savings_model == "AUTO_SCRAP_COST":
+            stats["impact_pln"] += row["impact_pln_auto"]
+        elif savings_model == "MANUAL_REQUIRED":
+            stats["impact_pln"] += row["impact_pln_manual"]
+            stats["impact_eur"] += row["impact_eur_manual"]
+            stats["missing_manual"] += row["manual_missing"]
+
+    for champion_key, ttc_days in duration_rows:
+        _ensure_stats(champion_key)["durations"].append(ttc_days)
+
+    if include_unassigned and RANKING_UNASSIGNED_KEY not in champion_stats:
+        _ensure_stats(RANKING_UNASSIGNED_KEY)
+    return champion_stats, ranking_issues
+
+
+def _render_kpis(champion_stats: dict[str, dict[str, Any]], ranking_issues: int) -> None:
     st.subheader("KPI (overall)")
     total_open = sum(stats["open_now"] for stats in champion_stats.values())
     total_overdue = sum(stats["overdue_now"] for stats in champion_stats.values())
@@ -379,7 +464,7 @@ def render(con: sqlite3.Connection) -> None:
     total_impact_eur = sum(stats["impact_eur"] for stats in champion_stats.values())
 
     on_time_rate_total = total_on_time / total_closed if total_closed else 0.0
-    median_ttc_total = float(median(total_durations)) if total_durations else None
+    median_ttc_total = _median_days(total_durations)
 
     k1, k2, k3, k4, k5, k6 = st.columns(6)
     k1.metric("Open actions now", total_open)
@@ -395,6 +480,8 @@ def render(con: sqlite3.Connection) -> None:
     if ranking_issues:
         st.caption(f"Skipped {ranking_issues} actions with invalid created_at.")
 
+
+def _render_methodology(selected_timeframe: str) -> None:
     with st.expander("Show methodology", expanded=False):
         st.markdown(
             f"""
@@ -427,13 +514,90 @@ def render(con: sqlite3.Connection) -> None:
 """
         )
 
+
+def render(con: sqlite3.Connection) -> None:
+    st.title("Champions ranking")
+    st.caption("Transparentny ranking championów oparty o reguły kategorii i okna czasowe.")
+
+    project_repo = ProjectRepository(con)
+    champion_repo = ChampionRepository(con)
+    settings_repo = SettingsRepository(con)
+    rules_repo = GlobalSettingsRepository(con)
+
+    today = date.today()
+
+    timeframe_options = {
+        "Last 90 days": 90,
+        "Last 180 days": 180,
+        "One year": 365,
+        "Total": None,
+    }
+
+    projects = project_repo.list_projects(include_counts=False)
+    champions = champion_repo.list_champions()
+
+    project_names = {p["id"]: (p.get("name") or p.get("project_name") or p["id"]) for p in projects}
+    champion_names = {c["id"]: (c.get("display_name") or c.get("name") or c["id"]) for c in champions}
+
+    active_rule_rows = rules_repo.get_category_rules(only_active=True)
+    active_categories = [row["category_label"] for row in active_rule_rows]
+    if not active_categories:
+        active_categories = [c["name"] for c in settings_repo.list_action_categories(active_only=True)]
+
+    st.subheader("Filters")
+    c1, c2, c3, c4 = st.columns([1.2, 1.4, 1.3, 1.1])
+    selected_timeframe = c1.selectbox("Timeframe", list(timeframe_options.keys()), index=0)
+    project_options = ["(All)"] + [p["id"] for p in projects]
+    project_option_labels = {"(All)": "(All)", **project_names}
+    category_options = ["(All)"] + active_categories
+    selected_project = c2.selectbox(
+        "Project",
+        project_options,
+        index=0,
+        format_func=project_option_labels.__getitem__,
+    )
+    selected_category = c3.selectbox("Category", category_options, index=0)
+    include_unassigned = c4.checkbox("Include unassigned", value=False)
+
+    date_from: date | None
+    date_to: date | None
+    window_days = timeframe_options[selected_timeframe]
+    if window_days is None:
+        date_from = None
+        date_to = None
+    else:
+        date_to = today
+        date_from = today - timedelta(days=window_days)
+
+    project_filter = None if selected_project == "(All)" else selected_project
+    category_filter = None if selected_category == "(All)" else selected_category
+
+    champion_stats, ranking_issues = _compute_champion_stats(
+        con,
+        database_fingerprint(con),
+        project_filter,
+        category_filter,
+        date_from,
+        date_to,
+        today,
+        include_unassigned,
+    )
+
+    if not champion_stats:
+        st.info("No ranking data for selected filters.")
+        return
+
+    leaderboard_df = _leaderboard_frame(champion_stats, champion_names)
+
+    _render_kpis(champion_stats, ranking_issues)
+    _render_methodology(selected_timeframe)
+
     st.subheader("Leaderboard")
-    if leaderboard_rows:
-        leaderboard_df = pd.DataFrame(leaderboard_rows)
-        leaderboard_df = leaderboard_df.sort_values("Total Score", ascending=False)
-        leaderboard_df.insert(0, "Rank", range(1, len(leaderboard_df) + 1))
+    if not leaderboard_df.empty:
+        ranked_df = leaderboard_df.sort_values("Total Score", ascending=False)
+        ranked_df.insert(0, "Rank", range(1, len(ranked_df) + 1))
         st.dataframe(
-            leaderboard_df[
+            ranked_df[
                 [
                     "Rank",
                     "Champion",
@@ -457,25 +621,21 @@ def render(con: sqlite3.Connection) -> None:
         st.info("No ranking data for selected filters.")
 
     st.subheader("Drilldown")
-    if not leaderboard_rows:
+    if leaderboard_df.empty:
         st.info("Select a champion once data is available.")
         return
 
-    champion_keys = [row["Champion key"] for row in leaderboard_rows]
-    default_key = champion_keys[0] if champion_keys else "unassigned"
+    champion_keys = leaderboard_df["Champion key"].tolist()
+    champion_option_labels = dict(zip(champion_keys, leaderboard_df["Champion"]))
     selected_champion = st.selectbox(
         "Champion to inspect",
         champion_keys,
         index=0,
-        format_func=lambda cid: "Unassigned" if cid == "unassigned" else champion_names.get(cid, cid),
+        format_func=champion_option_labels.__getitem__,
     )
 
     selected_stats = champion_stats.get(selected_champion, {})
-    selected_label = (
-        "Unassigned"
-        if selected_champion == "unassigned"
-        else champion_names.get(selected_champion, selected_champion)
-    )
+    selected_label = champion_option_labels[selected_champion]
 
     if selected_stats:
         st.markdown(
@@ -489,79 +649,70 @@ def render(con: sqlite3.Connection) -> None:
 """
         )
 
-    champ_actions = [a for a in action_details if a["champion_key"] == selected_champion]
-    impact_actions = [
-        a
-        for a in champ_actions
-        if a["is_closed"] and a["impact_pln"] > 0
-    ]
-    impact_actions.sort(key=lambda a: abs(a["impact_pln"]), reverse=True)
-
-    overdue_actions = [
-        a
-        for a in champ_actions
-        if a["is_open"] and a["due"] is not None and a["due"] < today
-    ]
-    for action in overdue_actions:
-        action["days_overdue"] = (today - action["due"]).days
-    overdue_actions.sort(key=lambda a: a.get("days_overdue", 0), reverse=True)
-
-    closed_actions = [a for a in champ_actions if a["is_closed"]]
-    closed_actions.sort(key=lambda a: a["closed"] or date.min, reverse=True)
+    detail_actions = _load_detail_actions(
+        con,
+        database_fingerprint(con),
+        project_filter,
+        category_filter,
+        selected_champion,
+    )
+    details = _action_details(detail_actions, rules_repo, date_from, date_to)
+    closed_details = details.loc[details["is_closed"]]
+    today_ts = pd.Timestamp(today)
 
     st.markdown("**Top impact actions**")
-    if impact_actions:
-        impact_df = pd.DataFrame(
-            [
-                {
-                    "Action ID": a["id"],
-                    "Title": a["title"],
-                    "Category": a["category"],
-                    "Project": a["project_name"],
-                    "Closed at": a["closed"],
-                    "Savings PLN": round(a["impact_pln"], 2),
-                }
-                for a in impact_actions
-            ]
+    impact_view = closed_details.loc[closed_details["impact_pln"] > 0].nlargest(
+        DRILLDOWN_LIMIT, "impact_pln"
+    )
+    if not impact_view.empty:
+        impact_df = _display_table(
+            {
+                "Action ID": impact_view["id"],
+                "Title": impact_view["title"],
+                "Category": impact_view["category"],
+                "Project": impact_view["project_name"],
+                "Closed at": impact_view["closed"],
+                "Savings PLN": impact_view["impact_pln"].round(2),
+            }
         )
         st.dataframe(impact_df, use_container_width=True, height=260)
     else:
         st.caption("No closed actions with PLN impact in the selected window.")
 
     st.markdown("**Worst / risk actions (overdue open)**")
-    if overdue_actions:
-        overdue_df = pd.DataFrame(
-            [
-                {
-                    "Action ID": a["id"],
-                    "Title": a["title"],
-                    "Category": a["category"],
-                    "Project": a["project_name"],
-                    "Due date": a["due"],
-                    "Days overdue": a.get("days_overdue", 0),
-                }
-                for a in overdue_actions
-            ]
+    overdue_view = details.loc[details["is_open"] & (details["due"] < today_ts)]
+    overdue_view = overdue_view.assign(
+        days_overdue=(today_ts - overdue_view["due"]).dt.days
+    ).nlargest(DRILLDOWN_LIMIT, "days_overdue")
+    if not overdue_view.empty:
+        overdue_df = _display_table(
+            {
+                "Action ID": overdue_view["id"],
+                "Title": overdue_view["title"],
+                "Category": overdue_view["category"],
+                "Project": overdue_view["project_name"],
+                "Due date": overdue_view["due"],
+                "Days overdue": overdue_view["days_overdue"],
+            }
         )
         st.dataframe(overdue_df, use_container_width=True, height=260)
     else:
         st.caption("No overdue open actions in the selected window.")
 
     st.markdown("**Recently closed actions**")
-    if closed_actions:
-        closed_df = pd.DataFrame(
-            [
-                {
-                    "Action ID": a["id"],
-                    "Title": a["title"],
-                    "Category": a["category"],
-                    "Project": a["project_name"],
-                    "Closed at": a["closed"],
-                    "On time": "Yes" if a["due"] is None or (a["closed"] and a["closed"] <= a["due"]) else "No",
-                    "TTC (days)": (a["closed"] - a["created"]).days if a["closed"] else None,
-                }
-                for a in closed_actions
-            ]
+    closed_view = closed_details.nlargest(DRILLDOWN_LIMIT, "closed")
+    if not closed_view.empty:
+        on_time = closed_view["due"].isna() | (closed_view["closed"] <= closed_view["due"])
+        closed_df = _display_table(
+            {
+                "Action ID": closed_view["id"],
+                "Title": closed_view["title"],
+                "Category": closed_view["category"],
+                "Project": closed_view["project_name"],
+                "Closed at": closed_view["closed"],
+                "On time": on_time.map({True: "Yes", False: "No"}),
+                "TTC (days)": (closed_view["closed"] - closed_view["created"]).dt.days,
+            }
         )
         st.dataframe(closed_df, use_container_width=True, height=260)
     else:
@@ -8,6 +8,7 @@ from uuid import uuid4
 
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint
 from action_tracking.data.repositories import ProductionDataRepository, ProjectRepository
 from action_tracking.services import diagnostics_assistant
 
@@ -37,29 +38,36 @@ ASSEMBLY_DEFECTS = [
 ]
 
 
-@st.cache_data(ttl=1800)
-def _cached_tavily_search(
-    context_hash: str,
-    queries: tuple[str, ...],
-    allowlist: tuple[str, ...],
-    api_key: str,
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_list_projects(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
 ) -> list[dict[str, Any]]:
-    sources = diagnostics_assistant.tavily_search_from_queries(
-        list(queries),
-        list(allowlist),
-        api_key,
-        max_results=6,
-    )
-    return diagnostics_assistant.serialize_sources(sources)
+    return ProjectRepository(con).list_projects()
 
 
-@st.cache_data(ttl=900, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
-def _cached_internal_retrieval(
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_list_work_centers(
     con: sqlite3.Connection,
-    context: dict[str, Any],
-) -> list[dict[str, Any]]:
-    hits = diagnostics_assistant.internal_retrieval(con, context, limit=6)
-    return diagnostics_assistant.serialize_internal_hits(hits)
+    db_fingerprint: tuple[int, ...] | None,
+) -> list[str]:
+    return ProductionDataRepository(con).list_work_centers()
+
+
+def _navigate(page: str, state: dict[str, Any]) -> None:
+    """
+    Button callback: runs before the click's own rerun, so the app switches
+    pages in that rerun without st.rerun() (and even though the results are
+    rendered only right after the form submit).
+    """
+    st.session_state["nav_to_page"] = page
+    st.session_state.update(state)
+
+
+def _navigate_next_step(next_steps: dict[str, tuple[str, dict[str, Any]]]) -> None:
+    choice = st.session_state.get("diag_next_step")
+    if choice in next_steps:
+        _navigate(*next_steps[choice])
 
 
 def _format_project_label(project: dict[str, Any]) -> str:
@@ -97,15 +105,13 @@ def render(con: sqlite3.Connection) -> None:
     st.header("Asystent Diagnostyki")
     st.caption("Diagnoza defektów wtrysku i montażu z wiedzy wewnętrznej + źródeł zaufanych.")
 
-    project_repo = ProjectRepository(con)
-    production_repo = ProductionDataRepository(con)
-
-    projects = project_repo.list_projects()
+    db_fingerprint = database_fingerprint(con)
+    projects = _cached_list_projects(con, db_fingerprint)
 
     project_options = ["(brak)"] + [p["id"] for p in projects]
     project_labels = {p["id"]: _format_project_label(p) for p in projects}
 
-    work_centers = production_repo.list_work_centers()
+    work_centers = _cached_list_work_centers(con, db_fingerprint)
 
     with st.form("diagnostics_context"):
         st.subheader("Kontekst")
@@ -173,30 +179,22 @@ def render(con: sqlite3.Connection) -> None:
     # Dev note: set TAVILY_API_KEY in the environment to enable web search.
     tavily_key = os.getenv("TAVILY_API_KEY", "")
 
-    sources: list[dict[str, Any]] = []
-    tavily_error = None
-    if tavily_key:
-        try:
-            queries = diagnostics_assistant.build_search_queries(context)
-            sources = _cached_tavily_search(
-                context["context_hash"],
-                tuple(queries),
-                tuple(allowlist),
-                tavily_key,
-            )
-        except Exception as exc:
-            tavily_error = exc
-    else:
-        tavily_error = "Brak klucza TAVILY_API_KEY (tryb internal-only)."
+    results = diagnostics_assistant.fetch_all(con, context, allowlist, tavily_key)
+    sources: list[dict[str, Any]] = results["sources"]
+    internal_hits: list[dict[str, Any]] = results["internal_hits"]
+    tavily_error = (
+        results["tavily_error"]
+        if tavily_key
+        else "Brak klucza TAVILY_API_KEY (tryb internal-only)."
+    )
 
     if tavily_error:
         st.warning(f"Tavily: {tavily_error}")
 
-    internal_hits = _cached_internal_retrieval(con, context)
     answer = diagnostics_assistant.synthesize_answer(
         context,
-        [diagnostics_assistant.Source(**row) for row in sources],
-        [diagnostics_assistant.InternalHit(**row) for row in internal_hits],
+        diagnostics_assistant.deserialize_sources(sources),
+        diagnostics_assistant.deserialize_internal_hits(internal_hits),
     )
 
     st.subheader("Wynik (podsumowanie)")
@@ -256,15 +254,19 @@ def render(con: sqlite3.Connection) -> None:
             st.markdown(hit.get("snippet") or "—")
 
             if hit["record_type"] == "action":
-                if st.button("Otwórz w Akcjach", key=f"open_action_{hit['record_id']}"):
-                    st.session_state["nav_to_page"] = "Akcje"
-                    st.session_state["action_edit_select"] = hit["record_id"]
-                    st.rerun()
+                st.button(
+                    "Otwórz w Akcjach",
+                    key=f"open_action_{hit['record_id']}",
+                    on_click=_navigate,
+                    args=("Akcje", {"action_edit_select": hit["record_id"]}),
+                )
             else:
-                if st.button("Otwórz w Analizach", key=f"open_analysis_{hit['record_id']}"):
-                    st.session_state["nav_to_page"] = "Analizy"
-                    st.session_state["analysis_select_id"] = hit["record_id"]
-                    st.rerun()
+                st.button(
+                    "Otwórz w Analizach",
+                    key=f"open_analysis_{hit['record_id']}",
+                    on_click=_navigate,
+                    args=("Analizy", {"analysis_select_id": hit["record_id"]}),
+                )
             st.divider()
     else:
         st.caption("Brak podobnych akcji lub analiz.")
@@ -273,55 +275,53 @@ def render(con: sqlite3.Connection) -> None:
     summary_text = _summary_from_answer(answer)
     nav_nonce = str(uuid4())
 
-    col_a, col_b, col_c, col_d = st.columns(4)
-    if col_a.button("Utwórz analizę 5WHY"):
-        st.session_state["nav_to_page"] = "Analizy"
-        st.session_state["nav_analysis_prefill"] = {
-            "tool_type": "5WHY",
-            "area": area,
-            "project_id": None if selected_project == "(brak)" else selected_project,
-            "champion_id": owner_id,
-            "summary": summary_text,
-            "nonce": nav_nonce,
-        }
-        st.rerun()
-
-    if col_b.button("Utwórz analizę Ishikawa"):
-        st.session_state["nav_to_page"] = "Analizy"
-        st.session_state["nav_analysis_prefill"] = {
-            "tool_type": "Diagram Ishikawy",
-            "area": area,
-            "project_id": None if selected_project == "(brak)" else selected_project,
-            "champion_id": owner_id,
-            "summary": summary_text,
-            "nonce": nav_nonce,
-        }
-        st.rerun()
-
+    project_id = None if selected_project == "(brak)" else selected_project
+    analysis_payload = {
+        "area": area,
+        "project_id": project_id,
+        "champion_id": owner_id,
+        "summary": summary_text,
+        "nonce": nav_nonce,
+    }
     action_payload = {
-        "project_id": None if selected_project == "(brak)" else selected_project,
+        "project_id": project_id,
         "owner_champion_id": owner_id,
         "area": area,
         "description": summary_text,
+        "nonce": nav_nonce,
     }
 
-    if col_c.button("Dodaj akcję korygującą"):
-        st.session_state["nav_to_page"] = "Akcje"
-        st.session_state["nav_action_prefill"] = {
-            **action_payload,
-            "title": _build_title("Korekta", defect_type, area),
-            "nonce": nav_nonce,
-        }
-        st.rerun()
-
-    if col_d.button("Dodaj akcję prewencyjną"):
-        st.session_state["nav_to_page"] = "Akcje"
-        st.session_state["nav_action_prefill"] = {
-            **action_payload,
-            "title": _build_title("Prewencja", defect_type, area),
-            "nonce": nav_nonce,
-        }
-        st.rerun()
+    next_steps: dict[str, tuple[str, dict[str, Any]]] = {
+        "Utwórz analizę 5WHY": (
+            "Analizy",
+            {"nav_analysis_prefill": {**analysis_payload, "tool_type": "5WHY"}},
+        ),
+        "Utwórz analizę Ishikawa": (
+            "Analizy",
+            {"nav_analysis_prefill": {**analysis_payload, "tool_type": "Diagram Ishikawy"}},
+        ),
+        "Dodaj akcję korygującą": (
+            "Akcje",
+            {
+                "nav_action_prefill": {
+                    **action_payload,
+                    "title": _build_title("Korekta", defect_type, area),
+                }
+            },
+        ),
+        "Dodaj akcję prewencyjną": (
+            "Akcje",
+            {
+                "nav_action_prefill": {
+                    **action_payload,
+                    "title": _build_title("Prewencja", defect_type, area),
+                }
+            },
+        ),
+    }
+    with st.form("diag_next_steps"):
+        st.radio("Akcja", list(next_steps), horizontal=True, key="diag_next_step")
+        st.form_submit_button("Wykonaj", on_click=_navigate_next_step, args=(next_steps,))
 
     with st.expander("Copy prompt / kontekst"):
         st.json(context)
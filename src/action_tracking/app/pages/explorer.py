@@ -2,86 +2,131 @@ from __future__ import annotations
 
 from datetime import date, timedelta
 import sqlite3
+from typing import TYPE_CHECKING, Any
 
-import pandas as pd
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint
 from action_tracking.data.repositories import ProductionDataRepository, ProjectRepository
 from action_tracking.services.effectiveness import parse_work_centers
+from action_tracking.services.production_outcome import apply_weekend_filter
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def _weighted_daily_average(
-    df: pd.DataFrame,
-    value_col: str,
-    weight_col: str = "worktime_min",
-) -> pd.DataFrame:
-    if df.empty:
-        return pd.DataFrame(columns=["metric_date", value_col])
-
-    def _calc(group: pd.DataFrame) -> float | None:
-        values = group[value_col]
-        weights = group[weight_col].fillna(0)
-        weighted_weights = weights.where(values.notna(), 0)
-        if weighted_weights.sum() > 0:
-            weighted_values = values.fillna(0) * weights
-            return float(weighted_values.sum() / weighted_weights.sum())
-        mean_value = values.mean()
-        if pd.isna(mean_value):
-            return None
-        return float(mean_value)
-
-    grouped = df.groupby("metric_date").apply(_calc)
-    return grouped.reset_index(name=value_col)
-
-
-def _daily_sum(df: pd.DataFrame, value_col: str) -> pd.DataFrame:
-    if df.empty:
-        return pd.DataFrame(columns=["metric_date", value_col])
-    return df.groupby("metric_date", as_index=False)[value_col].sum()
-
-
-def _apply_weekend_filter(
-    df: pd.DataFrame,
-    remove_sat: bool,
-    remove_sun: bool,
-) -> pd.DataFrame:
-    if df.empty or "metric_date" not in df.columns:
-        return df
-    temp = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp["metric_date"]):
-        temp["metric_date"] = pd.to_datetime(temp["metric_date"], errors="coerce")
-    temp = temp.dropna(subset=["metric_date"])
-    weekday = temp["metric_date"].dt.weekday
-    mask = pd.Series(True, index=temp.index)
-    if remove_sat:
-        mask &= weekday != 5
-    if remove_sun:
-        mask &= weekday != 6
-    return temp.loc[mask]
 
+KPI_METRICS = {"OEE %": "oee_pct", "Performance %": "performance_pct"}
+AUDIT_PREVIEW_ROWS = 500
+
+
+# Lookups/series only change on import; the DB fingerprint invalidates them early.
+_CACHE_KWARGS: dict[str, Any] = {
+    "ttl": 60,
+    "show_spinner": False,
+    "hash_funcs": {sqlite3.Connection: lambda _: "sqlite"},
+}
 
-def render(con: sqlite3.Connection) -> None:
-    st.header("Explorer (Produkcja)")
-    repo = ProductionDataRepository(con)
-    project_repo = ProjectRepository(con)
 
-    projects = project_repo.list_projects(include_counts=False)
-    projects_by_id = {project["id"]: project for project in projects}
-    project_options = ["(Brak)"] + [project["id"] for project in projects]
+@st.cache_data(**_CACHE_KWARGS)
+def _project_index(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> tuple[list[str], dict[str, str], dict[str, list[str]], list[str]]:
+    """Project options, labels, per-project work centers and all known work centers."""
+    projects = ProjectRepository(con).list_projects(include_counts=False)
+    project_ids = [project["id"] for project in projects]
     project_labels = {
         project["id"]: project.get("name") or project["id"] for project in projects
     }
-
-    project_work_centers: dict[str, list[str]] = {}
-    for project in projects:
-        project_work_centers[project["id"]] = parse_work_centers(
+    project_work_centers = {
+        project["id"]: parse_work_centers(
             project.get("work_center"),
             project.get("related_work_center"),
         )
-
-    stored_work_centers = set(repo.list_work_centers())
+        for project in projects
+    }
+    stored_work_centers = set(ProductionDataRepository(con).list_work_centers())
     project_centers = {center for centers in project_work_centers.values() for center in centers}
     all_work_centers = sorted(stored_work_centers | project_centers)
+    return project_ids, project_labels, project_work_centers, all_work_centers
+
+
+@st.cache_data(**_CACHE_KWARGS)
+def _cached_list_kpi_daily(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    work_centers: tuple[str, ...] | None,
+    date_from: date,
+    date_to: date,
+    full_project: str | None,
+) -> dict[str, tuple[Any, ...]]:
+    return ProductionDataRepository(con).list_kpi_daily_columns(
+        list(work_centers) if work_centers is not None else None,
+        date_from,
+        date_to,
+        full_project=full_project,
+    )
+
+
+@st.cache_data(**_CACHE_KWARGS)
+def _cached_aggregate_scrap_daily(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    work_centers: tuple[str, ...] | None,
+    date_from: date,
+    date_to: date,
+    full_project: str | None,
+    by_work_center: bool,
+) -> dict[str, tuple[Any, ...]]:
+    return ProductionDataRepository(con).aggregate_scrap_daily_columns(
+        list(work_centers) if work_centers is not None else None,
+        date_from,
+        date_to,
+        full_project=full_project,
+        by_work_center=by_work_center,
+    )
+
+
+@st.cache_data(**_CACHE_KWARGS)
+def _cached_weighted_kpi_daily(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    metrics: tuple[str, ...],
+    work_centers: tuple[str, ...] | None,
+    date_from: date,
+    date_to: date,
+    full_project: str | None,
+) -> dict[str, tuple[Any, ...]]:
+    return ProductionDataRepository(con).weighted_kpi_daily_columns(
+        list(metrics),
+        list(work_centers) if work_centers is not None else None,
+        date_from,
+        date_to,
+        full_project=full_project,
+    )
+
+
+def _daily_frame(columns: dict[str, tuple[Any, ...]]) -> pd.DataFrame:
+    import numpy as np
+    import pandas as pd
+
+    # Column-wise input: one dtype inference per column, no per-row dicts.
+    df = pd.DataFrame(columns)
+    if not df.empty:
+        # The repository selects date(metric_date): plain YYYY-MM-DD (or NULL),
+        # which NumPy parses natively without pandas' per-value parser.
+        df["metric_date"] = np.asarray(columns["metric_date"], dtype="datetime64[D]")
+    return df
+
+
+def render(con: sqlite3.Connection) -> None:
+    st.header("Explorer (Produkcja)")
+    db_fingerprint = database_fingerprint(con)
+
+    project_ids, project_labels, project_work_centers, all_work_centers = _project_index(
+        con, db_fingerprint
+    )
+    project_options = ["(Brak)"] + project_ids
 
     default_start = date.today() - timedelta(days=90)
     default_end = date.today()
@@ -140,31 +185,21 @@ def render(con: sqlite3.Connection) -> None:
             None if set(selected_work_centers) == set(all_work_centers) else selected_work_centers
         )
 
-    scrap_rows = repo.list_scrap_daily(
-        work_center_filter,
-        selected_from,
-        selected_to,
-        currency=None,
-        full_project=full_project_filter,
-    )
-    kpi_rows = repo.list_kpi_daily(
-        work_center_filter,
+    query_args = (
+        tuple(work_center_filter) if work_center_filter is not None else None,
         selected_from,
         selected_to,
-        full_project=full_project_filter,
+        full_project_filter,
     )
+    scrap_wc_columns = _cached_aggregate_scrap_daily(con, db_fingerprint, *query_args, True)
+    kpi_columns = _cached_list_kpi_daily(con, db_fingerprint, *query_args)
 
-    if not scrap_rows and not kpi_rows:
+    if not scrap_wc_columns and not kpi_columns:
         st.info("Brak danych dla wybranych filtrów.")
         return
 
-    scrap_df = pd.DataFrame(scrap_rows)
-    if not scrap_df.empty:
-        scrap_df["metric_date"] = pd.to_datetime(scrap_df["metric_date"])
-
-    kpi_df = pd.DataFrame(kpi_rows)
-    if not kpi_df.empty:
-        kpi_df["metric_date"] = pd.to_datetime(kpi_df["metric_date"])
+    # Deferred: pandas is only needed once there is data to chart.
+    import pandas as pd
 
     filter_col1, filter_col2 = st.columns(2)
     remove_saturdays = filter_col1.checkbox(
@@ -178,14 +213,26 @@ def render(con: sqlite3.Connection) -> None:
         key="explorer_remove_sun",
     )
 
-    if "Scrap qty" in selected_metrics:
+    # Chart series are aggregated per day in SQLite; only the reduced rows
+    # (one per day) are loaded, and only for the selected metric groups.
+    need_scrap_qty = "Scrap qty" in selected_metrics
+    need_scrap_pln = "Scrap PLN" in selected_metrics
+    kpi_metrics = [column for label, column in KPI_METRICS.items() if label in selected_metrics]
+
+    if need_scrap_qty or need_scrap_pln:
+        daily_scrap = (
+            _daily_frame(_cached_aggregate_scrap_daily(con, db_fingerprint, *query_args, False))
+            if scrap_wc_columns
+            else pd.DataFrame(columns=["metric_date", "scrap_qty", "scrap_pln", "pln_rows"])
+        )
+
+    if need_scrap_qty:
         st.subheader("Scrap qty (dziennie)")
-        if scrap_df.empty:
+        if daily_scrap.empty:
             st.info("Brak danych scrap qty.")
         else:
-            daily_scrap_qty = _daily_sum(scrap_df, "scrap_qty")
-            daily_scrap_qty = _apply_weekend_filter(
-                daily_scrap_qty,
+            daily_scrap_qty = apply_weekend_filter(
+                daily_scrap[["metric_date", "scrap_qty"]],
                 remove_saturdays,
                 remove_sundays,
             )
@@ -194,57 +241,57 @@ def render(con: sqlite3.Connection) -> None:
             else:
                 st.line_chart(daily_scrap_qty.set_index("metric_date")["scrap_qty"])
 
-    if "Scrap PLN" in selected_metrics:
+    if need_scrap_pln:
         st.subheader("Scrap PLN (dziennie)")
-        if scrap_df.empty:
+        pln_df = daily_scrap.loc[daily_scrap["pln_rows"] > 0, ["metric_date", "scrap_pln"]]
+        if pln_df.empty:
             st.info("Brak danych scrap PLN.")
         else:
-            pln_df = scrap_df[scrap_df["scrap_cost_currency"] == "PLN"]
-            if pln_df.empty:
-                st.info("Brak danych scrap PLN.")
-            else:
-                daily_scrap_pln = _daily_sum(pln_df, "scrap_cost_amount")
-                daily_scrap_pln = _apply_weekend_filter(
-                    daily_scrap_pln,
-                    remove_saturdays,
-                    remove_sundays,
-                )
-                if daily_scrap_pln.empty:
-                    st.info("Po odfiltrowaniu weekendów brak danych w zakresie.")
-                else:
-                    st.line_chart(daily_scrap_pln.set_index("metric_date")["scrap_cost_amount"])
-
-    if "OEE %" in selected_metrics:
-        st.subheader("OEE % (dziennie)")
-        if kpi_df.empty:
-            st.info("Brak danych OEE.")
-        else:
-            daily_oee = _weighted_daily_average(kpi_df, "oee_pct")
-            daily_oee = _apply_weekend_filter(
-                daily_oee,
+            daily_scrap_pln = apply_weekend_filter(
+                pln_df.rename(columns={"scrap_pln": "scrap_cost_amount"}),
                 remove_saturdays,
                 remove_sundays,
             )
-            if daily_oee.empty:
+            if daily_scrap_pln.empty:
                 st.info("Po odfiltrowaniu weekendów brak danych w zakresie.")
             else:
-                st.line_chart(daily_oee.set_index("metric_date")["oee_pct"])
+                st.line_chart(daily_scrap_pln.set_index("metric_date")["scrap_cost_amount"])
 
-    if "Performance %" in selected_metrics:
-        st.subheader("Performance % (dziennie)")
-        if kpi_df.empty:
-            st.info("Brak danych Performance.")
-        else:
-            daily_perf = _weighted_daily_average(kpi_df, "performance_pct")
-            daily_perf = _apply_weekend_filter(
-                daily_perf,
-                remove_saturdays,
-                remove_sundays,
+    if kpi_metrics:
+        daily_kpi = (
+            _daily_frame(
+                _cached_weighted_kpi_daily(con, db_fingerprint, tuple(kpi_metrics), *query_args)
             )
-            if daily_perf.empty:
-                st.info("Po odfiltrowaniu weekendów brak danych w zakresie.")
-            else:
-                st.line_chart(daily_perf.set_index("metric_date")["performance_pct"])
+            if kpi_columns
+            else pd.DataFrame(columns=["metric_date", *kpi_metrics])
+        )
+
+    for label, column in KPI_METRICS.items():
+        if label not in selected_metrics:
+            continue
+        st.subheader(f"{label} (dziennie)")
+        if daily_kpi.empty:
+            st.info(f"Brak danych {label.removesuffix(' %')}.")
+            continue
+        daily_metric = apply_weekend_filter(
+            daily_kpi[["metric_date", column]],
+            remove_saturdays,
+            remove_sundays,
+        )
+        if daily_metric.empty:
+            st.info("Po odfiltrowaniu weekendów brak danych w zakresie.")
+        else:
+            st.line_chart(daily_metric.set_index("metric_date")[column])
+
+    kpi_df = _daily_frame(kpi_columns)
+    scrap_df = _daily_frame(scrap_wc_columns)
+    # One shared categorical dtype so the audit merge/sort runs on integer codes.
+    work_center_dtype = pd.CategoricalDtype(
+        sorted({*kpi_columns.get("work_center", ()), *scrap_wc_columns.get("work_center", ())})
+    )
+    for frame in (kpi_df, scrap_df):
+        if not frame.empty:
+            frame["work_center"] = frame["work_center"].astype(work_center_dtype)
 
     st.subheader("Dane dzienne (audit)")
     kpi_audit = pd.DataFrame(
@@ -273,35 +320,49 @@ def render(con: sqlite3.Connection) -> None:
 
     scrap_audit = pd.DataFrame(columns=["metric_date", "work_center", "scrap_qty", "scrap_pln"])
     if not scrap_df.empty:
-        scrap_qty = (
-            scrap_df.groupby(["metric_date", "work_center"], as_index=False)["scrap_qty"].sum()
+        scrap_audit = scrap_df.assign(
+            scrap_pln=scrap_df["scrap_pln"].where(scrap_df["pln_rows"] > 0)
+        )[["metric_date", "work_center", "scrap_qty", "scrap_pln"]]
+
+    # Keys are unique per frame and the value columns disjoint, so a tall
+    # concat + groupby.first() gives the outer join without a hash merge.
+    audit_keys = ["metric_date", "work_center"]
+    audit_columns = [*kpi_audit.columns, *scrap_audit.columns[len(audit_keys):]]
+    audit_parts = [frame for frame in (kpi_audit, scrap_audit) if not frame.empty]
+    if audit_parts:
+        audit_df = (
+            pd.concat(audit_parts, ignore_index=True)
+            .groupby(audit_keys, observed=True, sort=True)
+            .first()
+            .reset_index()
+            .reindex(columns=audit_columns)
         )
-        scrap_pln = (
-            scrap_df[scrap_df["scrap_cost_currency"] == "PLN"]
-            .groupby(["metric_date", "work_center"], as_index=False)["scrap_cost_amount"]
-            .sum()
-            .rename(columns={"scrap_cost_amount": "scrap_pln"})
-        )
-        scrap_audit = scrap_qty.merge(scrap_pln, on=["metric_date", "work_center"], how="left")
-
-    audit_df = pd.merge(kpi_audit, scrap_audit, on=["metric_date", "work_center"], how="outer")
+    else:
+        audit_df = pd.DataFrame(columns=audit_columns)
     audit_df_empty = audit_df.empty
-    audit_df = _apply_weekend_filter(
+    audit_df = apply_weekend_filter(
         audit_df,
         remove_saturdays,
         remove_sundays,
     )
     if not audit_df.empty:
-        audit_df = audit_df.sort_values(["metric_date", "work_center"]).reset_index(drop=True)
-        audit_df["metric_date"] = audit_df["metric_date"].dt.date.astype(str)
-        st.dataframe(audit_df, use_container_width=True)
-        csv_data = audit_df.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "Pobierz CSV",
-            data=csv_data,
-            file_name="production_explorer.csv",
-            mime="text/csv",
-        )
+        audit_df = audit_df.reset_index(drop=True)
+        preview = audit_df.head(AUDIT_PREVIEW_ROWS)
+        preview = preview.assign(metric_date=preview["metric_date"].dt.date.astype(str))
+        if len(audit_df) > AUDIT_PREVIEW_ROWS:
+            st.caption(f"Wierszy: {len(audit_df)} (podgląd pierwszych {AUDIT_PREVIEW_ROWS}).")
+        else:
+            st.caption(f"Wierszy: {len(audit_df)}.")
+        st.dataframe(preview, use_container_width=True)
+        # CSV of the full table is serialized only on request.
+        if st.checkbox("Przygotuj eksport CSV", value=False, key="explorer_audit_csv"):
+            csv_data = audit_df.to_csv(index=False, date_format="%Y-%m-%d").encode("utf-8")
+            st.download_button(
+                "Pobierz CSV",
+                data=csv_data,
+                file_name="production_explorer.csv",
+                mime="text/csv",
+            )
     else:
         if audit_df_empty:
             st.info("Brak danych do tabeli audit.")
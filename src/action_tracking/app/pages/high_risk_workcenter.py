@@ -6,14 +6,21 @@ from typing import Any
 from urllib.parse import quote
 from uuid import uuid4
 
+import numpy as np
+import pandas as pd
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint, run_read_queries
 from action_tracking.data.repositories import (
     ChampionRepository,
     ProductionDataRepository,
     ProjectRepository,
 )
-from action_tracking.services.kpi_windows import compute_project_kpi_windows
+from action_tracking.services.kpi_windows import (
+    MIN_WINDOW_DAYS,
+    compute_project_kpi_windows,
+    compute_project_kpi_windows_bulk,
+)
 from action_tracking.services.production_outcome import format_metric_value
 from action_tracking.services.workcenter_classifier import (
     KPI_COMPONENTS,
@@ -29,7 +36,125 @@ IMPORTANCE_ORDER = {
     "Spare parts": 3,
 }
 
+PRODUCTION_EXPLORER_PAGE = quote("Production Explorer")
+
+# Single-value sort modes -> (column, descending); "Bad trend" sorts by risk.
+VALUE_SORTS: dict[str, tuple[str, bool]] = {
+    "Highest scrap PLN": ("current_scrap_pln", True),
+    "Lowest OEE": ("current_oee", False),
+    "Lowest Performance": ("current_perf", False),
+}
+
+
+@st.cache_data(ttl=60, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_projects_and_champions(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> tuple[list[dict[str, Any]], dict[str, str]]:
+    projects = ProjectRepository(con).list_projects(include_counts=True)
+    champions = ChampionRepository(con).list_champions()
+    return projects, {c["id"]: c["display_name"] for c in champions}
+
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_has_full_project_column(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> bool:
+    production_repo = ProductionDataRepository(con)
+    return (
+        production_repo.has_full_project_column("scrap_daily")
+        and production_repo.has_full_project_column("production_kpi_daily")
+    )
+
 
+@st.cache_data(ttl=600, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_project_activity(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    date_from: date,
+    date_to: date,
+) -> dict[str, tuple[str, int]]:
+    """Per FULL PROJECT activity used to prune Bad-trend candidates before the window fetch."""
+    return ProductionDataRepository(con).list_project_activity_summary(date_from, date_to)
+
+
+@st.cache_data(ttl=600, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_kpi_windows(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    production_keys: tuple[str, ...],
+    date_from: date,
+    date_to: date,
+    scrap_component: str,
+    kpi_component: str,
+    kpi_machines: tuple[str, ...],
+    remove_saturdays: bool,
+    remove_sundays: bool,
+    searchback_calendar_days: int,
+) -> dict[str, dict[str, Any]]:
+    """
+    Bulk fetch + KPI windows per FULL PROJECT. Threshold and sort widgets are
+    not part of the key, so changing them reuses the windows.
+    """
+    keys = list(production_keys)
+    scrap_columns, kpi_columns = run_read_queries(
+        con,
+        ProductionDataRepository,
+        (
+            lambda repo: repo.scrap_daily_by_project_columns(
+                keys,
+                date_from,
+                date_to,
+                currency="PLN",
+                workcenter_areas=SCRAP_COMPONENTS.get(scrap_component),
+            ),
+            lambda repo: repo.kpi_daily_by_project_columns(
+                keys,
+                date_from,
+                date_to,
+                work_centers=list(kpi_machines) or None,
+                workcenter_areas=KPI_COMPONENTS.get(kpi_component),
+            ),
+        ),
+    )
+    return compute_project_kpi_windows_bulk(
+        keys,
+        scrap_columns,
+        kpi_columns,
+        remove_saturdays,
+        remove_sundays,
+        searchback_calendar_days=searchback_calendar_days,
+    )
+
+
+def _sort_positions(results: pd.DataFrame, sort_mode: str) -> np.ndarray:
+    """Row order for a sort mode: missing values last, ties keep their order."""
+    if sort_mode in VALUE_SORTS:
+        column, descending = VALUE_SORTS[sort_mode]
+        values = pd.to_numeric(results[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        keys = np.nan_to_num(-values if descending else values, nan=np.inf)
+        return np.argsort(keys, kind="stable")
+    return np.lexsort(
+        (
+            results["project_name"].fillna("").astype(str).to_numpy(dtype=object),
+            results["importance_order"].to_numpy(),
+            -results["risk_count"].to_numpy(),
+        )
+    )
+
+
+def _add_action(row: dict[str, Any]) -> None:
+    """Button callback: runs before the click's rerun, so no st.rerun() is needed."""
+    nav_nonce = str(uuid4())
+    st.session_state["nav_to_page"] = "Akcje"
+    st.session_state["nav_action_prefill"] = {
+        "project_id": row["project_id"],
+        "work_centers": row["work_centers"],
+        "owner_champion_id": row["owner_champion_id"],
+        "nonce": nav_nonce,
+    }
+    st.session_state["nav_nonce"] = nav_nonce
 
 
 def _format_scrap_cell(metric: dict[str, Any]) -> tuple[str, float | None]:
@@ -73,12 +198,8 @@ def render(con: sqlite3.Connection) -> None:
     st.header("High Risk project")
 
     production_repo = ProductionDataRepository(con)
-    project_repo = ProjectRepository(con)
-    champion_repo = ChampionRepository(con)
-
-    projects = project_repo.list_projects(include_counts=True)
-    champions = champion_repo.list_champions()
-    champion_names = {c["id"]: c["display_name"] for c in champions}
+    db_fingerprint = database_fingerprint(con)
+    projects, champion_names = _cached_projects_and_champions(con, db_fingerprint)
 
     today = date.today()
     default_from = today - timedelta(days=90)
@@ -156,54 +277,83 @@ def render(con: sqlite3.Connection) -> None:
     scrap_area_filter = SCRAP_COMPONENTS.get(scrap_component)
     kpi_area_filter = KPI_COMPONENTS.get(kpi_component)
     searchback_from = selected_to - timedelta(days=searchback_calendar_days)
-    has_full_project_column = (
-        production_repo.has_full_project_column("scrap_daily")
-        and production_repo.has_full_project_column("production_kpi_daily")
-    )
+    has_full_project_column = _cached_has_full_project_column(con, db_fingerprint)
     missing_full_project = 0
+    oee_limit = -float(oee_threshold)
+    perf_limit = -float(perf_threshold)
+    scrap_limit = float(scrap_threshold)
 
+    candidates: list[tuple[dict[str, Any], str, str | None, list[str] | None]] = []
     for project in projects:
         importance = project.get("importance") or "Mid Runner"
         if selected_importance and importance not in selected_importance:
             continue
-        production_key = (project.get("full_project") or "").strip() if has_full_project_column else ""
-        project_work_centers = parse_work_centers(
-            project.get("work_center"),
-            project.get("related_work_center"),
-        )
         active_full_project = None
         active_work_centers = None
         if has_full_project_column:
+            production_key = (project.get("full_project") or "").strip()
             if production_key:
                 active_full_project = production_key
             else:
                 missing_full_project += 1
                 continue
         else:
-            active_work_centers = project_work_centers or None
-
-        scrap_rows = production_repo.list_scrap_daily(
-            active_work_centers,
+            # Work centers only scope the queries when there is no FULL PROJECT column.
+            active_work_centers = (
+                parse_work_centers(project.get("work_center"), project.get("related_work_center"))
+                or None
+            )
+        candidates.append((project, importance, active_full_project, active_work_centers))
+
+    if has_full_project_column and sort_mode == "Bad trend":
+        # Projects with too few production days can't get a window, hence no risk flags.
+        activity = _cached_project_activity(con, db_fingerprint, searchback_from, selected_to)
+        candidates = [
+            candidate
+            for candidate in candidates
+            if activity.get(candidate[2], (None, 0))[1] >= MIN_WINDOW_DAYS
+        ]
+
+    windows_by_project: dict[str, dict[str, Any]] = {}
+    if has_full_project_column and candidates:
+        windows_by_project = _cached_kpi_windows(
+            con,
+            db_fingerprint,
+            tuple(sorted({active_full_project for _, _, active_full_project, _ in candidates})),
             searchback_from,
             selected_to,
-            currency="PLN",
-            full_project=active_full_project,
-            workcenter_areas=scrap_area_filter,
-        )
-        kpi_rows = production_repo.list_kpi_daily(
-            kpi_machine_filter or active_work_centers,
-            searchback_from,
-            selected_to,
-            full_project=active_full_project,
-            workcenter_areas=kpi_area_filter,
-        )
-        kpi_window = compute_project_kpi_windows(
-            scrap_rows,
-            kpi_rows,
+            scrap_component,
+            kpi_component,
+            tuple(kpi_machine_filter or ()),
             remove_saturdays,
             remove_sundays,
-            searchback_calendar_days=searchback_calendar_days,
+            searchback_calendar_days,
         )
+
+    for project, importance, active_full_project, active_work_centers in candidates:
+        if active_full_project is not None:
+            kpi_window = windows_by_project[active_full_project]
+        else:
+            scrap_rows = production_repo.list_scrap_daily(
+                active_work_centers,
+                searchback_from,
+                selected_to,
+                currency="PLN",
+                workcenter_areas=scrap_area_filter,
+            )
+            kpi_rows = production_repo.list_kpi_daily(
+                kpi_machine_filter or active_work_centers,
+                searchback_from,
+                selected_to,
+                workcenter_areas=kpi_area_filter,
+            )
+            kpi_window = compute_project_kpi_windows(
+                scrap_rows,
+                kpi_rows,
+                remove_saturdays,
+                remove_sundays,
+                searchback_calendar_days=searchback_calendar_days,
+            )
         status = kpi_window.get("status", "insufficient_data")
         window = kpi_window.get("window", {})
         metrics = kpi_window.get("metrics", {})
@@ -217,18 +367,16 @@ def render(con: sqlite3.Connection) -> None:
         oee_label, oee_delta_pp = _format_kpi_cell(oee_metrics)
         perf_label, perf_delta_pp = _format_kpi_cell(perf_metrics)
 
-        risk_flags: list[str] = []
-        if oee_delta_pp is not None and oee_delta_pp < -float(oee_threshold):
-            risk_flags.append("OEE↓")
-        if perf_delta_pp is not None and perf_delta_pp < -float(perf_threshold):
-            risk_flags.append("Perf↓")
-        scrap_risk = False
-        if scrap_delta_pct is not None:
-            scrap_risk = scrap_delta_pct > float(scrap_threshold)
-        elif scrap_pln_delta_pct is not None:
-            scrap_risk = scrap_pln_delta_pct > float(scrap_threshold)
-        if scrap_risk:
-            risk_flags.append("Scrap↑")
+        scrap_delta = scrap_delta_pct if scrap_delta_pct is not None else scrap_pln_delta_pct
+        risk_flags = tuple(
+            flag
+            for flag, raised in (
+                ("OEE↓", oee_delta_pp is not None and oee_delta_pp < oee_limit),
+                ("Perf↓", perf_delta_pp is not None and perf_delta_pp < perf_limit),
+                ("Scrap↑", scrap_delta is not None and scrap_delta > scrap_limit),
+            )
+            if raised
+        )
 
         if sort_mode == "Bad trend" and not risk_flags:
             continue
@@ -272,82 +420,50 @@ def render(con: sqlite3.Connection) -> None:
             st.info("Brak projektów spełniających kryteria filtrowania.")
         return
 
-    if sort_mode == "Highest scrap PLN":
-        rows = sorted(
-            rows,
-            key=lambda r: (
-                r["current_scrap_pln"] is None,
-                -(r["current_scrap_pln"] or 0),
-            ),
-        )
-    elif sort_mode == "Lowest OEE":
-        rows = sorted(
-            rows,
-            key=lambda r: (
-                r["current_oee"] is None,
-                r["current_oee"] if r["current_oee"] is not None else float("inf"),
-            ),
-        )
-    elif sort_mode == "Lowest Performance":
-        rows = sorted(
-            rows,
-            key=lambda r: (
-                r["current_perf"] is None,
-                r["current_perf"] if r["current_perf"] is not None else float("inf"),
-            ),
-        )
-    else:
-        rows = sorted(
-            rows,
-            key=lambda r: (
-                -r["risk_count"],
-                r["importance_order"],
-                r["project_name"] or "",
-            ),
-        )
-
+    results = pd.DataFrame(rows)
+    results = results.iloc[_sort_positions(results, sort_mode)]
     st.caption(
         "Definicja trendu: current = ostatnie dostępne dni produkcyjne (14/7/4), "
         "baseline = dni bezpośrednio wcześniej (maks. 90 dni). Okno oparte o dni z "
         "produkcją po filtrach weekendowych."
     )
 
-    header = st.columns([2.6, 1.2, 1.6, 1.6, 1.6, 1.4, 1.6, 1.2, 1.0])
-    header[0].markdown("**Projekt**")
-    header[1].markdown("**Importance**")
-    header[2].markdown("**Champion**")
-    header[3].markdown("**Scrap avg**")
-    header[4].markdown("**Scrap PLN avg**")
-    header[5].markdown("**OEE avg**")
-    header[6].markdown("**Performance avg**")
-    header[7].markdown("**Ryzyko**")
-    header[8].markdown("**Akcja**")
-
-    for row in rows:
-        project_id = row["project_id"]
-        project_name = row["project_name"]
-        project_link = (
-            f"?page={quote('Production Explorer')}&project_id={quote(str(project_id))}"
-        )
-        cols = st.columns([2.6, 1.2, 1.6, 1.6, 1.6, 1.4, 1.6, 1.2, 1.0])
-        cols[0].markdown(f"[{project_name}]({project_link})")
-        cols[0].caption(row["window_label"])
-        cols[1].markdown(row["importance"])
-        cols[2].markdown(row["owner_name"])
-        cols[3].markdown(row["scrap_label"])
-        cols[4].markdown(row["scrap_pln_label"])
-        cols[5].markdown(row["oee_label"])
-        cols[6].markdown(row["perf_label"])
-        cols[7].markdown(row["risk_flags"])
-
-        if cols[8].button("Dodaj akcję", key=f"add_action_{project_id}"):
-            nav_nonce = str(uuid4())
-            st.session_state["nav_to_page"] = "Akcje"
-            st.session_state["nav_action_prefill"] = {
-                "project_id": project_id,
-                "work_centers": row["work_centers"],
-                "owner_champion_id": row["owner_champion_id"],
-                "nonce": nav_nonce,
-            }
-            st.session_state["nav_nonce"] = nav_nonce
-            st.rerun()
+    table = pd.DataFrame(
+        {
+            "Projekt": results["project_name"],
+            "Explorer": [
+                f"?page={PRODUCTION_EXPLORER_PAGE}&project_id={quote(str(project_id))}"
+                for project_id in results["project_id"]
+            ],
+            "Importance": results["importance"],
+            "Champion": results["owner_name"],
+            "Scrap avg": results["scrap_label"],
+            "Scrap PLN avg": results["scrap_pln_label"],
+            "OEE avg": results["oee_label"],
+            "Performance avg": results["perf_label"],
+            "Ryzyko": results["risk_flags"],
+            "Okno KPI": results["window_label"],
+        }
+    )
+    event = st.dataframe(
+        table,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "Explorer": st.column_config.LinkColumn("Explorer", display_text="Otwórz"),
+        },
+        key="high_risk_table",
+        on_select="rerun",
+        selection_mode="single-row",
+    )
+    selected_rows = event.selection.rows
+    # results keeps the positions of rows as its index, so map back to the plain dict.
+    selected = rows[results.index[selected_rows[0]]] if selected_rows else None
+    st.caption("Zaznacz wiersz w tabeli, aby dodać akcję dla projektu.")
+
+    st.button(
+        "Dodaj akcję",
+        disabled=selected is None,
+        on_click=_add_action,
+        args=(selected,),
+    )
@@ -1,15 +1,16 @@
 from __future__ import annotations
 
 import sqlite3
-from dataclasses import dataclass
-from datetime import date, datetime, timedelta
-from statistics import median
+from datetime import date, timedelta
+from functools import lru_cache
 from typing import Any
 
 import altair as alt
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint
 from action_tracking.data.repositories import (
     ActionRepository,
     ChampionRepository,
@@ -18,41 +19,33 @@ from action_tracking.data.repositories import (
     ProjectRepository,
     SettingsRepository,
 )
+from action_tracking.services.action_dates import parse_date_column
 
 IMPACT_TARGET_PLN = 5000
 CLOSE_TARGET = 5
 OVERDUE_TOLERANCE = 3
-
-
-@dataclass(frozen=True)
-class ParsedAction:
-    action_id: str
-    project_id: str | None
-    champion_id: str | None
-    category: str | None
-    status: str
-    created: date
-    closed: date | None
-    due: date | None
-    manual_savings_amount: float | None
-    manual_savings_currency: str | None
-
-
-def _parse_date(value: Any) -> date | None:
-    if value in (None, ""):
-        return None
-    if isinstance(value, date) and not isinstance(value, datetime):
-        return value
-    if isinstance(value, datetime):
-        return value.date()
-    s = str(value)
-    try:
-        return date.fromisoformat(s)
-    except ValueError:
-        try:
-            return datetime.fromisoformat(s).date()
-        except ValueError:
-            return None
+_NO_DATE = np.iinfo(np.int64).max
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_EXPECTED_EFFECT_METRIC = {"SCRAP": "scrap_qty", "OEE": "oee_pct", "PERFORMANCE": "performance_pct"}
+_EFFECTIVE_LABELS = ["effective", "no_scrap"]
+_SCRAP_COST_METRICS = ["scrap_cost", "scrap_pln", "scrap_cost_pln", "scrap_cost_amount"]
+_BACKLOG_METRIC_LABELS = {"on_time_open": "On-time open", "actual_overdue": "Overdue open"}
+_BACKLOG_COLOR_SCALE = alt.Scale(domain=list(_BACKLOG_METRIC_LABELS.values()), range=["#4C78A8", "#E45756"])
+_NOW_COUNTERS = ["open_now", "overdue_now", "created_week", "closed_week", "closed_with_due", "closed_on_time"]
+
+
+_ACTION_ROW_COLUMNS = [
+    "id",
+    "project_id",
+    "owner_champion_id",
+    "category",
+    "status",
+    "created_at",
+    "closed_at",
+    "due_date",
+    "manual_savings_amount",
+    "manual_savings_currency",
+]
 
 
 def _current_week_start(today: date) -> date:
@@ -60,103 +53,302 @@ def _current_week_start(today: date) -> date:
     return today - timedelta(days=today.isoweekday() - 1)
 
 
-def _build_week_buckets(today: date) -> list[dict[str, Any]]:
+@lru_cache(maxsize=256)
+def _week_label(week_start: date) -> str:
+    iso_year, iso_week, _ = week_start.isocalendar()
+    return f"{iso_year}-W{iso_week:02d}"
+
+
+def _build_week_buckets(today: date) -> pd.DataFrame:
     """
     Fixed horizon: 4 weeks back + current + 4 weeks forward (always 9 buckets).
     Buckets are pre-created with zeros so X-axis is stable even with no data.
     """
     current_week_start = _current_week_start(today)
     week_starts = [current_week_start + timedelta(days=7 * i) for i in range(-4, 5)]
-    buckets: list[dict[str, Any]] = []
-    for week_start in week_starts:
-        week_end = week_start + timedelta(days=6)
-        iso_year, iso_week, _ = week_start.isocalendar()
-        buckets.append(
-            {
-                "week_start": week_start,
-                "week_end": week_end,
-                "week_label": f"{iso_year}-W{iso_week:02d}",
-                "actual_open": 0,
-                "actual_overdue": 0,
-                "planned_open": 0,
-            }
-        )
-    return buckets
+    zeros = np.zeros(len(week_starts), dtype=np.int64)
+    return pd.DataFrame(
+        {
+            "week_start": week_starts,
+            "week_end": [week_start + timedelta(days=6) for week_start in week_starts],
+            "week_label": [_week_label(week_start) for week_start in week_starts],
+            "actual_open": zeros,
+            "actual_overdue": zeros,
+            "planned_open": zeros,
+        }
+    )
 
 
-def _prepare_actions(rows: list[dict[str, Any]]) -> tuple[list[ParsedAction], int]:
-    parsed: list[ParsedAction] = []
-    issues = 0
-    for row in rows:
-        created = _parse_date(row.get("created_at"))
-        if created is None:
-            issues += 1
-            continue
-        closed = _parse_date(row.get("closed_at"))
-        due = _parse_date(row.get("due_date"))
-        parsed.append(
-            ParsedAction(
-                action_id=str(row.get("id", "")),
-                project_id=row.get("project_id"),
-                champion_id=row.get("owner_champion_id"),
-                category=row.get("category"),
-                status=str(row.get("status") or ""),
-                created=created,
-                closed=closed,
-                due=due,
-                manual_savings_amount=row.get("manual_savings_amount"),
-                manual_savings_currency=row.get("manual_savings_currency"),
-            )
-        )
-    return parsed, issues
+def _prepare_actions(rows: list[dict[str, Any]]) -> tuple[pd.DataFrame, int]:
+    """
+    Actions as one frame with created/closed/due parsed column-wise
+    (datetime64, NaT when missing); rows without a valid created date are
+    dropped and counted as data issues.
+    """
+    frame = pd.DataFrame(rows).reindex(columns=_ACTION_ROW_COLUMNS)
+    frame = frame.astype(object).where(frame.notna(), None)
+    created = parse_date_column(frame["created_at"])
+    valid = created.notna()
+    parsed = pd.DataFrame(
+        {
+            "action_id": frame["id"].fillna("").astype(str),
+            "project_id": frame["project_id"],
+            "champion_id": frame["owner_champion_id"],
+            "category": frame["category"],
+            # Cancelled actions drop out of every backlog and ranking pass.
+            "active": (frame["status"] != "cancelled").to_numpy(dtype=bool),
+            "created": created,
+            "closed": parse_date_column(frame["closed_at"]),
+            "due": parse_date_column(frame["due_date"]),
+            "manual_savings_amount": frame["manual_savings_amount"],
+            "manual_savings_currency": frame["manual_savings_currency"],
+        }
+    )
+    return parsed.loc[valid].reset_index(drop=True), int((~valid).sum())
 
 
-def _open_at_cutoff(action: ParsedAction, cutoff: date) -> bool:
-    if action.status == "cancelled":
-        return False
-    return action.created <= cutoff and (action.closed is None or action.closed > cutoff)
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_list_projects(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> list[dict[str, Any]]:
+    return ProjectRepository(con).list_projects(include_counts=False)
 
 
-def _weekly_backlog(actions: list[ParsedAction], today: date) -> pd.DataFrame:
-    buckets = _build_week_buckets(today)
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_list_champions(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> list[dict[str, Any]]:
+    return ChampionRepository(con).list_champions()
 
-    for action in actions:
-        if action.status == "cancelled":
-            continue
 
-        for bucket in buckets:
-            week_end: date = bucket["week_end"]
+@st.cache_data(
+    ttl=60,
+    show_spinner=False,
+    max_entries=32,
+    hash_funcs={sqlite3.Connection: lambda _: "sqlite"},
+)
+def _load_kpi_view(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+    project_filter: str | None,
+    champion_filter: str | None,
+    category_filter: str | None,
+    today: date,
+) -> dict[str, Any]:
+    """
+    Everything the tiles, weekly chart and champion backlog derive for one
+    filter set and day, so reruns caused by unrelated widgets (table view,
+    ranking filters) only redraw.
+    """
+    repo = ActionRepository(con)
+    rows = repo.list_actions_for_kpi(
+        project_id=project_filter,
+        champion_id=champion_filter,
+        category=category_filter,
+    )
+    action_frame, data_issues = _prepare_actions(rows)
 
-            # ACTUAL OPEN at end of week
-            if action.created <= week_end and (action.closed is None or action.closed > week_end):
-                bucket["actual_open"] += 1
-                if action.due is not None and action.due < week_end:
-                    bucket["actual_overdue"] += 1
+    week_start = _current_week_start(today)
+    now_frame = _now_counts(action_frame, today, week_start, week_start + timedelta(days=6))
 
-            # PLANNED OPEN at end of week (assume closure exactly at due_date; no early closures)
-            if action.created <= week_end and (action.due is None or action.due > week_end):
-                bucket["planned_open"] += 1
+    has_closed = action_frame["closed"].notna().to_numpy()
+    close_durations = (_day_numbers(action_frame["closed"]) - _day_numbers(action_frame["created"]))[has_closed]
 
-    for bucket in buckets:
-        bucket["on_time_open"] = max(int(bucket["actual_open"]) - int(bucket["actual_overdue"]), 0)
+    scrap_actions = [
+        row
+        for row in rows
+        if row.get("category") == "Scrap reduction"
+        and row.get("status") == "done"
+        and row.get("closed_at")
+    ]
+    effectiveness_map = EffectivenessRepository(con).get_effectiveness_for_actions(
+        [str(row.get("id")) for row in scrap_actions]
+    )
+    return {
+        "data_issues": data_issues,
+        "now_frame": now_frame,
+        "totals": {key: int(now_frame[key].sum()) for key in _NOW_COUNTERS},
+        # Champion backlog and the detail table (Champion view) share this grouping.
+        "by_champion": _now_by(now_frame, "champion_id"),
+        "median_close_days": float(np.median(close_durations)) if close_durations.size else None,
+        "scrap_actions": scrap_actions,
+        "scrap_effects": [effectiveness_map.get(row.get("id") or "") for row in scrap_actions],
+        "weekly_df": _weekly_backlog(action_frame, today),
+    }
+
+
+def _now_counts(actions: pd.DataFrame, today: date, week_start: date, week_end: date) -> pd.DataFrame:
+    """
+    Open/overdue/this-week counters per (champion_id, project_id), from the
+    parsed action frame so the tiles count exactly the actions whose dates parse.
+    """
+    created = _day_numbers(actions["created"])
+    closed = _day_numbers(actions["closed"])
+    due = _day_numbers(actions["due"])
+    today_num, start_num, end_num = (_day_number(value) for value in (today, week_start, week_end))
+    active = actions["active"].to_numpy(dtype=bool)
+
+    open_now = active & (created <= today_num) & (closed > today_num)
+    closed_week = active & (start_num <= closed) & (closed <= end_num)
+    closed_with_due = closed_week & (due != _NO_DATE)
+    flags = pd.DataFrame(
+        {
+            "champion_id": actions["champion_id"],
+            "project_id": actions["project_id"],
+            "open_now": open_now,
+            "overdue_now": open_now & (due < today_num),
+            "created_week": active & (start_num <= created) & (created <= end_num),
+            "closed_week": closed_week,
+            "closed_with_due": closed_with_due,
+            "closed_on_time": closed_with_due & (closed <= due),
+        }
+    )
+    grouped = flags.groupby(["champion_id", "project_id"], dropna=False, sort=False)[_NOW_COUNTERS].sum()
+    return grouped.astype(int).reset_index()
 
-    return pd.DataFrame(buckets)
 
+def _now_by(now_frame: pd.DataFrame, field: str) -> pd.DataFrame:
+    """Now counters summed per champion or project id ("unassigned" when missing)."""
+    keys = now_frame[field].fillna("").replace("", "unassigned")
+    return now_frame.groupby(keys, sort=False)[_NOW_COUNTERS].sum()
 
-def _clamp(value: float, lower: float = 0.0, upper: float = 1.0) -> float:
-    return max(lower, min(upper, value))
+
+def _group_labels(keys: pd.Index, names: dict[str, str]) -> np.ndarray:
+    """Display labels for grouped ids; unknown ids show as-is, "unassigned" as Nieprzypisany."""
+    key_series = pd.Series(keys, dtype=object)
+    return key_series.map({**names, "unassigned": "Nieprzypisany"}).fillna(key_series).to_numpy()
+
+
+def _day_numbers(values: pd.Series) -> np.ndarray:
+    """Days since epoch; a missing date sorts after any cutoff (_NO_DATE)."""
+    days = values.to_numpy(dtype="datetime64[D]").view("i8")
+    return np.where(values.isna().to_numpy(), _NO_DATE, days)
 
 
-def _impact_delta_pln(effect_row: dict[str, Any] | None) -> float | None:
-    if not effect_row:
-        return None
-    metric = effect_row.get("metric")
-    if metric not in {"scrap_cost", "scrap_pln", "scrap_cost_pln", "scrap_cost_amount"}:
-        return None
-    delta = effect_row.get("delta")
-    if isinstance(delta, (int, float)):
-        return float(delta)
-    return None
+def _day_number(value: date) -> int:
+    """Scalar counterpart of _day_numbers for cutoffs and week bounds."""
+    return value.toordinal() - _EPOCH_ORDINAL
+
+
+def _open_weeks(start: np.ndarray, stop: np.ndarray, weeks: int) -> np.ndarray:
+    """Per week, how many [start, stop) week-index spans cover it (difference array + cumsum)."""
+    start = np.clip(start, 0, weeks)
+    stop = np.clip(stop, 0, weeks)
+    spans = start < stop
+    delta = np.bincount(start[spans], minlength=weeks + 1) - np.bincount(stop[spans], minlength=weeks + 1)
+    return np.cumsum(delta)[:weeks]
+
+
+def _weekly_backlog(actions: pd.DataFrame, today: date) -> pd.DataFrame:
+    """
+    Open / overdue / planned counts at the end of each bucket week. Every
+    action becomes a [first week, stop week) span per measure, so the cost is
+    O(actions + weeks) with no actions x weeks comparison matrix. A missing
+    due date keeps the action planned-open (never "closed at due").
+    """
+    buckets = _build_week_buckets(today)
+    weeks = len(buckets)
+    active = actions.loc[actions["active"]]
+    first_week = _day_number(buckets["week_start"].iloc[0])
+    # Days relative to the first bucket; a week k ends on day 7k + 6, so a date d
+    # falls on or before the end of week k exactly when k >= d // 7.
+    created = _day_numbers(active["created"]) - first_week
+    closed = _day_numbers(active["closed"]) - first_week
+    due = _day_numbers(active["due"]) - first_week
+
+    # ACTUAL OPEN at end of week k: created <= week end < closed
+    open_from = created // 7
+    buckets["actual_open"] = _open_weeks(open_from, closed // 7, weeks)
+    # ... and overdue once due < week end
+    buckets["actual_overdue"] = _open_weeks(np.maximum(open_from, (due + 1) // 7), closed // 7, weeks)
+    # PLANNED OPEN at end of week (assume closure exactly at due_date; no early closures)
+    buckets["planned_open"] = _open_weeks(open_from, due // 7, weeks)
+    buckets["on_time_open"] = buckets["actual_open"] - buckets["actual_overdue"]
+    return buckets
+
+
+def _ranking_stats(
+    actions: pd.DataFrame,
+    effectiveness: dict[str, dict[str, Any]],
+    rules_repo: GlobalSettingsRepository,
+    date_from: date,
+    date_to: date,
+    include_unassigned: bool,
+) -> pd.DataFrame:
+    """
+    Champion ranking counters, one row per champion key (first-seen order).
+    Every predicate is evaluated on whole columns of the action frame; the
+    category rules are resolved once per distinct category.
+    """
+    actions = actions.loc[actions["active"]]
+    if not include_unassigned:
+        actions = actions.loc[actions["champion_id"].notna()]
+    created = _day_numbers(actions["created"])
+    closed = _day_numbers(actions["closed"])
+    due = _day_numbers(actions["due"])
+    cutoff = _day_number(date_to)
+
+    is_open = (created <= cutoff) & (closed > cutoff)
+    closed_in_range = (_day_number(date_from) <= closed) & (closed <= cutoff)
+    closed_with_due = closed_in_range & (due != _NO_DATE)
+
+    category_codes, categories = pd.factorize(actions["category"].fillna(""))
+    rules = [rules_repo.resolve_category_rule(category) or {} for category in categories]
+    effect_models = np.array([rule.get("effectiveness_model", "NONE") for rule in rules], dtype=object)
+    savings_models = np.array([rule.get("savings_model", "NONE") for rule in rules], dtype=object)
+    effect_model = effect_models[category_codes]
+    savings_model = savings_models[category_codes]
+
+    effects = (
+        pd.DataFrame.from_dict(effectiveness, orient="index")
+        .reindex(index=actions["action_id"], columns=["metric", "classification", "delta"])
+    )
+    expected_metric = pd.Series(effect_model).map(_EXPECTED_EFFECT_METRIC).to_numpy()
+    effect_counted = closed_in_range & (effects["metric"].to_numpy() == expected_metric)
+    auto_delta = pd.to_numeric(effects["delta"], errors="coerce").where(effects["metric"].isin(_SCRAP_COST_METRICS))
+    manual_amount = pd.to_numeric(actions["manual_savings_amount"], errors="coerce").where(
+        actions["manual_savings_currency"].fillna("").astype(str).str.upper() == "PLN"
+    )
+    impact = np.select(
+        [savings_model == "AUTO_SCRAP_COST", savings_model == "MANUAL_REQUIRED"],
+        [(-auto_delta.to_numpy()).clip(min=0.0), manual_amount.to_numpy().clip(min=0.0)],
+        0.0,
+    )
+
+    # Dense champion index (first-seen order) so every counter is one bincount.
+    champion_codes, champion_keys = pd.factorize(actions["champion_id"].fillna("").replace("", "unassigned"))
+    size = len(champion_keys)
+    overdue_now = is_open & (due < cutoff)
+    effect_effective = effect_counted & effects["classification"].isin(_EFFECTIVE_LABELS).to_numpy()
+    stats = pd.DataFrame(
+        {
+            name: np.bincount(champion_codes[mask], minlength=size)
+            for name, mask in (
+                ("open_now", is_open),
+                ("overdue_now", overdue_now),
+                ("closed_in_range", closed_in_range),
+                ("closed_with_due", closed_with_due),
+                ("closed_on_time", closed_with_due & (closed <= due)),
+                ("effectiveness_total", effect_counted),
+                ("effectiveness_effective", effect_effective),
+            )
+        },
+        index=champion_keys,
+    )
+    stats["impact_pln"] = np.bincount(
+        champion_codes[closed_in_range],
+        weights=np.nan_to_num(impact[closed_in_range]),
+        minlength=size,
+    )
+    durations = pd.Series(closed - created).where(closed_in_range)
+    stats["median_ttc"] = durations.groupby(champion_codes).median().reindex(range(size)).to_numpy()
+    return stats
+
+
+def _clamp(value: float, lower: float = 0.0, upper: float = 1.0) -> float:
+    return max(lower, min(upper, value))
 
 
 def render(con: sqlite3.Connection) -> None:
@@ -164,14 +356,13 @@ def render(con: sqlite3.Connection) -> None:
     st.caption("4 tygodnie wstecz + bieżący + 4 tygodnie w przód")
 
     repo = ActionRepository(con)
-    project_repo = ProjectRepository(con)
-    champion_repo = ChampionRepository(con)
     effectiveness_repo = EffectivenessRepository(con)
     settings_repo = SettingsRepository(con)
     rules_repo = GlobalSettingsRepository(con)
 
-    projects = project_repo.list_projects(include_counts=False)
-    champions = champion_repo.list_champions()
+    db_fingerprint = database_fingerprint(con)
+    projects = _cached_list_projects(con, db_fingerprint)
+    champions = _cached_list_champions(con, db_fingerprint)
 
     project_names = {p["id"]: (p.get("name") or p.get("project_name") or p["id"]) for p in projects}
     champion_names = {c["id"]: (c.get("display_name") or c.get("name") or c["id"]) for c in champions}
@@ -205,68 +396,41 @@ def render(con: sqlite3.Connection) -> None:
     champion_filter = None if selected_champion == "(Wszyscy)" else selected_champion
     category_filter = None if selected_category == "(Wszystkie)" else selected_category
 
-    rows = repo.list_actions_for_kpi(
-        project_id=project_filter,
-        champion_id=champion_filter,
-        category=category_filter,
+    kpi_view = _load_kpi_view(
+        con,
+        db_fingerprint,
+        project_filter,
+        champion_filter,
+        category_filter,
+        date.today(),
     )
-    actions, data_issues = _prepare_actions(rows)
-    effectiveness_map = effectiveness_repo.get_effectiveness_for_actions(
-        [str(row.get("id")) for row in rows]
-    )
-
-    today = date.today()
-    current_week_start = _current_week_start(today)
-    current_week_end = current_week_start + timedelta(days=6)
-
-    open_now = [a for a in actions if _open_at_cutoff(a, today)]
-    overdue_now = [a for a in open_now if a.due is not None and a.due < today]
-
-    created_this_week = [
-        a for a in actions if a.status != "cancelled" and current_week_start <= a.created <= current_week_end
-    ]
-    closed_this_week = [
-        a
-        for a in actions
-        if a.status != "cancelled"
-        and a.closed is not None
-        and current_week_start <= a.closed <= current_week_end
-    ]
-
+    now_frame = kpi_view["now_frame"]
+    totals = kpi_view["totals"]
+    by_champion = kpi_view["by_champion"]
+    median_close_days = kpi_view["median_close_days"]
+    data_issues = kpi_view["data_issues"]
     # On-time close rate: only actions with due_date are eligible
-    eligible_closed = [a for a in closed_this_week if a.due is not None and a.closed is not None]
-    on_time_closed = [a for a in eligible_closed if a.closed <= a.due]  # type: ignore[operator]
-
-    overdue_rate = (len(overdue_now) / len(open_now)) if open_now else None
-    on_time_rate = (len(on_time_closed) / len(eligible_closed)) if eligible_closed else None
-
-    close_durations = [(a.closed - a.created).days for a in actions if a.closed is not None]
-    median_close_days = float(median(close_durations)) if close_durations else None
+    overdue_rate = (totals["overdue_now"] / totals["open_now"]) if totals["open_now"] else None
+    on_time_rate = (
+        (totals["closed_on_time"] / totals["closed_with_due"]) if totals["closed_with_due"] else None
+    )
 
     # KPI tiles
     k1, k2, k3, k4, k5, k6 = st.columns(6)
-    k1.metric("Otwarte (teraz)", f"{len(open_now)}")
-    k2.metric("Po terminie (teraz)", f"{len(overdue_now)}")
+    k1.metric("Otwarte (teraz)", f"{totals['open_now']}")
+    k2.metric("Po terminie (teraz)", f"{totals['overdue_now']}")
     k3.metric("Overdue rate", "—" if overdue_rate is None else f"{overdue_rate:.1%}")
-    k4.metric("Utworzone w tym tyg.", f"{len(created_this_week)}")
-    k5.metric("Zamknięte w tym tyg.", f"{len(closed_this_week)}")
+    k4.metric("Utworzone w tym tyg.", f"{totals['created_week']}")
+    k5.metric("Zamknięte w tym tyg.", f"{totals['closed_week']}")
     k6.metric("On-time close rate", "—" if on_time_rate is None else f"{on_time_rate:.1%}")
 
     st.caption(f"Median time-to-close: {'—' if median_close_days is None else f'{median_close_days:.1f} dni'}")
     if data_issues:
         st.caption(f"Pominięto {data_issues} rekordów z błędną datą.")
 
-    scrap_actions = [
-        row
-        for row in rows
-        if row.get("category") == "Scrap reduction"
-        and row.get("status") == "done"
-        and row.get("closed_at")
-    ]
-    scrap_effectiveness = [
-        effectiveness_map.get(row.get("id") or "", {}).get("classification")
-        for row in scrap_actions
-    ]
+    scrap_actions = kpi_view["scrap_actions"]
+    scrap_effects = kpi_view["scrap_effects"]
+    scrap_effectiveness = [(effect or {}).get("classification") for effect in scrap_effects]
     effective_count = sum(1 for c in scrap_effectiveness if c == "effective")
     no_change_count = sum(1 for c in scrap_effectiveness if c == "no_change")
     worse_count = sum(1 for c in scrap_effectiveness if c == "worse")
@@ -282,8 +446,7 @@ def render(con: sqlite3.Connection) -> None:
     e4.metric("Effective rate", "—" if effective_rate is None else f"{effective_rate:.1%}")
 
     worse_rows: list[dict[str, Any]] = []
-    for row in scrap_actions:
-        effect = effectiveness_map.get(row.get("id") or "")
+    for row, effect in zip(scrap_actions, scrap_effects):
         if not effect or effect.get("classification") != "worse":
             continue
         pct_change = effect.get("pct_change")
@@ -312,22 +475,28 @@ def render(con: sqlite3.Connection) -> None:
 
     # Weekly chart (fixed 9 weeks)
     st.subheader("Weekly backlog (otwarte akcje na koniec tygodnia)")
-    weekly_df = _weekly_backlog(actions, today)
+    weekly_df = kpi_view["weekly_df"]
     week_order = weekly_df["week_label"].tolist()
 
+    # Long form built here so Vega gets the stacked rows directly instead of
+    # folding and relabelling the weekly frame on every browser render.
+    weekly_long = pd.concat(
+        [
+            weekly_df.assign(metric_label=label, count=weekly_df[metric])
+            for metric, label in _BACKLOG_METRIC_LABELS.items()
+        ],
+        ignore_index=True,
+    )
+
     stacked = (
-        alt.Chart(weekly_df)
-        .transform_fold(["on_time_open", "actual_overdue"], as_=["metric", "count"])
-        .transform_calculate(
-            metric_label="datum.metric == 'on_time_open' ? 'On-time open' : 'Overdue open'"
-        )
+        alt.Chart(weekly_long)
         .mark_bar()
         .encode(
             x=alt.X("week_label:N", sort=week_order, title="ISO week"),
             y=alt.Y("count:Q", title="Liczba otwartych akcji", stack="zero"),
             color=alt.Color(
                 "metric_label:N",
-                scale=alt.Scale(domain=["On-time open", "Overdue open"], range=["#4C78A8", "#E45756"]),
+                scale=_BACKLOG_COLOR_SCALE,
                 legend=alt.Legend(title=None),
             ),
             tooltip=[
@@ -359,36 +528,26 @@ def render(con: sqlite3.Connection) -> None:
     st.subheader("Champion backlog (obecny tydzień)")
     chart_col, table_col = st.columns([0.6, 0.4])
 
-    open_by_champion: dict[str, dict[str, int]] = {}
-    for a in open_now:
-        key = a.champion_id or "unassigned"
-        open_by_champion.setdefault(key, {"open": 0, "overdue": 0})
-        open_by_champion[key]["open"] += 1
-        if a.due is not None and a.due < today:
-            open_by_champion[key]["overdue"] += 1
-
-    champion_rows: list[dict[str, Any]] = []
-    for champion_id, counts in open_by_champion.items():
-        label = "Nieprzypisany" if champion_id == "unassigned" else champion_names.get(champion_id, champion_id)
-        total_open = counts["open"]
-        overdue_open = counts["overdue"]
-        champion_rows.append(
-            {"Champion": label, "type": "On-time open", "count": max(total_open - overdue_open, 0), "total": total_open}
-        )
-        champion_rows.append(
-            {"Champion": label, "type": "Overdue open", "count": overdue_open, "total": total_open}
-        )
+    open_champions = by_champion.loc[by_champion["open_now"] > 0]
+    champion_labels = _group_labels(open_champions.index, champion_names)
+    champion_open = open_champions["open_now"].to_numpy()
+    champion_overdue = open_champions["overdue_now"].to_numpy()
+    # Two stacked rows per champion: on-time share first, then the overdue share.
+    champ_df = pd.DataFrame(
+        {
+            "Champion": np.repeat(champion_labels, 2),
+            "type": np.tile(["On-time open", "Overdue open"], len(champion_labels)),
+            "count": np.column_stack([np.maximum(champion_open - champion_overdue, 0), champion_overdue]).ravel(),
+            "total": np.repeat(champion_open, 2),
+        }
+    )
 
     with chart_col:
-        if not champion_rows:
+        if champ_df.empty:
             st.info("Brak otwartych akcji dla wybranych filtrów.")
         else:
-            champ_df = pd.DataFrame(champion_rows)
-            order = (
-                champ_df.drop_duplicates("Champion")
-                .sort_values("total", ascending=False)["Champion"]
-                .tolist()
-            )
+            # Largest backlog first, read straight off the per-champion arrays.
+            order = list(dict.fromkeys(champion_labels[np.argsort(-champion_open, kind="stable")].tolist()))
             champ_chart = (
                 alt.Chart(champ_df)
                 .mark_bar()
@@ -397,7 +556,7 @@ def render(con: sqlite3.Connection) -> None:
                     y=alt.Y("Champion:N", sort=order, title=None),
                     color=alt.Color(
                         "type:N",
-                        scale=alt.Scale(domain=["On-time open", "Overdue open"], range=["#4C78A8", "#E45756"]),
+                        scale=_BACKLOG_COLOR_SCALE,
                         legend=alt.Legend(title=None),
                     ),
                     tooltip=[alt.Tooltip("Champion:N"), alt.Tooltip("type:N"), alt.Tooltip("count:Q")],
@@ -412,44 +571,27 @@ def render(con: sqlite3.Connection) -> None:
 
         if view == "Projekt":
             group_labels = project_names
-            get_key = lambda a: a.project_id or "unassigned"
+            by_group = _now_by(now_frame, "project_id")
         else:
             group_labels = champion_names
-            get_key = lambda a: a.champion_id or "unassigned"
-
-        open_by_group: dict[str, dict[str, int]] = {}
-        for a in open_now:
-            k = get_key(a)
-            open_by_group.setdefault(k, {"open": 0, "overdue": 0})
-            open_by_group[k]["open"] += 1
-            if a.due is not None and a.due < today:
-                open_by_group[k]["overdue"] += 1
-
-        closed_by_group: dict[str, int] = {}
-        for a in closed_this_week:
-            k = get_key(a)
-            closed_by_group[k] = closed_by_group.get(k, 0) + 1
-
-        rows_out: list[dict[str, Any]] = []
-        for k, counts in open_by_group.items():
-            label = "Nieprzypisany" if k == "unassigned" else group_labels.get(k, k)
-            total_open = counts["open"]
-            overdue = counts["overdue"]
-            overdue_pct = (overdue / total_open) if total_open else None
-            rows_out.append(
-                {
-                    view: label,
-                    "Open": total_open,
-                    "Overdue": overdue,
-                    "Overdue %": "—" if overdue_pct is None else f"{overdue_pct:.1%}",
-                    "Closed this week": closed_by_group.get(k, 0),
-                }
-            )
+            by_group = by_champion
 
-        if not rows_out:
+        open_groups = by_group.loc[by_group["open_now"] > 0]
+        overdue_pct = open_groups["overdue_now"] / open_groups["open_now"]
+        df_out = pd.DataFrame(
+            {
+                view: _group_labels(open_groups.index, group_labels),
+                "Open": open_groups["open_now"].to_numpy(),
+                "Overdue": open_groups["overdue_now"].to_numpy(),
+                "Overdue %": [f"{pct:.1%}" for pct in overdue_pct],
+                "Closed this week": open_groups["closed_week"].to_numpy(),
+            }
+        )
+
+        if df_out.empty:
             st.info("Brak danych KPI dla wybranych filtrów.")
         else:
-            df_out = pd.DataFrame(rows_out).sort_values("Open", ascending=False)
+            df_out = df_out.sort_values("Open", ascending=False)
             st.dataframe(df_out.head(10), use_container_width=True, height=320)
 
     with st.expander("Definicje i założenia", expanded=False):
@@ -500,87 +642,31 @@ def render(con: sqlite3.Connection) -> None:
         date_from=date_from,
         date_to=date_to,
     )
-    ranking_actions, ranking_issues = _prepare_actions(ranking_rows)
+    ranking_frame, ranking_issues = _prepare_actions(ranking_rows)
     ranking_effectiveness = effectiveness_repo.list_effectiveness_for_actions(
-        [action.action_id for action in ranking_actions]
+        ranking_frame["action_id"].tolist()
     )
 
     cutoff_date = date_to
 
-    effective_labels = {"effective", "no_scrap"}
-    champion_stats: dict[str, dict[str, Any]] = {}
-
-    def _ensure_stats(champion_key: str) -> dict[str, Any]:
-        if champion_key not in champion_stats:
-            champion_stats[champion_key] = {
-                "open_now": 0,
-                "overdue_now": 0,
-                "closed_in_range": 0,
-                "closed_with_due": 0,
-                "closed_on_time": 0,
-                "effectiveness_total": 0,
-                "effectiveness_effective": 0,
-                "impact_pln": 0.0,
-                "durations": [],
-            }
-        return champion_stats[champion_key]
-
-    for action in ranking_actions:
-        if action.status == "cancelled":
-            continue
-        if not include_unassigned and action.champion_id is None:
-            continue
-        champion_key = action.champion_id or "unassigned"
-        stats = _ensure_stats(champion_key)
-        rule = rules_repo.resolve_category_rule(action.category or "")
-        effect_model = (rule or {}).get("effectiveness_model", "NONE")
-        savings_model = (rule or {}).get("savings_model", "NONE")
-
-        if _open_at_cutoff(action, cutoff_date):
-            stats["open_now"] += 1
-            if action.due is not None and action.due < cutoff_date:
-                stats["overdue_now"] += 1
-
-        if action.closed is not None and date_from <= action.closed <= date_to:
-            stats["closed_in_range"] += 1
-            if action.due is not None:
-                stats["closed_with_due"] += 1
-                if action.closed <= action.due:
-                    stats["closed_on_time"] += 1
-            stats["durations"].append((action.closed - action.created).days)
-
-            effect_row = ranking_effectiveness.get(action.action_id)
-            metric_expected = None
-            if effect_model == "SCRAP":
-                metric_expected = "scrap_qty"
-            elif effect_model == "OEE":
-                metric_expected = "oee_pct"
-            elif effect_model == "PERFORMANCE":
-                metric_expected = "performance_pct"
-            if effect_row and metric_expected and effect_row.get("metric") == metric_expected:
-                stats["effectiveness_total"] += 1
-                if effect_row.get("classification") in effective_labels:
-                    stats["effectiveness_effective"] += 1
-            if savings_model == "AUTO_SCRAP_COST":
-                impact_delta = _impact_delta_pln(effect_row)
-                if impact_delta is not None:
-                    stats["impact_pln"] += max(0.0, -impact_delta)
-            elif savings_model == "MANUAL_REQUIRED":
-                manual_amount = action.manual_savings_amount
-                if isinstance(manual_amount, (int, float)):
-                    if (action.manual_savings_currency or "").upper() == "PLN":
-                        stats["impact_pln"] += max(0.0, float(manual_amount))
-
+    stats_frame = _ranking_stats(
+        ranking_frame,
+        ranking_effectiveness,
+        rules_repo,
+        date_from,
+        date_to,
+        include_unassigned,
+    )
     if show_inactive:
-        for champ in champions:
-            champ_id = champ.get("id")
-            if champ_id:
-                _ensure_stats(champ_id)
+        inactive = [c["id"] for c in champions if c.get("id") and c["id"] not in stats_frame.index]
+        stats_frame = stats_frame.reindex(stats_frame.index.append(pd.Index(inactive)))
+        stats_frame = stats_frame.fillna({col: 0 for col in stats_frame.columns if col != "median_ttc"})
+    champion_stats = stats_frame.to_dict("index")
 
     ranking_rows_out: list[dict[str, Any]] = []
     breakdown_rows: list[dict[str, Any]] = []
 
-    for champion_id, stats in champion_stats.items():
+    for stats, label in zip(champion_stats.values(), _group_labels(stats_frame.index, champion_names)):
         if not show_inactive and not (
             stats["open_now"] or stats["overdue_now"] or stats["closed_in_range"]
         ):
@@ -596,9 +682,7 @@ def render(con: sqlite3.Connection) -> None:
             if stats["effectiveness_total"]
             else None
         )
-        median_ttc = (
-            float(median(stats["durations"])) if stats["durations"] else None
-        )
+        median_ttc = None if pd.isna(stats["median_ttc"]) else float(stats["median_ttc"])
         impact_pln = float(stats["impact_pln"])
 
         impact_points = 40 * _clamp(impact_pln / IMPACT_TARGET_PLN)
@@ -613,11 +697,6 @@ def render(con: sqlite3.Connection) -> None:
             upper=100.0,
         )
 
-        label = (
-            "Nieprzypisany"
-            if champion_id == "unassigned"
-            else champion_names.get(champion_id, champion_id)
-        )
         ranking_rows_out.append(
             {
                 "Champion": label,
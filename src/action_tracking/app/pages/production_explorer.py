@@ -35,6 +35,8 @@ from action_tracking.services.production_outcome import (
     load_daily_frames,
     metric_delta_label,
     scrap_delta_badge,
+    sorted_group_sum,
+    weighted_group_mean,
 )
 from action_tracking.services.workcenter_classifier import (
     KPI_COMPONENTS,
@@ -46,21 +48,6 @@ from action_tracking.services.workcenter_classifier import (
 )
 
 
-def _weighted_or_mean(values: pd.Series, weights: pd.Series | None) -> float | None:
-    if values.empty:
-        return None
-    if weights is None or weights.empty:
-        mean_value = values.mean()
-        return None if pd.isna(mean_value) else float(mean_value)
-    weights = weights.fillna(0)
-    valid_weights = weights.where(values.notna(), 0)
-    if valid_weights.sum() > 0:
-        weighted_values = values.fillna(0) * weights
-        return float(weighted_values.sum() / valid_weights.sum())
-    mean_value = values.mean()
-    return None if pd.isna(mean_value) else float(mean_value)
-
-
 def _weekly_bucket(df: pd.DataFrame, date_col: str = "metric_date") -> pd.Series:
     return df[date_col].dt.to_period("W-MON").apply(lambda period: period.start_time)
 
@@ -82,13 +69,10 @@ def _weekly_scrap_aggregation(scrap_df: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(columns=["metric_date", "scrap_qty_sum", "scrap_pln_sum"])
     temp = scrap_df.copy()
     temp["metric_date"] = _weekly_bucket(temp)
-    return (
-        temp.groupby("metric_date", as_index=False)
-        .agg(
-            scrap_qty_sum=("scrap_qty", "sum"),
-            scrap_pln_sum=("scrap_cost_amount", "sum"),
-        )
-        .sort_values("metric_date")
+    return sorted_group_sum(
+        temp,
+        "metric_date",
+        {"scrap_qty": "scrap_qty_sum", "scrap_cost_amount": "scrap_pln_sum"},
     )
 
 
@@ -97,22 +81,10 @@ def _weekly_kpi_aggregation(kpi_df: pd.DataFrame) -> pd.DataFrame:
         return pd.DataFrame(columns=["metric_date", "oee_avg", "performance_avg"])
     temp = kpi_df.copy()
     temp["metric_date"] = _weekly_bucket(temp)
-    return (
-        temp.groupby("metric_date")
-        .apply(
-            lambda group: pd.Series(
-                {
-                    "oee_avg": _weighted_or_mean(
-                        group["oee_pct"], group.get("worktime_min")
-                    ),
-                    "performance_avg": _weighted_or_mean(
-                        group["performance_pct"], group.get("worktime_min")
-                    ),
-                }
-            )
-        )
-        .reset_index()
-        .sort_values("metric_date")
+    return weighted_group_mean(
+        temp,
+        "metric_date",
+        {"oee_pct": "oee_avg", "performance_pct": "performance_avg"},
     )
 
 
@@ -586,11 +558,17 @@ def render(con: sqlite3.Connection) -> None:
     if not scrap_df.empty:
         scrap_df["metric_date"] = pd.to_datetime(scrap_df["metric_date"], errors="coerce")
         scrap_df = scrap_df.dropna(subset=["metric_date"])
+        # Repeated labels as categoricals: groupby works on integer codes.
+        for column in ("work_center", "scrap_cost_currency"):
+            if column in scrap_df.columns:
+                scrap_df[column] = scrap_df[column].astype("category")
 
     kpi_df = pd.DataFrame(kpi_rows)
     if not kpi_df.empty:
         kpi_df["metric_date"] = pd.to_datetime(kpi_df["metric_date"], errors="coerce")
         kpi_df = kpi_df.dropna(subset=["metric_date"])
+        if "work_center" in kpi_df.columns:
+            kpi_df["work_center"] = kpi_df["work_center"].astype("category")
 
     if active_full_project:
         totals_rows = production_repo.list_scrap_daily(
@@ -955,7 +933,7 @@ def render(con: sqlite3.Connection) -> None:
             st.caption("Brak danych scrap dla wybranego zakresu.")
         else:
             scrap_currency_view = (
-                scrap_df.groupby(["metric_date", "scrap_cost_currency"], as_index=False)
+                scrap_df.groupby(["metric_date", "scrap_cost_currency"], as_index=False, observed=True)
                 .agg(scrap_cost_amount=("scrap_cost_amount", "sum"))
                 .sort_values(["metric_date", "scrap_cost_currency"])
             )
@@ -8,6 +8,7 @@ from typing import Any
 import pandas as pd
 import streamlit as st
 
+from action_tracking.data.db import database_fingerprint
 from action_tracking.data.repositories import (
     ChampionRepository,
     ProductionDataRepository,
@@ -73,15 +74,25 @@ def _format_changes(
 
 
 def _build_work_center_map(work_centers: list[str]) -> dict[str, list[str]]:
-    mapping: dict[str, list[str]] = {}
+    # dict keys as an insertion-ordered set: O(1) dedupe, first spelling stays first.
+    mapping: dict[str, dict[str, None]] = {}
     for work_center in work_centers:
         normalized = normalize_wc(work_center)
         if not normalized:
             continue
-        mapping.setdefault(normalized, [])
-        if work_center not in mapping[normalized]:
-            mapping[normalized].append(work_center)
-    return mapping
+        mapping.setdefault(normalized, {})[work_center] = None
+    return {normalized: list(spellings) for normalized, spellings in mapping.items()}
+
+
+@st.cache_data(ttl=300, show_spinner=False, hash_funcs={sqlite3.Connection: lambda _: "sqlite"})
+def _cached_production_work_centers(
+    con: sqlite3.Connection,
+    db_fingerprint: tuple[int, ...] | None,
+) -> tuple[list[str], dict[str, list[str]]]:
+    """Sorted production work centers and their normalized-key map."""
+    wc_lists = ProductionDataRepository(con).list_distinct_work_centers()
+    all_prod_wcs = sorted(set(wc_lists.get("scrap_work_centers", []) + wc_lists.get("kpi_work_centers", [])))
+    return all_prod_wcs, _build_work_center_map(all_prod_wcs)
 
 
 def _resolve_work_center_default(
@@ -139,9 +150,9 @@ def render(con: sqlite3.Connection) -> None:
     projects_by_id = {p["id"]: p for p in projects}
     project_wc_norms = project_repo.list_project_work_centers_norms(include_related=True)
 
-    wc_lists = production_repo.list_distinct_work_centers()
-    all_prod_wcs = sorted(set(wc_lists.get("scrap_work_centers", []) + wc_lists.get("kpi_work_centers", [])))
-    prod_work_center_map = _build_work_center_map(all_prod_wcs)
+    all_prod_wcs, prod_work_center_map = _cached_production_work_centers(
+        con, database_fingerprint(con)
+    )
     prod_work_center_keys = set(prod_work_center_map)
 
     production_stats = production_repo.list_production_work_centers_with_stats()
@@ -1,10 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+import logging
 from pathlib import Path
 import sqlite3
+from typing import Any, Callable
 from uuid import uuid4
 
+_LOGGER = logging.getLogger(__name__)
+
 SCHEMA_SQL = """
 PRAGMA foreign_keys = ON;
 
@@ -154,6 +159,16 @@ CREATE TABLE IF NOT EXISTS wc_inbox (
 CREATE INDEX IF NOT EXISTS idx_wc_inbox_status
   ON wc_inbox (status);
 
+CREATE TABLE IF NOT EXISTS diag_cache (
+  key TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  payload BLOB NOT NULL,
+  created_at INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_diag_cache_kind_created
+  ON diag_cache (kind, created_at);
+
 CREATE TABLE IF NOT EXISTS action_effectiveness (
   id TEXT PRIMARY KEY,
   action_id TEXT NOT NULL UNIQUE,
@@ -237,13 +252,111 @@ CREATE TABLE IF NOT EXISTS analysis_changelog (
 
 
 def connect(db_path: Path) -> sqlite3.Connection:
+    """
+    Read-tuned read/write connection (WAL, synchronous=NORMAL, mmap).
+    Writers should batch rows into one transaction (executemany + a single
+    commit, as the production upserts do) so WAL stays small and readers
+    are not stalled by per-row commits.
+    """
     db_path.parent.mkdir(parents=True, exist_ok=True)
     con = sqlite3.connect(db_path.as_posix())
     con.row_factory = sqlite3.Row
     con.execute("PRAGMA foreign_keys=ON;")
+    try:
+        # WAL + in-memory temp tables + mmap/page cache for the dashboard reads.
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA busy_timeout = 5000;")
+        con.execute("PRAGMA synchronous = NORMAL;")
+        con.execute("PRAGMA temp_store = MEMORY;")
+        con.execute("PRAGMA mmap_size = 268435456;")
+        con.execute("PRAGMA cache_size = -65536;")
+        # Refresh planner statistics only for tables that need it; bounded scan.
+        con.execute("PRAGMA analysis_limit = 400;")
+        con.execute("PRAGMA optimize = 0x10002;")
+    except sqlite3.Error:
+        pass
     return con
 
 
+def connect_readonly(db_path: Path) -> sqlite3.Connection:
+    """
+    Read-only connection for dashboard query workers (query_only, larger page cache).
+    """
+    con = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA query_only = 1;")
+    con.execute("PRAGMA busy_timeout = 5000;")
+    con.execute("PRAGMA mmap_size = 268435456;")
+    con.execute("PRAGMA cache_size = -65536;")
+    return con
+
+
+def database_file(con: sqlite3.Connection) -> str | None:
+    """Path of the main database file, or None for in-memory databases."""
+    try:
+        row = con.execute("PRAGMA database_list;").fetchone()
+    except sqlite3.Error:
+        return None
+    return (row[2] if row else "") or None
+
+
+def run_read_queries(
+    con: sqlite3.Connection,
+    repository_cls: Callable[[sqlite3.Connection], Any],
+    queries: tuple[Callable[[Any], Any], ...],
+) -> tuple[Any, ...]:
+    """
+    Run independent read queries concurrently, each worker on its own
+    read-only connection wrapped in `repository_cls`. In-memory databases
+    cannot be reopened, so they (and any worker failure) run sequentially on `con`.
+    """
+    db_file = database_file(con)
+    if db_file:
+
+        def _run(query: Callable[[Any], Any]) -> Any:
+            worker_con = connect_readonly(Path(db_file))
+            try:
+                return query(repository_cls(worker_con))
+            finally:
+                worker_con.close()
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+                return tuple(executor.map(_run, queries))
+        except sqlite3.Error:
+            _LOGGER.warning(
+                "Concurrent read queries failed; rerunning on the main connection.",
+                exc_info=True,
+            )
+    repo = repository_cls(con)
+    return tuple(query(repo) for query in queries)
+
+
+def database_fingerprint(con: sqlite3.Connection) -> tuple[int, ...] | None:
+    """
+    Cheap change marker for cache keys: mtime/size of the DB file and its WAL.
+    In-memory databases have no file, so their marker is the connection's
+    write counters (data_version for other connections' commits,
+    total_changes for its own writes). None only if SQLite cannot be queried.
+    """
+    db_file = database_file(con)
+    if not db_file:
+        try:
+            row = con.execute("PRAGMA data_version;").fetchone()
+        except sqlite3.Error:
+            return None
+        return (int(row[0]), con.total_changes)
+    parts: list[int] = []
+    for candidate in (Path(db_file), Path(f"{db_file}-wal")):
+        try:
+            stat = candidate.stat()
+        except OSError:
+            parts.extend((0, 0))
+            continue
+        parts.extend((stat.st_mtime_ns, stat.st_size))
+    return tuple(parts)
+
+
 def _get_user_version(con: sqlite3.Connection) -> int:
     row = con.execute("PRAGMA user_version;").fetchone()
     return int(row[0]) if row else 0
@@ -732,6 +845,75 @@ def _migrate_to_v18(con: sqlite3.Connection) -> None:
     _set_user_version(con, 18)
 
 
+def _migrate_to_v19(con: sqlite3.Connection) -> None:
+    if _table_exists(con, "actions"):
+        generated = {
+            row[1] for row in con.execute("PRAGMA table_xinfo(actions);").fetchall()
+        }
+        if "ttc_days" not in generated:
+            try:
+                # Virtual: SQLite cannot ADD a STORED generated column.
+                con.execute(
+                    """
+                    ALTER TABLE actions ADD COLUMN ttc_days INTEGER
+                      GENERATED ALWAYS AS (
+                        CAST(julianday(date(closed_at)) - julianday(date(created_at)) AS INTEGER)
+                      ) VIRTUAL;
+                    """
+                )
+            except sqlite3.Error:
+                # SQLite < 3.31 has no generated columns; ranking computes it inline.
+                pass
+        con.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_actions_ranking
+              ON actions (owner_champion_id, status, closed_at, created_at, due_date, category);
+            """
+        )
+    _set_user_version(con, 19)
+
+
+def _migrate_to_v20(con: sqlite3.Connection) -> None:
+    # Explorer filters by work_center IN (...) plus a date range; the UNIQUE
+    # autoindexes lead with metric_date, so these serve the range scan.
+    if _table_exists(con, "scrap_daily"):
+        con.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_scrap_daily_wc_date
+              ON scrap_daily (work_center, metric_date, scrap_cost_currency, scrap_qty, scrap_cost_amount);
+            """
+        )
+    if _table_exists(con, "production_kpi_daily"):
+        con.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_kpi_daily_wc_date
+              ON production_kpi_daily (work_center, metric_date);
+            """
+        )
+    con.execute("ANALYZE;")
+    _set_user_version(con, 20)
+
+
+def _migrate_to_v21(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS diag_cache (
+          key TEXT PRIMARY KEY,
+          kind TEXT NOT NULL,
+          payload BLOB NOT NULL,
+          created_at INTEGER NOT NULL
+        );
+        """
+    )
+    con.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_diag_cache_kind_created
+          ON diag_cache (kind, created_at);
+        """
+    )
+    _set_user_version(con, 21)
+
+
 def _seed_action_categories(con: sqlite3.Connection) -> None:
     if not _table_exists(con, "action_categories"):
         return
@@ -834,6 +1016,30 @@ def _seed_category_rules(con: sqlite3.Connection) -> None:
     )
 
 
+def _migrate_to_v22(con: sqlite3.Connection) -> None:
+    # High Risk bulk reads filter full_project IN (...) plus a date range and
+    # order by (full_project, metric_date, work_center); these replace the v17
+    # two-column indexes, covering the order and the scrap columns read.
+    if _table_exists(con, "scrap_daily"):
+        con.execute("DROP INDEX IF EXISTS idx_scrap_daily_full_project_date;")
+        con.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_scrap_daily_fp_date
+              ON scrap_daily (full_project, metric_date, work_center, scrap_cost_currency, scrap_qty, scrap_cost_amount);
+            """
+        )
+    if _table_exists(con, "production_kpi_daily"):
+        con.execute("DROP INDEX IF EXISTS idx_kpi_daily_full_project_date;")
+        con.execute(
+            """
+            CREATE INDEX IF NOT EXISTS idx_kpi_daily_fp_date
+              ON production_kpi_daily (full_project, metric_date, work_center);
+            """
+        )
+    con.execute("ANALYZE;")
+    _set_user_version(con, 22)
+
+
 def init_db(con: sqlite3.Connection) -> None:
     con.executescript(SCHEMA_SQL)
     current_version = _get_user_version(con)
@@ -871,6 +1077,14 @@ def init_db(con: sqlite3.Connection) -> None:
         _migrate_to_v17(con)
     if current_version < 18:
         _migrate_to_v18(con)
+    if current_version < 19:
+        _migrate_to_v19(con)
+    if current_version < 20:
+        _migrate_to_v20(con)
+    if current_version < 21:
+        _migrate_to_v21(con)
+    if current_version < 22:
+        _migrate_to_v22(con)
     _seed_action_categories(con)
     _seed_category_rules(con)
     con.commit()
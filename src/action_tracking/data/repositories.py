@@ -2,12 +2,17 @@ from __future__ import annotations
 
 import json
 import sqlite3
+import time
+import zlib
 from datetime import date, datetime, timezone
+from itertools import compress, islice, repeat
+from pathlib import Path
 from typing import Any
 from uuid import uuid4
 
+from action_tracking.data.db import connect, database_file
 from action_tracking.services.metrics_scale import normalize_kpi_percent
-from action_tracking.services.workcenter_classifier import filter_rows_by_areas
+from action_tracking.services.workcenter_classifier import classify_wc_area, filter_rows_by_areas
 
 # =====================================================
 # OPTIONAL IMPORTS (never crash if modules moved / missing)
@@ -120,24 +125,9 @@ except Exception:  # pragma: no cover
 # HELPERS
 # =====================================================
 
-_CONFIGURED_CONNECTIONS: set[int] = set()
-
-
-def _configure_sqlite_connection(con: sqlite3.Connection) -> None:
-    """
-    Apply SQLite settings once per connection to reduce lock contention.
-    WAL + busy_timeout are safe defaults for Streamlit reruns.
-    """
-    con_id = id(con)
-    if con_id in _CONFIGURED_CONNECTIONS:
-        return
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-        con.execute("PRAGMA busy_timeout = 5000;")
-    except sqlite3.Error:
-        # Defensive: do not block app startup if pragmas are unsupported.
-        return
-    _CONFIGURED_CONNECTIONS.add(con_id)
+# Champions ranking: owner key for actions without champion + scrap-cost metrics used as PLN impact.
+RANKING_UNASSIGNED_KEY = "unassigned"
+RANKING_IMPACT_METRICS = frozenset({"scrap_cost", "scrap_pln", "scrap_cost_pln", "scrap_cost_amount"})
 
 
 def _rollback_safely(con: sqlite3.Connection) -> None:
@@ -167,6 +157,15 @@ def _table_columns(con: sqlite3.Connection, table: str) -> set[str]:
         return set()
 
 
+def _generated_columns(con: sqlite3.Connection, table: str) -> set[str]:
+    """Generated columns (hidden from PRAGMA table_info)."""
+    try:
+        cur = con.execute(f"PRAGMA table_xinfo({table})")
+        return {r[1] for r in cur.fetchall() if r[6] in (2, 3)}
+    except sqlite3.Error:
+        return set()
+
+
 def _ensure_column(
     con: sqlite3.Connection,
     table: str,
@@ -208,6 +207,64 @@ def _normalize_percent(value: Any) -> float | None:
     return normalize_kpi_percent(value)
 
 
+_KPI_PERCENT_COLUMNS = ("performance_pct", "oee_pct", "availability_pct", "quality_pct")
+
+
+def _sql_normalized_percent(column: str) -> str:
+    """SQL counterpart of normalize_kpi_percent for numeric column values."""
+    return f"""
+        CASE WHEN typeof({column}) IN ('integer', 'real') THEN
+            CASE WHEN {column} BETWEEN 0 AND 1.5 THEN {column} * 100
+                 WHEN {column} > 1.5 AND {column} <= 200 THEN {column}
+            END
+        END
+    """
+
+
+def _fetch_columns(
+    con: sqlite3.Connection,
+    query: str,
+    params: list[Any],
+) -> dict[str, tuple[Any, ...]]:
+    """
+    Run a SELECT and return {column: values} (plain tuples, no per-row dicts);
+    {} when nothing matches. Suited for DataFrame construction.
+    """
+    cur = con.cursor()
+    cur.row_factory = None
+    cur.execute(query, params)
+    rows = cur.fetchall()
+    if not rows:
+        return {}
+    return {col[0]: values for col, values in zip(cur.description, zip(*rows))}
+
+
+# Keys bound per IN (...) list; stays below SQLite's historical 999-variable limit.
+_BULK_KEYS_CHUNK = 500
+
+
+def _chunked(values: list[Any], size: int) -> list[list[Any]]:
+    it = iter(values)
+    return list(iter(lambda: list(islice(it, size)), []))
+
+
+def _filter_columns_by_areas(
+    columns: dict[str, tuple[Any, ...]],
+    areas: set[str] | None,
+) -> dict[str, tuple[Any, ...]]:
+    """filter_rows_by_areas for column-wise rows; each distinct work center is classified once."""
+    if not areas or not columns:
+        return columns
+    work_centers = columns["work_center"]
+    allowed = {wc for wc in set(work_centers) if classify_wc_area(wc or "") in areas}
+    keep = [wc in allowed for wc in work_centers]
+    if all(keep):
+        return columns
+    if not any(keep):
+        return {}
+    return {name: tuple(compress(values, keep)) for name, values in columns.items()}
+
+
 def _normalize_int(value: Any, default: int | None = None) -> int | None:
     if value in (None, ""):
         return default
@@ -319,6 +376,7 @@ def _list_changelog_generic(
     table_candidates: list[str],
     limit: int = 50,
     entity_id: str | None = None,
+    json_fields: tuple[str, ...] = (),
 ) -> list[dict[str, Any]]:
     """
     Uniwersalny reader changelogów.
@@ -327,9 +385,13 @@ def _list_changelog_generic(
       - entry["event_at"]
       - entry["event_type"]
       - entry["changes_json"]  (JSON string)
+      - entry["changes"]       (sparsowany changes_json)
 
     Dlatego ZAWSZE zwracamy te klucze, nawet jeśli DB ma inne nazwy kolumn.
     Jeśli tabela/kolumny nie istnieją -> [] (bez crasha UI).
+
+    json_fields: pola tekstowe wyciągane po stronie SQLite (json_extract)
+    z changes_json, gdy tabela nie ma takiej kolumny.
     """
     if not table_candidates:
         return []
@@ -397,26 +459,49 @@ def _list_changelog_generic(
     selected_cols = [c for c in preferred if c in cols]
     select_sql = ", ".join(selected_cols) if selected_cols else "*"
 
-    query = f"SELECT {select_sql} FROM {table}"
+    extracted_cols: list[str] = []
+    if "changes_json" in cols:
+        for field in json_fields:
+            if field in cols:
+                continue
+            path = f"'$.{field}'"
+            extracted_cols.append(
+                f"CASE WHEN json_valid(changes_json) AND json_type(changes_json, {path}) = 'text' "
+                f"THEN json_extract(changes_json, {path}) END AS {field}"
+            )
+
+    tail = ""
     params: list[Any] = []
 
     if entity_id and entity_col:
-        query += f" WHERE {entity_col} = ?"
+        tail += f" WHERE {entity_col} = ?"
         params.append(entity_id)
 
     if time_col:
-        query += f" ORDER BY {time_col} DESC"
+        tail += f" ORDER BY {time_col} DESC"
     else:
-        query += " ORDER BY rowid DESC"
+        tail += " ORDER BY rowid DESC"
 
-    query += " LIMIT ?"
+    tail += " LIMIT ?"
     params.append(int(limit))
 
-    try:
-        cur = con.execute(query, params)
-        rows = [dict(r) for r in cur.fetchall()]
-    except sqlite3.Error:
-        return []
+    rows: list[dict[str, Any]] | None = None
+    if extracted_cols:
+        try:
+            cur = con.execute(
+                f"SELECT {select_sql}, {', '.join(extracted_cols)} FROM {table}{tail}",
+                params,
+            )
+            rows = [dict(r) for r in cur.fetchall()]
+        except sqlite3.Error:
+            # SQLite without JSON1 -> fall back to the plain select.
+            rows = None
+    if rows is None:
+        try:
+            cur = con.execute(f"SELECT {select_sql} FROM {table}{tail}", params)
+            rows = [dict(r) for r in cur.fetchall()]
+        except sqlite3.Error:
+            return []
 
     def _ensure_str_json(value: Any) -> str:
         if value is None:
@@ -510,7 +595,6 @@ def _list_changelog_generic(
 class SettingsRepository:
     def __init__(self, con: sqlite3.Connection) -> None:
         self.con = con
-        _configure_sqlite_connection(self.con)
         self._ensure_production_schema()
 
     def _ensure_production_schema(self) -> None:
@@ -518,13 +602,13 @@ class SettingsRepository:
         _ensure_column(self.con, "production_kpi_daily", "full_project", "TEXT")
         _ensure_index(
             self.con,
-            "CREATE INDEX IF NOT EXISTS idx_scrap_daily_full_project_date "
-            "ON scrap_daily (full_project, metric_date);",
+            "CREATE INDEX IF NOT EXISTS idx_scrap_daily_fp_date "
+            "ON scrap_daily (full_project, metric_date, work_center, scrap_cost_currency, scrap_qty, scrap_cost_amount);",
         )
         _ensure_index(
             self.con,
-            "CREATE INDEX IF NOT EXISTS idx_kpi_daily_full_project_date "
-            "ON production_kpi_daily (full_project, metric_date);",
+            "CREATE INDEX IF NOT EXISTS idx_kpi_daily_fp_date "
+            "ON production_kpi_daily (full_project, metric_date, work_center);",
         )
 
     def list_action_categories(self, active_only: bool = True) -> list[dict[str, Any]]:
@@ -733,12 +817,15 @@ class GlobalSettingsRepository:
             except sqlite3.Error:
                 return [self._normalize_category_rule_row(r) for r in _default_category_rules_list(include_inactive)]
 
+    def get_category_rule_map(self) -> dict[str, dict[str, Any]]:
+        """Active category rules keyed by normalized category label."""
+        rules = self.get_category_rules(only_active=True)
+        return {normalize_key(r.get("category_label") or ""): r for r in rules}
+
     def resolve_category_rule(self, category_label: str) -> dict[str, Any] | None:
         if not category_label:
             return None
-        rules = self.get_category_rules(only_active=True)
-        rules_map = {normalize_key(r.get("category_label") or ""): r for r in rules}
-        return rules_map.get(normalize_key(category_label))
+        return self.get_category_rule_map().get(normalize_key(category_label))
 
     # --- Admin / internal CRUD (used by configurable overlays/settings) ---
     def list_category_rules(self, include_inactive: bool = False) -> list[dict[str, Any]]:
@@ -1080,7 +1167,6 @@ class NotificationRepository:
 class ActionRepository:
     def __init__(self, con: sqlite3.Connection) -> None:
         self.con = con
-        _configure_sqlite_connection(self.con)
         _ensure_column(self.con, "actions", "area", "TEXT")
 
     def list_actions(
@@ -1640,7 +1726,6 @@ class ActionRepository:
             return action_id
         vals = [payload.get(c) for c in insert_cols]
         placeholders = ", ".join(["?"] * len(insert_cols))
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute(
                 f"INSERT INTO actions ({', '.join(insert_cols)}) VALUES ({placeholders})",
@@ -1791,7 +1876,6 @@ class ActionRepository:
 
         params.append(action_id)
         sql = f"UPDATE actions SET {', '.join(sets)} WHERE id = ?"
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute(sql, params)
             self.con.commit()
@@ -1804,7 +1888,6 @@ class ActionRepository:
             return
         if not _table_exists(self.con, "actions"):
             return
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute("BEGIN")
 
@@ -1920,13 +2003,13 @@ class ActionRepository:
             return value
         if isinstance(value, datetime):
             return value.date()
+        text = str(value)
         try:
-            return date.fromisoformat(str(value))
-        except ValueError:
-            try:
-                return datetime.fromisoformat(str(value)).date()
-            except ValueError as exc_two:
-                raise ValueError(f"Invalid date for {field_name}") from exc_two
+            if len(text) > 10:
+                return datetime.fromisoformat(text).date()
+            return date.fromisoformat(text)
+        except ValueError as exc:
+            raise ValueError(f"Invalid date for {field_name}") from exc
 
     def list_actions_for_kpi(
         self,
@@ -1963,19 +2046,7 @@ class ActionRepository:
             SELECT {", ".join(select_fields)}
             FROM actions a
         """
-        filters: list[str] = []
-        params: list[Any] = []
-        if "is_draft" in action_cols:
-            filters.append("a.is_draft = 0")
-        if project_id and "project_id" in action_cols:
-            filters.append("project_id = ?")
-            params.append(project_id)
-        if champion_id and "owner_champion_id" in action_cols:
-            filters.append("owner_champion_id = ?")
-            params.append(champion_id)
-        if category and "category" in action_cols:
-            filters.append("category = ?")
-            params.append(category)
+        filters, params = self._kpi_filters(action_cols, project_id, champion_id, category)
         if filters:
             query += " WHERE " + " AND ".join(filters)
         try:
@@ -1987,19 +2058,124 @@ class ActionRepository:
             _parse_impact_aspects_row(row)
         return rows
 
+    @staticmethod
+    def _kpi_filters(
+        action_cols: set[str],
+        project_id: str | None,
+        champion_id: str | None,
+        category: str | None,
+    ) -> tuple[list[str], list[Any]]:
+        filters: list[str] = []
+        params: list[Any] = []
+        if "is_draft" in action_cols:
+            filters.append("a.is_draft = 0")
+        if project_id and "project_id" in action_cols:
+            filters.append("a.project_id = ?")
+            params.append(project_id)
+        if champion_id and "owner_champion_id" in action_cols:
+            filters.append("a.owner_champion_id = ?")
+            params.append(champion_id)
+        if category and "category" in action_cols:
+            filters.append("a.category = ?")
+            params.append(category)
+        return filters, params
+
+    @staticmethod
+    def _ranking_filters(
+        action_cols: set[str],
+        project_id: str | None,
+        category: str | None,
+        date_from: date | None,
+        date_to: date | None,
+        champion_id: str | None = None,
+    ) -> tuple[list[str], list[Any]]:
+        filters: list[str] = []
+        params: list[Any] = []
+        if "created_at" in action_cols:
+            filters.append("a.created_at IS NOT NULL")
+        if "is_draft" in action_cols:
+            filters.append("a.is_draft = 0")
+        if project_id and "project_id" in action_cols:
+            filters.append("a.project_id = ?")
+            params.append(project_id)
+        if category and "category" in action_cols:
+            filters.append("a.category = ?")
+            params.append(category)
+        if champion_id and "owner_champion_id" in action_cols:
+            if champion_id == RANKING_UNASSIGNED_KEY:
+                filters.append("a.owner_champion_id IS NULL")
+            else:
+                filters.append("a.owner_champion_id = ?")
+                params.append(champion_id)
+        if date_to and "created_at" in action_cols:
+            filters.append("date(a.created_at) <= date(?)")
+            params.append(date_to.isoformat())
+        if date_from and "created_at" in action_cols:
+            if "closed_at" in action_cols:
+                filters.append(
+                    "(date(a.created_at) >= date(?) OR (a.closed_at IS NOT NULL AND date(a.closed_at) >= date(?)))"
+                )
+                params.extend([date_from.isoformat(), date_from.isoformat()])
+            else:
+                filters.append("date(a.created_at) >= date(?)")
+                params.append(date_from.isoformat())
+        return filters, params
+
     def list_actions_for_ranking(
         self,
         project_id: str | None = None,
         category: str | None = None,
         date_from: date | None = None,
         date_to: date | None = None,
+        champion_id: str | None = None,
     ) -> list[dict[str, Any]]:
+        """champion_id narrows rows to one owner (RANKING_UNASSIGNED_KEY -> no owner)."""
+        columns, rows = self.list_actions_for_ranking_columns(
+            project_id, category, date_from, date_to, champion_id
+        )
+        return [dict(zip(columns, row)) for row in rows]
+
+    def list_actions_for_ranking_columns(
+        self,
+        project_id: str | None = None,
+        category: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        champion_id: str | None = None,
+    ) -> tuple[list[str], list[tuple[Any, ...]]]:
+        """
+        Same rows as list_actions_for_ranking as (column names, plain tuples),
+        for callers that load them column-wise (e.g. DataFrame.from_records).
+        """
+        query_params = self._ranking_rows_query(
+            project_id, category, date_from, date_to, champion_id
+        )
+        if query_params is None:
+            return [], []
+        query, params = query_params
+        try:
+            cur = self.con.cursor()
+            cur.row_factory = None
+            cur.execute(query, params)
+            rows = cur.fetchall()
+        except sqlite3.Error:
+            return [], []
+        return [col[0] for col in cur.description], rows
+
+    def _ranking_rows_query(
+        self,
+        project_id: str | None,
+        category: str | None,
+        date_from: date | None,
+        date_to: date | None,
+        champion_id: str | None,
+    ) -> tuple[str, list[Any]] | None:
         if not _table_exists(self.con, "actions"):
-            return []
+            return None
 
         action_cols = _table_columns(self.con, "actions")
         if not action_cols:
-            return []
+            return None
 
         select_fields = []
         for col in (
@@ -2044,38 +2220,209 @@ class ActionRepository:
             FROM actions a
             {' '.join(joins)}
         """
-        filters: list[str] = []
-        params: list[Any] = []
-        if "created_at" in action_cols:
-            filters.append("a.created_at IS NOT NULL")
-        if "is_draft" in action_cols:
-            filters.append("a.is_draft = 0")
-        if project_id and "project_id" in action_cols:
-            filters.append("a.project_id = ?")
-            params.append(project_id)
-        if category and "category" in action_cols:
-            filters.append("a.category = ?")
-            params.append(category)
-        if date_to and "created_at" in action_cols:
-            filters.append("date(a.created_at) <= date(?)")
-            params.append(date_to.isoformat())
-        if date_from and "created_at" in action_cols:
-            if "closed_at" in action_cols:
-                filters.append(
-                    "(date(a.created_at) >= date(?) OR (a.closed_at IS NOT NULL AND date(a.closed_at) >= date(?)))"
-                )
-                params.extend([date_from.isoformat(), date_from.isoformat()])
-            else:
-                filters.append("date(a.created_at) >= date(?)")
-                params.append(date_from.isoformat())
+        filters, params = self._ranking_filters(
+            action_cols, project_id, category, date_from, date_to, champion_id
+        )
         if filters:
             query += " WHERE " + " AND ".join(filters)
+        return query, params
+
+    def _ranking_scope_cte(
+        self,
+        project_id: str | None,
+        category: str | None,
+        date_from: date | None,
+        date_to: date | None,
+        include_unassigned: bool,
+    ) -> tuple[str, list[Any]] | None:
+        """
+        CTE "ranked" with one row per rankable action (valid created date,
+        not cancelled) and is_open / is_closed window flags, matching the
+        champions ranking methodology.
+        """
+        if not _table_exists(self.con, "actions"):
+            return None
+        action_cols = _table_columns(self.con, "actions")
+        required = {"owner_champion_id", "status", "created_at", "closed_at"}
+        if not required.issubset(action_cols):
+            return None
+
+        def _col(name: str) -> str:
+            return f"a.{name}" if name in action_cols else "NULL"
+
+        joins: list[str] = []
+        metric_expr = "NULL"
+        delta_expr = "NULL"
+        if _table_exists(self.con, "action_effectiveness"):
+            eff_cols = _table_columns(self.con, "action_effectiveness")
+            if "action_id" in eff_cols:
+                joins.append("LEFT JOIN action_effectiveness ae ON ae.action_id = a.id")
+                metric_expr = "ae.metric" if "metric" in eff_cols else "NULL"
+                delta_expr = "ae.delta" if "delta" in eff_cols else "NULL"
+
+        if "ttc_days" in _generated_columns(self.con, "actions"):
+            ttc_expr = "a.ttc_days"
+        else:
+            ttc_expr = "CAST(julianday(date(a.closed_at)) - julianday(date(a.created_at)) AS INTEGER)"
+
+        filters, params = self._ranking_filters(
+            action_cols, project_id, category, date_from, date_to
+        )
+        filters.append("date(a.created_at) IS NOT NULL")
+        filters.append("COALESCE(a.status, '') != 'cancelled'")
+        if not include_unassigned:
+            filters.append("a.owner_champion_id IS NOT NULL")
+
+        open_conds = ["status NOT IN ('done', 'cancelled')", "closed IS NULL"]
+        closed_conds = ["closed IS NOT NULL"]
+        flag_params: list[Any] = []
+        if date_from:
+            open_conds.append("created >= ?")
+            flag_params.append(date_from.isoformat())
+        if date_to:
+            open_conds.append("created <= ?")
+            flag_params.append(date_to.isoformat())
+        if date_from:
+            closed_conds.append("closed >= ?")
+            flag_params.append(date_from.isoformat())
+        if date_to:
+            closed_conds.append("closed <= ?")
+            flag_params.append(date_to.isoformat())
+
+        cte = f"""
+            WITH scoped AS (
+                SELECT COALESCE(a.owner_champion_id, '{RANKING_UNASSIGNED_KEY}') AS champion_key,
+                       {_col("id")} AS id,
+                       {_col("category")} AS category,
+                       COALESCE(a.status, '') AS status,
+                       {_col("project_id")} AS project_id,
+                       date(a.created_at) AS created,
+                       date(a.closed_at) AS closed,
+                       date({_col("due_date")}) AS due,
+                       {ttc_expr} AS ttc_days,
+                       {_col("manual_savings_amount")} AS manual_amount,
+                       upper(COALESCE({_col("manual_savings_currency")}, '')) AS manual_currency,
+                       {metric_expr} AS metric,
+                       {delta_expr} AS delta
+                FROM actions a
+                {' '.join(joins)}
+                WHERE {' AND '.join(filters)}
+            ),
+            ranked AS (
+                SELECT scoped.*,
+                       CASE WHEN {' AND '.join(open_conds)} THEN 1 ELSE 0 END AS is_open,
+                       CASE WHEN {' AND '.join(closed_conds)} THEN 1 ELSE 0 END AS is_closed
+                FROM scoped
+            )
+        """
+        return cte, params + flag_params
+
+    def aggregate_for_ranking(
+        self,
+        project_id: str | None = None,
+        category: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        today: date | None = None,
+        include_unassigned: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Champions ranking counters grouped by (champion_key, category) in SQLite.
+
+        Impact is returned per savings source (auto scrap delta / manual PLN / manual EUR);
+        the caller picks one per category from its savings_model rule.
+        """
+        scope = self._ranking_scope_cte(
+            project_id, category, date_from, date_to, include_unassigned
+        )
+        if scope is None:
+            return []
+        cte, params = scope
+        metrics_sql = ", ".join(f"'{metric}'" for metric in sorted(RANKING_IMPACT_METRICS))
+        query = f"""
+            {cte}
+            SELECT champion_key,
+                   category,
+                   COUNT(*) AS actions_total,
+                   SUM(CASE WHEN project_id IS NULL OR project_id = '' THEN 1 ELSE 0 END) AS without_project,
+                   SUM(is_open) AS open_now,
+                   SUM(CASE WHEN is_open = 1 AND due IS NOT NULL AND due < ? THEN 1 ELSE 0 END) AS overdue_now,
+                   SUM(is_closed) AS closed_in_window,
+                   SUM(CASE WHEN is_closed = 1 AND (due IS NULL OR closed <= due) THEN 1 ELSE 0 END) AS closed_on_time,
+                   SUM(CASE WHEN is_closed = 1 AND metric IN ({metrics_sql})
+                             AND typeof(delta) IN ('integer', 'real')
+                            THEN MAX(0.0, -delta) ELSE 0.0 END) AS impact_pln_auto,
+                   SUM(CASE WHEN is_closed = 1 AND manual_currency = 'PLN'
+                             AND typeof(manual_amount) IN ('integer', 'real')
+                            THEN MAX(0.0, manual_amount) ELSE 0.0 END) AS impact_pln_manual,
+                   SUM(CASE WHEN is_closed = 1 AND manual_currency = 'EUR'
+                             AND typeof(manual_amount) IN ('integer', 'real')
+                            THEN MAX(0.0, manual_amount) ELSE 0.0 END) AS impact_eur_manual,
+                   SUM(CASE WHEN is_closed = 1 AND typeof(manual_amount) NOT IN ('integer', 'real')
+                            THEN 1 ELSE 0 END) AS manual_missing
+            FROM ranked
+            GROUP BY champion_key, category
+        """
+        params = params + [(today or date.today()).isoformat()]
         try:
             cur = self.con.execute(query, params)
             return [dict(r) for r in cur.fetchall()]
         except sqlite3.Error:
             return []
 
+    def list_ranking_durations(
+        self,
+        project_id: str | None = None,
+        category: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+        include_unassigned: bool = False,
+    ) -> list[tuple[str, int]]:
+        """(champion_key, ttc_days) for actions closed in the window (input for medians)."""
+        scope = self._ranking_scope_cte(
+            project_id, category, date_from, date_to, include_unassigned
+        )
+        if scope is None:
+            return []
+        cte, params = scope
+        query = f"""
+            {cte}
+            SELECT champion_key, ttc_days
+            FROM ranked
+            WHERE is_closed = 1
+        """
+        try:
+            cur = self.con.execute(query, params)
+            return [(row[0], int(row[1])) for row in cur.fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def count_ranking_invalid_created(
+        self,
+        project_id: str | None = None,
+        category: str | None = None,
+        date_from: date | None = None,
+        date_to: date | None = None,
+    ) -> int:
+        if not _table_exists(self.con, "actions"):
+            return 0
+        action_cols = _table_columns(self.con, "actions")
+        if "created_at" not in action_cols:
+            return 0
+        filters, params = self._ranking_filters(
+            action_cols, project_id, category, date_from, date_to
+        )
+        filters.append("date(a.created_at) IS NULL")
+        try:
+            cur = self.con.execute(
+                f"SELECT COUNT(*) FROM actions a WHERE {' AND '.join(filters)}",
+                params,
+            )
+            row = cur.fetchone()
+        except sqlite3.Error:
+            return 0
+        return int(row[0]) if row else 0
+
     def list_actions_for_project_outcome(
         self,
         project_id: str,
@@ -2184,7 +2531,6 @@ class ActionRepository:
 class AnalysisRepository:
     def __init__(self, con: sqlite3.Connection) -> None:
         self.con = con
-        _configure_sqlite_connection(self.con)
         _ensure_column(self.con, "analyses", "area", "TEXT")
 
     def list_analyses(self) -> list[dict[str, Any]]:
@@ -2276,7 +2622,6 @@ class AnalysisRepository:
 
         vals = [payload.get(c) for c in insert_cols]
         placeholders = ", ".join(["?"] * len(insert_cols))
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute(
                 f"INSERT INTO analyses ({', '.join(insert_cols)}) VALUES ({placeholders})",
@@ -2451,7 +2796,6 @@ class AnalysisRepository:
             return action_id
         vals = [payload.get(c) for c in insert_cols]
         placeholders = ", ".join(["?"] * len(insert_cols))
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute(
                 f"INSERT INTO analysis_actions ({', '.join(insert_cols)}) VALUES ({placeholders})",
@@ -2531,13 +2875,13 @@ class AnalysisRepository:
             return value
         if isinstance(value, datetime):
             return value.date()
+        text = str(value)
         try:
-            return date.fromisoformat(str(value))
-        except ValueError:
-            try:
-                return datetime.fromisoformat(str(value)).date()
-            except ValueError as exc_two:
-                raise ValueError(f"Invalid date for {field_name}") from exc_two
+            if len(text) > 10:
+                return datetime.fromisoformat(text).date()
+            return date.fromisoformat(text)
+        except ValueError as exc:
+            raise ValueError(f"Invalid date for {field_name}") from exc
 
     def _log_changelog(self, analysis_id: str, event_type: str, changes: dict[str, Any]) -> None:
         if not _table_exists(self.con, "analysis_changelog"):
@@ -2660,6 +3004,64 @@ class EffectivenessRepository:
         return self.get_effectiveness_for_actions(action_ids)
 
 
+# =====================================================
+# DIAGNOSTICS CACHE
+# =====================================================
+
+class DiagnosticsCacheRepository:
+    """
+    Persistent cache for diagnostics retrievals (Tavily / internal hits).
+    Payloads are stored as zlib-compressed JSON; keys are precomputed hashes.
+    """
+
+    def __init__(self, con: sqlite3.Connection) -> None:
+        self.con = con
+
+    def get(self, key: str, max_age_s: int) -> Any | None:
+        if not _table_exists(self.con, "diag_cache"):
+            return None
+        min_created_at = int(time.time()) - int(max_age_s)
+        row = self.con.execute(
+            "SELECT payload FROM diag_cache WHERE key = ? AND created_at > ?",
+            (key, min_created_at),
+        ).fetchone()
+        if not row:
+            return None
+        try:
+            return json.loads(zlib.decompress(row[0]).decode("utf-8"))
+        except (zlib.error, ValueError):
+            return None
+
+    def put(self, key: str, kind: str, payload: Any, max_age_s: int) -> None:
+        """
+        Store one entry and purge this kind's entries older than max_age_s.
+        File databases are written through a short-lived connection so the
+        caller's (page) connection is never committed mid-render.
+        """
+        if not _table_exists(self.con, "diag_cache"):
+            return
+        blob = zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+        now = int(time.time())
+        db_file = database_file(self.con)
+        writer = connect(Path(db_file)) if db_file else self.con
+        try:
+            with writer:
+                writer.execute(
+                    "DELETE FROM diag_cache WHERE kind = ? AND created_at < ?",
+                    (kind, now - int(max_age_s)),
+                )
+                writer.execute(
+                    """
+                    INSERT OR REPLACE INTO diag_cache (key, kind, payload, created_at)
+                    VALUES (?, ?, ?, ?)
+                    """,
+                    (key, kind, sqlite3.Binary(blob), now),
+                )
+        finally:
+            if writer is not self.con:
+                writer.close()
+
+
 # =====================================================
 # PROJECTS
 # =====================================================
@@ -3015,13 +3417,13 @@ class ProjectRepository:
             return value
         if isinstance(value, datetime):
             return value.date()
+        text = str(value)
         try:
-            return date.fromisoformat(str(value))
-        except ValueError:
-            try:
-                return datetime.fromisoformat(str(value)).date()
-            except ValueError as exc_two:
-                raise ValueError(f"Invalid date for {field_name}") from exc_two
+            if len(text) > 10:
+                return datetime.fromisoformat(text).date()
+            return date.fromisoformat(text)
+        except ValueError as exc:
+            raise ValueError(f"Invalid date for {field_name}") from exc
 
 
 # =====================================================
@@ -3031,7 +3433,6 @@ class ProjectRepository:
 class ChampionRepository:
     def __init__(self, con: sqlite3.Connection) -> None:
         self.con = con
-        _configure_sqlite_connection(self.con)
 
     def list_champions(self) -> list[dict[str, Any]]:
         if not _table_exists(self.con, "champions"):
@@ -3122,19 +3523,74 @@ class ChampionRepository:
         )
         return [row["id"] for row in cur.fetchall()]
 
-    def set_assigned_projects(self, champion_id: str, project_ids: list[str]) -> None:
-        if not _table_exists(self.con, "champion_projects"):
-            return
+    def get_project_type_counts_bulk(self) -> dict[str, dict[str, int]]:
+        """
+        Project type buckets (SL/RL/FL/Other) per champion in one grouped scan.
+        Same fallback as get_assigned_projects_with_fallback: champions without
+        explicit assignments are counted via projects.owner_champion_id.
+        """
+        if not _table_exists(self.con, "projects"):
+            return {}
+        project_cols = _table_columns(self.con, "projects")
+        if "id" not in project_cols:
+            return {}
+
+        sources: list[str] = []
+        has_assignments = False
+        if _table_exists(self.con, "champion_projects"):
+            cp_cols = _table_columns(self.con, "champion_projects")
+            if "champion_id" in cp_cols and "project_id" in cp_cols:
+                has_assignments = True
+                sources.append("SELECT champion_id, project_id FROM champion_projects")
+        if "owner_champion_id" in project_cols:
+            fallback = (
+                "SELECT owner_champion_id AS champion_id, id AS project_id "
+                "FROM projects WHERE owner_champion_id IS NOT NULL"
+            )
+            if has_assignments:
+                fallback += (
+                    " AND owner_champion_id NOT IN (SELECT champion_id FROM champion_projects)"
+                )
+            sources.append(fallback)
+        if not sources:
+            return {}
+
+        type_expr = "upper(trim(COALESCE(p.type, '')))" if "type" in project_cols else "''"
+        cur = self.con.execute(
+            f"""
+            WITH assigned AS (
+              {" UNION ALL ".join(sources)}
+            )
+            SELECT a.champion_id AS champion_id,
+                   CASE WHEN {type_expr} IN ('SL', 'RL', 'FL') THEN {type_expr} ELSE 'Other' END AS bucket,
+                   COUNT(*) AS n
+            FROM assigned a
+            JOIN projects p ON p.id = a.project_id
+            GROUP BY a.champion_id, bucket
+            """
+        )
+        counts: dict[str, dict[str, int]] = {}
+        for row in cur.fetchall():
+            bucket_counts = counts.setdefault(
+                row["champion_id"], {"SL": 0, "RL": 0, "FL": 0, "Other": 0}
+            )
+            bucket_counts[row["bucket"]] = int(row["n"])
+        return counts
+
+    def _clean_assignment_ids(self, project_ids: list[str]) -> list[str] | None:
+        """Deduplicated project ids, or None when champion_projects cannot be written."""
+        if not _table_exists(self.con, "champion_projects"):
+            return None
 
         try:
             cur = self.con.execute("PRAGMA table_info(champion_projects)")
             columns_info = cur.fetchall()
         except sqlite3.Error:
-            return
+            return None
 
         column_names = {row[1] for row in columns_info}
         if "champion_id" not in column_names or "project_id" not in column_names:
-            return
+            return None
 
         required_columns = [
             row[1]
@@ -3145,35 +3601,74 @@ class ChampionRepository:
             and not bool(row[5])
         ]
         if required_columns:
-            return
+            return None
 
         cleaned_ids = [
             str(project_id).strip()
             for project_id in project_ids
             if project_id is not None and str(project_id).strip()
         ]
-        unique_ids = list(dict.fromkeys(cleaned_ids))
+        return list(dict.fromkeys(cleaned_ids))
+
+    def _write_assignments(self, champion_id: str, unique_ids: list[str]) -> None:
+        self.con.execute(
+            "DELETE FROM champion_projects WHERE champion_id = ?",
+            (champion_id,),
+        )
+        if unique_ids:
+            self.con.executemany(
+                """
+                INSERT INTO champion_projects (champion_id, project_id)
+                VALUES (?, ?)
+                """,
+                zip(repeat(champion_id), unique_ids),
+            )
+
+    def set_assigned_projects(self, champion_id: str, project_ids: list[str]) -> None:
+        unique_ids = self._clean_assignment_ids(project_ids)
+        if unique_ids is None:
+            return
 
-        _configure_sqlite_connection(self.con)
         try:
             self.con.execute("BEGIN IMMEDIATE")
-            self.con.execute(
-                "DELETE FROM champion_projects WHERE champion_id = ?",
-                (champion_id,),
-            )
-            if unique_ids:
-                self.con.executemany(
-                    """
-                    INSERT INTO champion_projects (champion_id, project_id)
-                    VALUES (?, ?)
-                    """,
-                    [(champion_id, project_id) for project_id in unique_ids],
-                )
+            self._write_assignments(champion_id, unique_ids)
             self.con.execute("COMMIT")
         except Exception:
             _rollback_safely(self.con)
             return
 
+    def save_with_assignments(
+        self,
+        champion_id: str | None,
+        data: dict[str, Any],
+        project_ids: list[str],
+    ) -> str:
+        """
+        Create (champion_id=None) or update a champion and replace its project
+        assignments in a single IMMEDIATE transaction (one commit per form submit).
+        """
+        if not _table_exists(self.con, "champions"):
+            return champion_id or ""
+
+        if champion_id:
+            statement = self._build_update_statement(champion_id, data)
+        else:
+            champion_id, statement = self._build_insert_statement(data)
+            if not statement:
+                return champion_id
+        unique_ids = self._clean_assignment_ids(project_ids)
+
+        try:
+            self.con.execute("BEGIN IMMEDIATE")
+            if statement:
+                self.con.execute(*statement)
+            if unique_ids is not None:
+                self._write_assignments(champion_id, unique_ids)
+            self.con.execute("COMMIT")
+        except Exception:
+            _rollback_safely(self.con)
+        return champion_id
+
     def list_changelog(self, limit: int = 50, champion_id: str | None = None) -> list[dict[str, Any]]:
         return _list_changelog_generic(
             self.con,
@@ -3187,17 +3682,17 @@ class ChampionRepository:
             ],
             limit=limit,
             entity_id=champion_id,
+            json_fields=("first_name", "last_name"),
         )
 
-    def create_champion(self, data: dict[str, Any]) -> str:
-        if not _table_exists(self.con, "champions"):
-            return ""
-
+    def _build_insert_statement(
+        self, data: dict[str, Any]
+    ) -> tuple[str, tuple[str, list[Any]] | None]:
+        champion_id = data.get("id") or str(uuid4())
         cols = _table_columns(self.con, "champions")
         if not cols:
-            return ""
+            return champion_id, None
 
-        champion_id = data.get("id") or str(uuid4())
         first_name = (data.get("first_name") or "").strip() or None
         last_name = (data.get("last_name") or "").strip() or None
         email = (data.get("email") or "").strip() or None
@@ -3230,37 +3725,47 @@ class ChampionRepository:
 
         insert_cols = [c for c in payload.keys() if c in cols]
         if not insert_cols:
-            return champion_id
+            return champion_id, None
 
         placeholders = ", ".join(["?"] * len(insert_cols))
         values = [payload[c] for c in insert_cols]
-        _configure_sqlite_connection(self.con)
+        return champion_id, (
+            f"INSERT INTO champions ({', '.join(insert_cols)}) VALUES ({placeholders})",
+            values,
+        )
+
+    def create_champion(self, data: dict[str, Any]) -> str:
+        if not _table_exists(self.con, "champions"):
+            return ""
+
+        cols = _table_columns(self.con, "champions")
+        if not cols:
+            return ""
+
+        champion_id, statement = self._build_insert_statement(data)
+        if not statement:
+            return champion_id
+
         try:
             # IMMEDIATE transaction reduces "database is locked" during concurrent writes.
             self.con.execute("BEGIN IMMEDIATE")
-            self.con.execute(
-                f"INSERT INTO champions ({', '.join(insert_cols)}) VALUES ({placeholders})",
-                values,
-            )
+            self.con.execute(*statement)
             self.con.execute("COMMIT")
         except Exception:
             _rollback_safely(self.con)
             return champion_id
         return champion_id
 
-    def update_champion(self, champion_id: str, data: dict[str, Any]) -> None:
-        if not champion_id:
-            return
-        if not _table_exists(self.con, "champions"):
-            return
-
+    def _build_update_statement(
+        self, champion_id: str, data: dict[str, Any]
+    ) -> tuple[str, list[Any]] | None:
         try:
             cur = self.con.execute("PRAGMA table_info(champions)")
             columns_info = cur.fetchall()
         except sqlite3.Error:
             columns_info = []
         if not columns_info:
-            return
+            return None
 
         cols = {row[1] for row in columns_info}
         name_not_null = any(row[1] == "name" and bool(row[3]) for row in columns_info)
@@ -3320,17 +3825,26 @@ class ChampionRepository:
                 payload["name"] = name_value or derived_name
 
         if not payload:
-            return
+            return None
 
         sets = [f"{col} = ?" for col in payload.keys()]
         params = list(payload.values())
         params.append(champion_id)
+        return f"UPDATE champions SET {', '.join(sets)} WHERE id = ?", params
+
+    def update_champion(self, champion_id: str, data: dict[str, Any]) -> None:
+        if not champion_id:
+            return
+        if not _table_exists(self.con, "champions"):
+            return
+
+        statement = self._build_update_statement(champion_id, data)
+        if not statement:
+            return
+
         with self.con:
             try:
-                self.con.execute(
-                    f"UPDATE champions SET {', '.join(sets)} WHERE id = ?",
-                    params,
-                )
+                self.con.execute(*statement)
             except sqlite3.Error:
                 return
 
@@ -3380,6 +3894,8 @@ class ProductionDataRepository:
     - production_import.py: upsert_scrap_daily, upsert_production_kpi_daily
     - production_explorer.py: list_scrap_daily, list_kpi_daily, list_distinct_work_centers, list_work_centers
     - projects.py (WC inbox): list_production_work_centers_with_stats
+    - high_risk_workcenter.py: scrap_daily_by_project_columns, kpi_daily_by_project_columns,
+      list_project_activity_summary
     """
 
     def __init__(self, con: sqlite3.Connection) -> None:
@@ -3438,7 +3954,6 @@ class ProductionDataRepository:
             if c in cols
         ]
         update_clause = ", ".join([f"{col} = excluded.{col}" for col in update_cols])
-        _configure_sqlite_connection(self.con)
         self.con.executemany(
             f"""
             INSERT INTO scrap_daily ({', '.join(insert_cols)})
@@ -3516,7 +4031,6 @@ class ProductionDataRepository:
             if c in cols
         ]
         update_clause = ", ".join([f"{col} = excluded.{col}" for col in update_cols])
-        _configure_sqlite_connection(self.con)
         self.con.executemany(
             f"""
             INSERT INTO production_kpi_daily ({', '.join(insert_cols)})
@@ -3542,54 +4056,25 @@ class ProductionDataRepository:
         cols = _table_columns(self.con, "scrap_daily")
         if not cols:
             return []
-        select_fields = []
-        for col in ("metric_date", "work_center", "scrap_qty", "scrap_cost_amount", "scrap_cost_currency"):
-            if col in cols:
-                select_fields.append(col)
-            else:
-                select_fields.append(f"NULL AS {col}")
+        scope = self._daily_filters(cols, work_centers, date_from, date_to, full_project)
+        if scope is None:
+            return []
+        return self._select_scrap_daily(cols, scope, currency, workcenter_areas)
+
+    def _select_scrap_daily(
+        self,
+        cols: set[str],
+        scope: tuple[list[str], list[Any]],
+        currency: str | None,
+        workcenter_areas: set[str] | None,
+    ) -> list[dict[str, Any]]:
+        fields = ("metric_date", "work_center", "scrap_qty", "scrap_cost_amount", "scrap_cost_currency")
+        select_fields = [col if col in cols else f"NULL AS {col}" for col in fields]
         query = f"""
             SELECT {", ".join(select_fields)}
             FROM scrap_daily
         """
-        filters: list[str] = []
-        params: list[Any] = []
-
-        if full_project is not None:
-            if "full_project" in cols:
-                if isinstance(full_project, str):
-                    project_value = full_project.strip()
-                    if project_value:
-                        filters.append("full_project = ?")
-                        params.append(project_value)
-                else:
-                    if not full_project:
-                        return []
-                    placeholders = ", ".join(["?"] * len(full_project))
-                    filters.append(f"full_project IN ({placeholders})")
-                    params.extend([str(project) for project in full_project])
-            elif work_centers is None:
-                work_centers = full_project
-
-        if work_centers is not None:
-            if isinstance(work_centers, str):
-                wc = work_centers.strip()
-                if wc:
-                    filters.append("work_center = ?")
-                    params.append(wc)
-            else:
-                if not work_centers:
-                    return []
-                placeholders = ", ".join(["?"] * len(work_centers))
-                filters.append(f"work_center IN ({placeholders})")
-                params.extend([str(wc) for wc in work_centers])
-
-        if date_from:
-            filters.append("metric_date >= ?")
-            params.append(self._normalize_date_filter(date_from))
-        if date_to:
-            filters.append("metric_date <= ?")
-            params.append(self._normalize_date_filter(date_to))
+        filters, params = scope
 
         if currency and "scrap_cost_currency" in cols:
             filters.append("scrap_cost_currency = ?")
@@ -3626,8 +4111,18 @@ class ProductionDataRepository:
         cols = _table_columns(self.con, "production_kpi_daily")
         if not cols:
             return []
-        select_fields = []
-        for col in (
+        scope = self._daily_filters(cols, work_centers, date_from, date_to, full_project)
+        if scope is None:
+            return []
+        return self._select_kpi_daily(cols, scope, workcenter_areas)
+
+    def _select_kpi_daily(
+        self,
+        cols: set[str],
+        scope: tuple[list[str], list[Any]],
+        workcenter_areas: set[str] | None,
+    ) -> list[dict[str, Any]]:
+        fields = (
             "metric_date",
             "work_center",
             "worktime_min",
@@ -3635,15 +4130,375 @@ class ProductionDataRepository:
             "oee_pct",
             "availability_pct",
             "quality_pct",
-        ):
-            if col in cols:
-                select_fields.append(col)
-            else:
-                select_fields.append(f"NULL AS {col}")
+        )
+        select_fields = [col if col in cols else f"NULL AS {col}" for col in fields]
         query = f"""
             SELECT {", ".join(select_fields)}
             FROM production_kpi_daily
         """
+        filters, params = scope
+
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+
+        query += " ORDER BY metric_date ASC, work_center ASC"
+        try:
+            cur = self.con.execute(query, params)
+            rows = [dict(r) for r in cur.fetchall()]
+        except sqlite3.Error:
+            return []
+        if workcenter_areas:
+            rows = filter_rows_by_areas(rows, workcenter_areas)
+        for row in rows:
+            row["worktime_min"] = _normalize_float(row.get("worktime_min"))
+            row["performance_pct"] = _normalize_percent(row.get("performance_pct"))
+            row["oee_pct"] = _normalize_percent(row.get("oee_pct"))
+            row["availability_pct"] = _normalize_percent(row.get("availability_pct"))
+            row["quality_pct"] = _normalize_percent(row.get("quality_pct"))
+        kpi_cols = ("performance_pct", "oee_pct", "availability_pct", "quality_pct")
+        rows = [row for row in rows if any(row.get(col) is not None for col in kpi_cols)]
+        return rows
+
+    def aggregate_scrap_daily(
+        self,
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None = None,
+        by_work_center: bool = False,
+    ) -> list[dict[str, Any]]:
+        """
+        Scrap totals per day (optionally per day and work center), summed in SQLite.
+
+        Rows: metric_date, [work_center,] scrap_qty, scrap_pln, pln_rows
+        (pln_rows = number of PLN-priced rows, 0 when the day has no PLN cost).
+        """
+        query_params = self._scrap_aggregate_query(
+            work_centers, date_from, date_to, full_project, by_work_center
+        )
+        if query_params is None:
+            return []
+        try:
+            cur = self.con.execute(*query_params)
+            return [dict(r) for r in cur.fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def aggregate_scrap_daily_columns(
+        self,
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None = None,
+        by_work_center: bool = False,
+    ) -> dict[str, tuple[Any, ...]]:
+        """Same data as aggregate_scrap_daily, column-wise ({} when empty)."""
+        query_params = self._scrap_aggregate_query(
+            work_centers, date_from, date_to, full_project, by_work_center
+        )
+        if query_params is None:
+            return {}
+        try:
+            return _fetch_columns(self.con, *query_params)
+        except sqlite3.Error:
+            return {}
+
+    def _scrap_aggregate_query(
+        self,
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None,
+        by_work_center: bool,
+    ) -> tuple[str, list[Any]] | None:
+        if not _table_exists(self.con, "scrap_daily"):
+            return None
+        cols = _table_columns(self.con, "scrap_daily")
+        if not {"metric_date", "work_center"}.issubset(cols):
+            return None
+        scope = self._daily_filters(cols, work_centers, date_from, date_to, full_project)
+        if scope is None:
+            return None
+        filters, params = scope
+
+        qty_expr = "CAST(scrap_qty AS INTEGER)" if "scrap_qty" in cols else "0"
+        if {"scrap_cost_amount", "scrap_cost_currency"}.issubset(cols):
+            pln_amount_expr = "CASE WHEN scrap_cost_currency = 'PLN' THEN scrap_cost_amount END"
+            pln_rows_expr = "CASE WHEN scrap_cost_currency = 'PLN' THEN 1 ELSE 0 END"
+        else:
+            pln_amount_expr = "NULL"
+            pln_rows_expr = "0"
+        group_cols = ["metric_date", "work_center"] if by_work_center else ["metric_date"]
+        select_cols = ["date(metric_date) AS metric_date", *group_cols[1:]]
+        query = f"""
+            SELECT {", ".join(select_cols)},
+                   CAST(TOTAL({qty_expr}) AS INTEGER) AS scrap_qty,
+                   TOTAL({pln_amount_expr}) AS scrap_pln,
+                   SUM({pln_rows_expr}) AS pln_rows
+            FROM scrap_daily
+        """
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+        query += f" GROUP BY {', '.join(group_cols)} ORDER BY {', '.join(group_cols)}"
+        return query, params
+
+    def weighted_kpi_daily(
+        self,
+        metrics: list[str],
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Daily KPI percent per metric, weighted by worktime_min in SQLite.
+        Falls back to a plain average for days without worktime.
+        """
+        query_params = self._weighted_kpi_query(
+            metrics, work_centers, date_from, date_to, full_project
+        )
+        if query_params is None:
+            return []
+        try:
+            cur = self.con.execute(*query_params)
+            return [dict(r) for r in cur.fetchall()]
+        except sqlite3.Error:
+            return []
+
+    def weighted_kpi_daily_columns(
+        self,
+        metrics: list[str],
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None = None,
+    ) -> dict[str, tuple[Any, ...]]:
+        """Same data as weighted_kpi_daily, column-wise ({} when empty)."""
+        query_params = self._weighted_kpi_query(
+            metrics, work_centers, date_from, date_to, full_project
+        )
+        if query_params is None:
+            return {}
+        try:
+            return _fetch_columns(self.con, *query_params)
+        except sqlite3.Error:
+            return {}
+
+    def scrap_daily_by_project_columns(
+        self,
+        full_projects: list[str],
+        date_from: date | str | None,
+        date_to: date | str | None,
+        currency: str | None = "PLN",
+        workcenter_areas: set[str] | None = None,
+    ) -> dict[str, tuple[Any, ...]]:
+        """
+        Scrap rows of many FULL PROJECT keys, column-wise and unordered, with
+        full_project as a column and values normalized in SQL ({} when empty).
+        """
+        if not self.has_full_project_column("scrap_daily"):
+            return {}
+        cols = _table_columns(self.con, "scrap_daily")
+        if not {"metric_date", "work_center"}.issubset(cols):
+            return {}
+        qty_expr = "COALESCE(CAST(scrap_qty AS INTEGER), 0)" if "scrap_qty" in cols else "0"
+        amount_expr = (
+            "CASE WHEN typeof(scrap_cost_amount) IN ('integer', 'real') THEN scrap_cost_amount * 1.0 END"
+            if "scrap_cost_amount" in cols
+            else "NULL"
+        )
+        extra_filters: list[tuple[str, Any]] = []
+        if currency and "scrap_cost_currency" in cols:
+            extra_filters.append(("scrap_cost_currency = ?", str(currency)))
+        columns = self._daily_columns_by_project(
+            "scrap_daily",
+            cols,
+            [
+                "full_project",
+                "date(metric_date) AS metric_date",
+                "work_center",
+                f"{qty_expr} AS scrap_qty",
+                f"{amount_expr} AS scrap_cost_amount",
+            ],
+            full_projects,
+            date_from,
+            date_to,
+            extra_filters=extra_filters,
+        )
+        return _filter_columns_by_areas(columns, workcenter_areas)
+
+    def kpi_daily_by_project_columns(
+        self,
+        full_projects: list[str],
+        date_from: date | str | None,
+        date_to: date | str | None,
+        work_centers: list[str] | None = None,
+        workcenter_areas: set[str] | None = None,
+    ) -> dict[str, tuple[Any, ...]]:
+        """KPI counterpart of scrap_daily_by_project_columns (rows as in list_kpi_daily_columns)."""
+        if not self.has_full_project_column("production_kpi_daily"):
+            return {}
+        cols = _table_columns(self.con, "production_kpi_daily")
+        if not {"metric_date", "work_center"}.issubset(cols):
+            return {}
+        columns = self._daily_columns_by_project(
+            "production_kpi_daily",
+            cols,
+            ["full_project", *self._kpi_daily_select_fields(cols)],
+            full_projects,
+            date_from,
+            date_to,
+            work_centers=work_centers,
+            outer_where=" OR ".join(f"{col} IS NOT NULL" for col in _KPI_PERCENT_COLUMNS),
+        )
+        return _filter_columns_by_areas(columns, workcenter_areas)
+
+    def _daily_columns_by_project(
+        self,
+        table: str,
+        cols: set[str],
+        select_fields: list[str],
+        full_projects: list[str],
+        date_from: date | str | None,
+        date_to: date | str | None,
+        work_centers: list[str] | None = None,
+        extra_filters: list[tuple[str, Any]] | None = None,
+        outer_where: str | None = None,
+    ) -> dict[str, tuple[Any, ...]]:
+        """One query per _BULK_KEYS_CHUNK keys; the per-chunk columns are concatenated."""
+        merged: dict[str, tuple[Any, ...]] = {}
+        for keys in _chunked(sorted(set(full_projects)), _BULK_KEYS_CHUNK):
+            scope = self._daily_filters(cols, work_centers, date_from, date_to, keys)
+            if scope is None:
+                continue
+            filters, params = scope
+            for clause, value in extra_filters or ():
+                filters.append(clause)
+                params.append(value)
+            query = f"""
+                SELECT {", ".join(select_fields)}
+                FROM {table}
+                {"WHERE " + " AND ".join(filters) if filters else ""}
+            """
+            if outer_where:
+                query = f"SELECT * FROM ({query}) WHERE {outer_where}"
+            try:
+                chunk = _fetch_columns(self.con, query, params)
+            except sqlite3.Error:
+                continue
+            for name, values in chunk.items():
+                merged[name] = merged.get(name, ()) + values
+        return merged
+
+    def list_kpi_daily_columns(
+        self,
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None = None,
+    ) -> dict[str, tuple[Any, ...]]:
+        """
+        Rows of list_kpi_daily, column-wise ({} when empty); KPI percents are
+        normalized in SQL instead of per row.
+        """
+        if not _table_exists(self.con, "production_kpi_daily"):
+            return {}
+        cols = _table_columns(self.con, "production_kpi_daily")
+        if not {"metric_date", "work_center"}.issubset(cols):
+            return {}
+        scope = self._daily_filters(cols, work_centers, date_from, date_to, full_project)
+        if scope is None:
+            return {}
+        filters, params = scope
+        select_fields = self._kpi_daily_select_fields(cols)
+        query = f"""
+            SELECT *
+            FROM (
+                SELECT {", ".join(select_fields)}
+                FROM production_kpi_daily
+                {"WHERE " + " AND ".join(filters) if filters else ""}
+            )
+            WHERE {" OR ".join(f"{col} IS NOT NULL" for col in _KPI_PERCENT_COLUMNS)}
+            ORDER BY metric_date ASC, work_center ASC
+        """
+        try:
+            return _fetch_columns(self.con, query, params)
+        except sqlite3.Error:
+            return {}
+
+    @staticmethod
+    def _kpi_daily_select_fields(cols: set[str]) -> list[str]:
+        """metric_date, work_center, worktime_min and KPI percents normalized in SQL."""
+        select_fields = ["date(metric_date) AS metric_date", "work_center"]
+        if "worktime_min" in cols:
+            select_fields.append(
+                "CASE WHEN typeof(worktime_min) IN ('integer', 'real') "
+                "THEN worktime_min * 1.0 END AS worktime_min"
+            )
+        else:
+            select_fields.append("NULL AS worktime_min")
+        for col in _KPI_PERCENT_COLUMNS:
+            expr = _sql_normalized_percent(col) if col in cols else "NULL"
+            select_fields.append(f"{expr} AS {col}")
+        return select_fields
+
+    def _weighted_kpi_query(
+        self,
+        metrics: list[str],
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None,
+    ) -> tuple[str, list[Any]] | None:
+        if not _table_exists(self.con, "production_kpi_daily"):
+            return None
+        cols = _table_columns(self.con, "production_kpi_daily")
+        kpi_cols = [col for col in _KPI_PERCENT_COLUMNS if col in cols]
+        metrics = [metric for metric in metrics if metric in kpi_cols]
+        if "metric_date" not in cols or not metrics:
+            return None
+        scope = self._daily_filters(cols, work_centers, date_from, date_to, full_project)
+        if scope is None:
+            return None
+        filters, params = scope
+        # Same row set as list_kpi_daily: at least one KPI value present.
+        filters.append("(" + " OR ".join(f"{col} IS NOT NULL" for col in kpi_cols) + ")")
+
+        worktime_expr = "COALESCE(worktime_min, 0)" if "worktime_min" in cols else "0"
+        normalized = ", ".join(
+            f"{_sql_normalized_percent(metric)} AS {metric}" for metric in metrics
+        )
+        aggregates = []
+        for metric in metrics:
+            weight_sum = f"SUM(CASE WHEN {metric} IS NOT NULL THEN weight ELSE 0 END)"
+            aggregates.append(
+                f"""
+                CASE WHEN {weight_sum} > 0
+                     THEN SUM(COALESCE({metric}, 0) * weight) / {weight_sum}
+                     ELSE AVG({metric}) END AS {metric}
+                """
+            )
+        query = f"""
+            SELECT date(metric_date) AS metric_date, {", ".join(aggregates)}
+            FROM (
+                SELECT metric_date, {worktime_expr} AS weight, {normalized}
+                FROM production_kpi_daily
+                {"WHERE " + " AND ".join(filters) if filters else ""}
+            )
+            GROUP BY metric_date
+            ORDER BY metric_date
+        """
+        return query, params
+
+    def _daily_filters(
+        self,
+        cols: set[str],
+        work_centers: str | list[str] | None,
+        date_from: date | str | None,
+        date_to: date | str | None,
+        full_project: str | list[str] | None,
+    ) -> tuple[list[str], list[Any]] | None:
+        """WHERE parts shared by the daily tables; None means "empty selection"."""
         filters: list[str] = []
         params: list[Any] = []
 
@@ -3656,7 +4511,7 @@ class ProductionDataRepository:
                         params.append(project_value)
                 else:
                     if not full_project:
-                        return []
+                        return None
                     placeholders = ", ".join(["?"] * len(full_project))
                     filters.append(f"full_project IN ({placeholders})")
                     params.extend([str(project) for project in full_project])
@@ -3671,7 +4526,7 @@ class ProductionDataRepository:
                     params.append(wc)
             else:
                 if not work_centers:
-                    return []
+                    return None
                 placeholders = ", ".join(["?"] * len(work_centers))
                 filters.append(f"work_center IN ({placeholders})")
                 params.extend([str(wc) for wc in work_centers])
@@ -3682,33 +4537,49 @@ class ProductionDataRepository:
         if date_to:
             filters.append("metric_date <= ?")
             params.append(self._normalize_date_filter(date_to))
-
-        if filters:
-            query += " WHERE " + " AND ".join(filters)
-
-        query += " ORDER BY metric_date ASC, work_center ASC"
-        try:
-            cur = self.con.execute(query, params)
-            rows = [dict(r) for r in cur.fetchall()]
-        except sqlite3.Error:
-            return []
-        if workcenter_areas:
-            rows = filter_rows_by_areas(rows, workcenter_areas)
-        for row in rows:
-            row["worktime_min"] = _normalize_float(row.get("worktime_min"))
-            row["performance_pct"] = _normalize_percent(row.get("performance_pct"))
-            row["oee_pct"] = _normalize_percent(row.get("oee_pct"))
-            row["availability_pct"] = _normalize_percent(row.get("availability_pct"))
-            row["quality_pct"] = _normalize_percent(row.get("quality_pct"))
-        kpi_cols = ("performance_pct", "oee_pct", "availability_pct", "quality_pct")
-        rows = [row for row in rows if any(row.get(col) is not None for col in kpi_cols)]
-        return rows
+        return filters, params
 
     def has_full_project_column(self, table: str) -> bool:
         if not _table_exists(self.con, table):
             return False
         return "full_project" in _table_columns(self.con, table)
 
+    def list_project_activity_summary(
+        self,
+        date_from: date | str | None,
+        date_to: date | str | None,
+    ) -> dict[str, tuple[str, int]]:
+        """
+        {full_project: (last date, distinct production days)} over scrap and KPI
+        daily rows in one query. Ignores currency/area filters, so it is an upper
+        bound suited for pruning projects without enough data.
+        """
+        parts: list[str] = []
+        params: list[Any] = []
+        for table in ("scrap_daily", "production_kpi_daily"):
+            if not self.has_full_project_column(table):
+                continue
+            scope = self._daily_filters(_table_columns(self.con, table), None, date_from, date_to, None)
+            filters, table_params = scope or ([], [])
+            filters.append("full_project IS NOT NULL")
+            parts.append(
+                f"SELECT full_project, date(metric_date) AS day FROM {table} WHERE "
+                + " AND ".join(filters)
+            )
+            params.extend(table_params)
+        if not parts:
+            return {}
+        query = f"""
+            SELECT full_project, MAX(day) AS last_date, COUNT(DISTINCT day) AS day_count
+            FROM ({" UNION ALL ".join(parts)})
+            GROUP BY full_project
+        """
+        try:
+            rows = self.con.execute(query, params).fetchall()
+        except sqlite3.Error:
+            return {}
+        return {row[0]: (row[1], int(row[2] or 0)) for row in rows}
+
     def count_full_project_matches(self, table: str, project_key: str) -> int | None:
         if not self.has_full_project_column(table):
             return None
@@ -3754,7 +4625,6 @@ class ProductionDataRepository:
         cols = _table_columns(self.con, "production_kpi_daily")
         if not cols:
             return {}
-        _configure_sqlite_connection(self.con)
         scale_targets = [
             col
             for col in ("performance_pct", "oee_pct", "availability_pct", "quality_pct")
@@ -4021,7 +4891,6 @@ class ProductionDataRepository:
 class WcInboxRepository:
     def __init__(self, con: sqlite3.Connection) -> None:
         self.con = con
-        _configure_sqlite_connection(self.con)
         _ensure_column(self.con, "wc_inbox", "full_project", "TEXT")
 
     def upsert_from_production(
@@ -4066,7 +4935,6 @@ class WcInboxRepository:
 
         now = datetime.now(timezone.utc).isoformat()
 
-        _configure_sqlite_connection(self.con)
         try:
             # IMMEDIATE transaction avoids lock contention during batch upsert.
             self.con.execute("BEGIN IMMEDIATE")
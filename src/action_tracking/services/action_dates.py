@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+
+def _parse_iso_date(value: Any) -> date | None:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = str(value)
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        try:
+            return datetime.fromisoformat(text).date()
+        except ValueError:
+            return None
+
+
+def parse_date_column(values: pd.Series) -> pd.Series:
+    """
+    Parse action date/datetime values into datetime64 (NaT when missing or
+    invalid), accepting exactly what date/datetime.fromisoformat accept.
+    Shared by the KPI and champion ranking pages.
+    """
+    # Dates repeat heavily across actions, so each distinct value is parsed once.
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype("string")
+    lengths = text.str.len()
+    # Plain dates and second-resolution timestamps (the bulk of stored values)
+    # take the vectorized parser; each format must match the whole string.
+    parsed = pd.to_datetime(text.where(lengths == 10), format="%Y-%m-%d", errors="coerce")
+    parsed = parsed.to_numpy(dtype="datetime64[ns]")
+    timestamps = (lengths == 19).fillna(False).to_numpy()
+    if timestamps.any():
+        stamps = text[timestamps]
+        # "T" and " " are equivalent date/time separators for fromisoformat.
+        stamps = stamps.where(stamps.str.get(10) != "T", stamps.str.slice_replace(10, 11, " "))
+        stamps = pd.to_datetime(stamps, format="%Y-%m-%d %H:%M:%S", errors="coerce")
+        parsed[timestamps] = stamps.dt.normalize().to_numpy(dtype="datetime64[ns]")
+    # Timestamps, compact/week ISO dates and anything invalid fall back to fromisoformat.
+    rest = np.isnat(parsed)
+    if rest.any():
+        fallback = pd.to_datetime([_parse_iso_date(value) for value in uniques[rest]], errors="coerce")
+        parsed[rest] = fallback.to_numpy(dtype="datetime64[ns]")
+    # Missing values get code -1, which picks the trailing NaT.
+    lookup = np.append(parsed, np.datetime64("NaT", "ns"))
+    return pd.Series(lookup[codes], index=values.index)
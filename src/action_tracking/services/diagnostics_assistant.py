@@ -5,6 +5,7 @@ import json
 import math
 import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, asdict
 from datetime import date
 from pathlib import Path
@@ -15,6 +16,7 @@ from urllib.request import Request, urlopen
 from action_tracking.data.repositories import (
     ActionRepository,
     AnalysisRepository,
+    DiagnosticsCacheRepository,
     EffectivenessRepository,
 )
 
@@ -30,6 +32,13 @@ DEFAULT_TRUSTED_DOMAINS = [
 
 TRUSTED_DOMAINS_FILENAME = "diagnostics_trusted_domains.json"
 
+_WHITESPACE_RE = re.compile(r"\s+")
+_URL_SCHEME_RE = re.compile(r"^https?://")
+_TOKEN_SPLIT_RE = re.compile(r"[^\w]+")
+
+# Combined Tavily + internal results; bounded by the fresher of the two sources.
+DIAG_CACHE_TTL_S = 900
+
 STOPWORDS = {
     "a",
     "an",
@@ -63,7 +72,7 @@ STOPWORDS = {
 }
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Source:
     title: str
     url: str
@@ -71,7 +80,7 @@ class Source:
     snippet: str | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class InternalHit:
     record_type: str
     record_id: str
@@ -123,10 +132,11 @@ def build_query_context(inputs: dict[str, Any]) -> dict[str, Any]:
     flags = [flag for flag in inputs.get("flags") or [] if flag]
     since_when = inputs.get("since_when")
 
+    if isinstance(since_when, date):
+        since_when = since_when.isoformat()
+
     query_parts = [area, defect_type, symptom, project_name, " ".join(flags)]
     query_text = " ".join([part for part in query_parts if part]).strip()
-    normalized = re.sub(r"\s+", " ", query_text.lower())
-    context_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
 
     return {
         "area": area,
@@ -135,13 +145,41 @@ def build_query_context(inputs: dict[str, Any]) -> dict[str, Any]:
         "project_name": project_name,
         "work_centers": work_centers,
         "flags": flags,
-        "since_when": since_when.isoformat() if isinstance(since_when, date) else since_when,
+        "since_when": since_when,
         "query_text": query_text,
-        "context_hash": context_hash,
+        "context_hash": _context_hash(
+            area, defect_type, symptom, project_name, work_centers, flags, since_when
+        ),
         "is_injection": area.lower() == "wtrysk",
     }
 
 
+def _context_hash(
+    area: str,
+    defect_type: str,
+    symptom: str,
+    project_name: str,
+    work_centers: list[str],
+    flags: list[str],
+    since_when: str | None,
+) -> str:
+    """Stable cache key for a query context (canonical JSON of normalized inputs)."""
+    canonical = json.dumps(
+        [
+            area.lower(),
+            defect_type.lower(),
+            _WHITESPACE_RE.sub(" ", symptom.lower()),
+            project_name.lower(),
+            sorted(str(wc).lower() for wc in work_centers),
+            sorted(str(flag).lower() for flag in flags),
+            since_when or "",
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=8).hexdigest()
+
+
 def build_search_queries(context: dict[str, Any]) -> list[str]:
     area = context.get("area") or ""
     defect_type = context.get("defect_type") or ""
@@ -347,6 +385,54 @@ def synthesize_answer(
     }
 
 
+def cache_key(kind: str, context_hash: str, *parts: Any) -> str:
+    raw = json.dumps([kind, context_hash, *parts], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def fetch_all(
+    con: Any,
+    context: dict[str, Any],
+    allowlist: list[str],
+    tavily_key: str,
+    limit: int = 6,
+) -> dict[str, Any]:
+    """
+    Tavily search and internal retrieval for one context, cached as a single entry.
+    Tavily (HTTP-bound) runs on a worker thread while SQLite retrieval runs here.
+    """
+    queries = build_search_queries(context) if tavily_key else []
+    key = cache_key("combined", context["context_hash"], sorted(queries), list(allowlist))
+    cache = DiagnosticsCacheRepository(con)
+    cached = cache.get(key, DIAG_CACHE_TTL_S)
+    if cached is not None:
+        return cached
+
+    sources: list[dict[str, Any]] = []
+    tavily_error: str | None = None
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = (
+            pool.submit(tavily_search_from_queries, queries, allowlist, tavily_key, limit)
+            if tavily_key
+            else None
+        )
+        hits = internal_retrieval(con, context, limit=limit)
+        if future is not None:
+            try:
+                sources = serialize_sources(future.result())
+            except Exception as exc:
+                tavily_error = str(exc)
+
+    result = {
+        "sources": sources,
+        "internal_hits": serialize_internal_hits(hits),
+        "tavily_error": tavily_error,
+    }
+    if tavily_error is None:
+        cache.put(key, "combined", result, DIAG_CACHE_TTL_S)
+    return result
+
+
 def serialize_sources(sources: list[Source]) -> list[dict[str, Any]]:
     return [asdict(source) for source in sources]
 
@@ -355,13 +441,21 @@ def serialize_internal_hits(hits: list[InternalHit]) -> list[dict[str, Any]]:
     return [asdict(hit) for hit in hits]
 
 
+def deserialize_sources(rows: list[dict[str, Any]]) -> list[Source]:
+    return [Source(**row) for row in rows]
+
+
+def deserialize_internal_hits(rows: list[dict[str, Any]]) -> list[InternalHit]:
+    return [InternalHit(**row) for row in rows]
+
+
 def _normalize_domains(domains: list[str]) -> list[str]:
     cleaned: list[str] = []
     for domain in domains:
         if not domain:
             continue
         value = str(domain).strip().lower()
-        value = re.sub(r"^https?://", "", value)
+        value = _URL_SCHEME_RE.sub("", value)
         value = value.split("/")[0]
         if value and value not in cleaned:
             cleaned.append(value)
@@ -438,7 +532,7 @@ def _extract_domain(url: str) -> str:
 def _tokenize(text: str) -> list[str]:
     if not text:
         return []
-    tokens = re.split(r"[^\w]+", text.lower())
+    tokens = _TOKEN_SPLIT_RE.split(text.lower())
     return [t for t in tokens if len(t) > 1 and t not in STOPWORDS]
 
 
@@ -468,7 +562,7 @@ def _tfidf_score(query_terms: list[str], doc_terms: list[str], idf: dict[str, fl
 
 
 def _make_snippet(text: str, max_len: int = 220) -> str:
-    return _truncate(re.sub(r"\s+", " ", text).strip(), max_len)
+    return _truncate(_WHITESPACE_RE.sub(" ", text).strip(), max_len)
 
 
 def _truncate(text: str, max_len: int) -> str:
@@ -2,12 +2,17 @@ from __future__ import annotations
 
 from collections import defaultdict
 from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
 import re
 from typing import Any
 
 from action_tracking.services.kpi_delta import compute_kpi_pp_delta, compute_scrap_delta
 
 
+# normalize_wc and parse_work_centers run for every project/row on each rerun
+# with a small set of distinct inputs, so both are memoized. Arguments must
+# stay hashable (strings or None).
+@lru_cache(maxsize=4096)
 def normalize_wc(value: str | None) -> str:
     if not value:
         return ""
@@ -31,20 +36,26 @@ def parse_date(value: Any) -> date | None:
 
 
 def parse_work_centers(primary: str | None, related: str | None) -> list[str]:
-    centers: list[str] = []
+    """Fresh list per call; the memoized result is an immutable tuple."""
+    return list(_parse_work_centers(primary, related))
+
+
+@lru_cache(maxsize=4096)
+def _parse_work_centers(primary: str | None, related: str | None) -> tuple[str, ...]:
+    centers: dict[str, None] = {}
 
     primary_value = normalize_wc(primary)
     if primary_value:
-        centers.append(primary_value)
+        centers[primary_value] = None
 
     if related:
         tokens = re.split(r"[,;|\n]+", related)
         for token in tokens:
             center = normalize_wc(token)
-            if center and center not in centers:
-                centers.append(center)
+            if center:
+                centers.setdefault(center, None)
 
-    return centers
+    return tuple(centers)
 
 
 def suggest_work_centers(
@@ -4,8 +4,14 @@ from collections import defaultdict
 from datetime import date, datetime, timedelta
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
+from action_tracking.services.production_outcome import weighted_group_mean
+
+# Fewest production days (after weekend filters) that still yield a window.
+MIN_WINDOW_DAYS = 8
+
 
 def compute_project_kpi_windows(
     scrap_rows: list[dict[str, Any]],
@@ -84,6 +90,143 @@ def compute_project_kpi_windows(
     }
 
 
+def compute_project_kpi_windows_bulk(
+    project_keys: list[str],
+    scrap_columns: dict[str, tuple[Any, ...]],
+    kpi_columns: dict[str, tuple[Any, ...]],
+    remove_sat: bool,
+    remove_sun: bool,
+    current_days_target: int = 14,
+    baseline_cap_days: int = 90,
+    searchback_calendar_days: int = 180,
+) -> dict[str, dict[str, Any]]:
+    """
+    compute_project_kpi_windows for many projects at once. Inputs are the
+    column-wise rows of ProductionDataRepository.*_by_project_columns (with a
+    full_project column); they go straight into one long frame and windows are
+    picked from per-project day ranks, so there is no Python pass per row.
+    """
+    results = {key: _insufficient_data_payload() for key in project_keys}
+    daily = _daily_metrics_frame(scrap_columns, kpi_columns)
+    if remove_sat or remove_sun:
+        # 1970-01-01 (day 0) was a Thursday, so Monday == 0 after the +3 shift.
+        weekday = (daily["day_num"].to_numpy() + 3) % 7
+        keep = np.ones(len(daily), dtype=bool)
+        if remove_sat:
+            keep &= weekday != 5
+        if remove_sun:
+            keep &= weekday != 6
+        daily = daily.loc[keep]
+    if daily.empty:
+        return results
+
+    projects = daily.groupby("full_project", sort=False)
+    if searchback_calendar_days:
+        cutoff = projects["day_num"].transform("max").to_numpy() - (searchback_calendar_days - 1)
+        daily = daily.loc[daily["day_num"].to_numpy() >= cutoff]
+        projects = daily.groupby("full_project", sort=False)
+
+    # Same branches as _select_window_days, expressed on ranks counted from the last day.
+    day_count = projects["day_num"].transform("size").to_numpy()
+    rank_from_end = projects.cumcount(ascending=False).to_numpy()
+    full_window = day_count >= current_days_target * 2
+    current_len = np.select([full_window, day_count >= 14], [current_days_target, 7], 4)
+    baseline_len = np.select(
+        [full_window, day_count >= 14],
+        [np.minimum(baseline_cap_days, day_count - current_days_target), 7],
+        4,
+    )
+    enough = day_count >= MIN_WINDOW_DAYS
+    in_current = enough & (rank_from_end < current_len)
+    in_baseline = enough & (rank_from_end >= current_len) & (rank_from_end < current_len + baseline_len)
+
+    current = _window_summary(daily.loc[in_current])
+    baseline = _window_summary(daily.loc[in_baseline])
+    for key in current.index.intersection(baseline.index):
+        cur = current.loc[key]
+        base = baseline.loc[key]
+        results[key] = {
+            "status": "ok",
+            "window": {
+                "current_days": int(cur["days"]),
+                "baseline_days": int(base["days"]),
+                "current_from": cur["day_from"].date().isoformat(),
+                "current_to": cur["day_to"].date().isoformat(),
+                "baseline_from": base["day_from"].date().isoformat(),
+                "baseline_to": base["day_to"].date().isoformat(),
+            },
+            "metrics": {
+                "scrap_qty": _scrap_metric_payload(_or_none(cur["scrap_qty"]), _or_none(base["scrap_qty"])),
+                "scrap_pln": _scrap_metric_payload(_or_none(cur["scrap_pln"]), _or_none(base["scrap_pln"])),
+                "oee": _kpi_metric_payload(_or_none(cur["oee"]), _or_none(base["oee"])),
+                "performance": _kpi_metric_payload(
+                    _or_none(cur["performance"]), _or_none(base["performance"])
+                ),
+            },
+        }
+    return results
+
+
+_DAILY_METRICS = ("scrap_qty", "scrap_pln", "oee", "performance")
+
+
+def _daily_metrics_frame(
+    scrap_columns: dict[str, tuple[Any, ...]],
+    kpi_columns: dict[str, tuple[Any, ...]],
+) -> pd.DataFrame:
+    """One row per (project, day) with any value, ordered by project and day."""
+    scrap = _long_frame(scrap_columns, ("scrap_qty", "scrap_cost_amount"))
+    scrap_daily = (
+        scrap.assign(
+            scrap_qty=pd.to_numeric(scrap["scrap_qty"], errors="coerce").fillna(0.0),
+            scrap_pln=pd.to_numeric(scrap["scrap_cost_amount"], errors="coerce").fillna(0.0),
+        )
+        .groupby(["full_project", "day"])[["scrap_qty", "scrap_pln"]]
+        .sum()
+    )
+
+    kpi = _long_frame(kpi_columns, ("worktime_min", "oee_pct", "performance_pct"))
+    kpi = kpi.assign(
+        worktime_min=pd.to_numeric(kpi["worktime_min"], errors="coerce").clip(lower=0),
+        oee_pct=pd.to_numeric(kpi["oee_pct"], errors="coerce"),
+        performance_pct=pd.to_numeric(kpi["performance_pct"], errors="coerce"),
+    )
+    kpi = kpi.loc[kpi["oee_pct"].notna() | kpi["performance_pct"].notna()]
+    kpi_daily = weighted_group_mean(
+        kpi,
+        ["full_project", "day"],
+        {"oee_pct": "oee", "performance_pct": "performance"},
+    ).set_index(["full_project", "day"])
+
+    daily = scrap_daily.join(kpi_daily, how="outer").reindex(columns=list(_DAILY_METRICS))
+    daily = daily.reset_index().sort_values(["full_project", "day"], kind="stable")
+    # Integer day numbers (days since epoch) for the weekday/cutoff arithmetic.
+    daily["day_num"] = daily["day"].to_numpy().astype("datetime64[D]").view("i8")
+    return daily
+
+
+def _long_frame(columns: dict[str, tuple[Any, ...]], value_columns: tuple[str, ...]) -> pd.DataFrame:
+    frame = pd.DataFrame(
+        {name: columns.get(name, ()) for name in ("full_project", "metric_date", *value_columns)}
+    )
+    # metric_date comes as date(metric_date) from SQL, so it is always a plain YYYY-MM-DD.
+    frame["day"] = pd.to_datetime(frame.pop("metric_date"), format="%Y-%m-%d", errors="coerce")
+    return frame.loc[frame["day"].notna()]
+
+
+def _window_summary(frame: pd.DataFrame) -> pd.DataFrame:
+    grouped = frame.groupby("full_project")
+    summary = grouped[list(_DAILY_METRICS)].mean()
+    summary["days"] = grouped["day"].size()
+    summary["day_from"] = grouped["day"].min()
+    summary["day_to"] = grouped["day"].max()
+    return summary
+
+
+def _or_none(value: Any) -> float | None:
+    return None if pd.isna(value) else float(value)
+
+
 def _aggregate_scrap_daily(
     rows: list[dict[str, Any]],
 ) -> tuple[dict[date, float], dict[date, float]]:
@@ -158,7 +301,7 @@ def _select_window_days(
     current_days_target: int,
     baseline_cap_days: int,
 ) -> tuple[list[date], list[date]]:
-    if len(available_days) < 8:
+    if len(available_days) < MIN_WINDOW_DAYS:
         return [], []
     if len(available_days) >= current_days_target * 2:
         current_days = available_days[-current_days_target:]
@@ -168,7 +311,7 @@ def _select_window_days(
     if len(available_days) >= 14:
         window_days = available_days[-14:]
         return window_days[:7], window_days[7:]
-    window_days = available_days[-8:]
+    window_days = available_days[-MIN_WINDOW_DAYS:]
     return window_days[:4], window_days[4:]
 
 
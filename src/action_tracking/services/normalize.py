@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 
 
+# Cached: the same category/work-center labels are normalized over and over.
+# Arguments must stay hashable (strings or None).
+@lru_cache(maxsize=4096)
 def normalize_key(value: str | None) -> str:
     if not value:
         return ""
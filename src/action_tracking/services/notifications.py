@@ -7,12 +7,11 @@ def _parse_date(value: str | None) -> date | None:
     if not value:
         return None
     try:
+        if len(value) > 10:
+            return datetime.fromisoformat(value).date()
         return date.fromisoformat(value)
     except ValueError:
-        try:
-            return datetime.fromisoformat(value).date()
-        except ValueError:
-            return None
+        return None
 
 
 def _format_action_line(action: dict[str, str], today: date) -> str:
@@ -3,6 +3,7 @@ from __future__ import annotations
 from datetime import date, timedelta
 from typing import Any
 
+import numpy as np
 import pandas as pd
 
 from action_tracking.services.kpi_delta import compute_kpi_pp_delta, compute_scrap_delta
@@ -26,19 +27,70 @@ def apply_weekend_filter(
     remove_sat: bool,
     remove_sun: bool,
 ) -> pd.DataFrame:
-    if df.empty or "metric_date" not in df.columns:
+    if df.empty or "metric_date" not in df.columns or not (remove_sat or remove_sun):
         return df
-    temp = df.copy()
-    if not pd.api.types.is_datetime64_any_dtype(temp["metric_date"]):
-        temp["metric_date"] = pd.to_datetime(temp["metric_date"], errors="coerce")
-    temp = temp.dropna(subset=["metric_date"])
-    weekday = temp["metric_date"].dt.weekday
-    mask = pd.Series(True, index=temp.index)
+    dates = df["metric_date"]
+    if not pd.api.types.is_datetime64_any_dtype(dates):
+        dates = pd.to_datetime(dates, errors="coerce")
+    # Boolean mask over NumPy arrays; the frame itself is not copied.
+    weekday = dates.dt.weekday.to_numpy()
+    mask = dates.notna().to_numpy()
     if remove_sat:
         mask &= weekday != 5
     if remove_sun:
         mask &= weekday != 6
-    return temp.loc[mask]
+    return df.loc[mask]
+
+
+def sorted_group_sum(
+    df: pd.DataFrame,
+    group_col: str,
+    columns: dict[str, str],
+) -> pd.DataFrame:
+    """
+    Per-group sums (renamed via columns) for a frame ordered by group_col, as
+    returned by the daily queries (ORDER BY metric_date). Uses run boundaries
+    and np.add.reduceat instead of a hash groupby; missing values count as 0.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=[group_col, *columns.values()])
+    if not df[group_col].is_monotonic_increasing:
+        df = df.sort_values(group_col, kind="stable")
+    keys = df[group_col].to_numpy()
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    result = {group_col: keys[starts]}
+    for value_col, out_col in columns.items():
+        result[out_col] = np.add.reduceat(df[value_col].fillna(0).to_numpy(), starts)
+    return pd.DataFrame(result)
+
+
+def weighted_group_mean(
+    df: pd.DataFrame,
+    group_col: str | list[str],
+    columns: dict[str, str],
+    weight_col: str = "worktime_min",
+) -> pd.DataFrame:
+    """
+    Per-group weighted average of each value column (renamed via columns).
+    Rows with a missing value do not contribute weight; groups without any
+    positive weight fall back to the plain mean. Vectorized (no groupby.apply).
+    """
+    group_cols = [group_col] if isinstance(group_col, str) else list(group_col)
+    keys = [df[col] for col in group_cols]
+    value_cols = list(columns)
+    means = df.groupby(keys)[value_cols].mean()
+    if weight_col not in df.columns:
+        return means.rename(columns=columns).reset_index().sort_values(group_cols)
+    weights = pd.to_numeric(df[weight_col], errors="coerce").fillna(0)
+    result = pd.DataFrame(index=means.index)
+    for value_col, out_col in columns.items():
+        values = df[value_col]
+        valid_weights = weights.where(values.notna(), 0)
+        numerator = (values.fillna(0) * valid_weights).groupby(keys).sum()
+        denominator = valid_weights.groupby(keys).sum()
+        result[out_col] = (numerator / denominator.where(denominator > 0)).fillna(means[value_col])
+    result.index.names = group_cols
+    return result.reset_index().sort_values(group_cols)
 
 
 def load_daily_frames(
@@ -75,10 +127,10 @@ def load_daily_frames(
     if not scrap_df.empty:
         scrap_df["metric_date"] = pd.to_datetime(scrap_df["metric_date"], errors="coerce")
         scrap_df = scrap_df.dropna(subset=["metric_date"])
-        scrap_daily = (
-            scrap_df.groupby("metric_date", as_index=False)
-            .agg(scrap_qty_sum=("scrap_qty", "sum"), scrap_pln_sum=("scrap_cost_amount", "sum"))
-            .sort_values("metric_date")
+        scrap_daily = sorted_group_sum(
+            scrap_df,
+            "metric_date",
+            {"scrap_qty": "scrap_qty_sum", "scrap_cost_amount": "scrap_pln_sum"},
         )
     else:
         scrap_daily = pd.DataFrame(columns=["metric_date", "scrap_qty_sum", "scrap_pln_sum"])
@@ -94,20 +146,10 @@ def load_daily_frames(
     if not kpi_df.empty:
         kpi_df["metric_date"] = pd.to_datetime(kpi_df["metric_date"], errors="coerce")
         kpi_df = kpi_df.dropna(subset=["metric_date"])
-        kpi_daily = (
-            kpi_df.groupby("metric_date")
-            .apply(
-                lambda group: pd.Series(
-                    {
-                        "oee_avg": _weighted_or_mean(group["oee_pct"], group.get("worktime_min")),
-                        "performance_avg": _weighted_or_mean(
-                            group["performance_pct"], group.get("worktime_min")
-                        ),
-                    }
-                )
-            )
-            .reset_index()
-            .sort_values("metric_date")
+        kpi_daily = weighted_group_mean(
+            kpi_df,
+            "metric_date",
+            {"oee_pct": "oee_avg", "performance_pct": "performance_avg"},
         )
     else:
         kpi_daily = pd.DataFrame(columns=["metric_date", "oee_avg", "performance_avg"])
@@ -331,19 +373,6 @@ def _mean_or_none(series: pd.Series | None) -> float | None:
     return float(value)
 
 
-def _weighted_or_mean(values: pd.Series, weights: pd.Series | None) -> float | None:
-    if values.empty:
-        return None
-    if weights is None or weights.empty:
-        return _mean_or_none(values)
-    weights = weights.fillna(0)
-    valid_weights = weights.where(values.notna(), 0)
-    if valid_weights.sum() > 0:
-        weighted_values = values.fillna(0) * weights
-        return float(weighted_values.sum() / valid_weights.sum())
-    return _mean_or_none(values)
-
-
 def _as_percent_series(series: pd.Series) -> tuple[pd.Series, str]:
     if series.empty:
         return series, "unknown"
@@ -0,0 +1,52 @@
+import sys
+import unittest
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from action_tracking.services.action_dates import parse_date_column
+
+
+def _parsed(values: list) -> list:
+    result = parse_date_column(pd.Series(values, dtype=object))
+    return [None if pd.isna(value) else value.date() for value in result]
+
+
+class ParseDateColumnTests(unittest.TestCase):
+    def test_matches_fromisoformat_semantics(self) -> None:
+        self.assertEqual(
+            _parsed(
+                [
+                    "2024-01-05",
+                    "2024-01-05 08:30:00",
+                    "2024-01-05T08:30:00+02:00",
+                    "20240105",
+                    date(2024, 1, 6),
+                    datetime(2024, 1, 7, 12, 0),
+                ]
+            ),
+            [
+                date(2024, 1, 5),
+                date(2024, 1, 5),
+                date(2024, 1, 5),
+                date(2024, 1, 5),
+                date(2024, 1, 6),
+                date(2024, 1, 7),
+            ],
+        )
+
+    def test_rejects_trailing_garbage_and_invalid_dates(self) -> None:
+        self.assertEqual(
+            _parsed(["2024-01-05garbage", "2024-01-05 xx", "2024-13-01", "bad", "", None]),
+            [None] * 6,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
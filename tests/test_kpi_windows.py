@@ -0,0 +1,71 @@
+import sys
+import unittest
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from action_tracking.services.kpi_windows import (
+    compute_project_kpi_windows,
+    compute_project_kpi_windows_bulk,
+)
+
+
+def _rows(days: int, offset: int) -> tuple[list[dict], list[dict]]:
+    start = date(2024, 1, 1)
+    scrap_rows = []
+    kpi_rows = []
+    for idx in range(days):
+        metric_date = (start + timedelta(days=idx)).isoformat()
+        scrap_rows.append(
+            {"metric_date": metric_date, "scrap_qty": (idx * 7 + offset) % 11, "scrap_cost_amount": idx * 1.5}
+        )
+        kpi_rows.append(
+            {
+                "metric_date": metric_date,
+                "worktime_min": 0 if idx % 5 == 0 else 100 + idx,
+                "oee_pct": 60 + (idx + offset) % 9,
+                "performance_pct": None if idx % 4 == 0 else 80 + idx % 7,
+            }
+        )
+        kpi_rows.append(
+            {"metric_date": metric_date, "worktime_min": 50, "oee_pct": 70.0, "performance_pct": 90.0}
+        )
+    return scrap_rows, kpi_rows
+
+
+def _columns(rows_by_project: dict[str, list[dict]]) -> dict[str, tuple]:
+    rows = [{"full_project": key, **row} for key, project_rows in rows_by_project.items() for row in project_rows]
+    names = {name for row in rows for name in row}
+    return {name: tuple(row.get(name) for row in rows) for name in names}
+
+
+class KpiWindowsBulkTests(unittest.TestCase):
+    def test_bulk_matches_per_project(self) -> None:
+        inputs = {"P1": _rows(60, 1), "P2": _rows(20, 3), "P3": _rows(10, 5), "P4": _rows(5, 0)}
+        for remove_sat, remove_sun in ((False, False), (True, True)):
+            bulk = compute_project_kpi_windows_bulk(
+                [*inputs, "P5"],
+                _columns({key: scrap for key, (scrap, _) in inputs.items()}),
+                _columns({key: kpi for key, (_, kpi) in inputs.items()}),
+                remove_sat,
+                remove_sun,
+            )
+            for key, (scrap_rows, kpi_rows) in inputs.items():
+                expected = compute_project_kpi_windows(scrap_rows, kpi_rows, remove_sat, remove_sun)
+                self.assertEqual(bulk[key]["status"], expected["status"])
+                self.assertEqual(bulk[key]["window"], expected["window"])
+                for metric, payload in expected["metrics"].items():
+                    for field, value in payload.items():
+                        if value is None:
+                            self.assertIsNone(bulk[key]["metrics"][metric][field])
+                        else:
+                            self.assertAlmostEqual(bulk[key]["metrics"][metric][field], value)
+            self.assertEqual(bulk["P5"]["status"], "insufficient_data")
+
+
+if __name__ == "__main__":
+    unittest.main()
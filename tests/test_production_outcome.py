@@ -0,0 +1,35 @@
+import sys
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from action_tracking.services.production_outcome import sorted_group_sum
+
+
+class SortedGroupSumTests(unittest.TestCase):
+    def test_matches_groupby_sum(self) -> None:
+        df = pd.DataFrame(
+            {
+                "metric_date": ["2024-01-02", "2024-01-01", "2024-01-02", "2024-01-01"],
+                "scrap_qty": [1.0, 2.0, None, 4.0],
+            }
+        )
+        result = sorted_group_sum(df, "metric_date", {"scrap_qty": "scrap_sum"})
+        self.assertEqual(result["metric_date"].tolist(), ["2024-01-01", "2024-01-02"])
+        self.assertEqual(result["scrap_sum"].tolist(), [6.0, 1.0])
+
+    def test_empty_frame_returns_empty_result(self) -> None:
+        df = pd.DataFrame({"metric_date": [], "scrap_qty": []})
+        result = sorted_group_sum(df, "metric_date", {"scrap_qty": "scrap_sum"})
+        self.assertTrue(result.empty)
+        self.assertEqual(list(result.columns), ["metric_date", "scrap_sum"])
+
+
+if __name__ == "__main__":
+    unittest.main()
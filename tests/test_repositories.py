@@ -0,0 +1,192 @@
+import sqlite3
+import sys
+import tempfile
+import unittest
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+SRC = ROOT / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from action_tracking.data.db import connect, database_fingerprint, init_db, run_read_queries
+from action_tracking.data.repositories import (
+    ActionRepository,
+    ChampionRepository,
+    DiagnosticsCacheRepository,
+    ProjectRepository,
+)
+
+
+def _memory_connection() -> sqlite3.Connection:
+    con = sqlite3.connect(":memory:")
+    con.row_factory = sqlite3.Row
+    init_db(con)
+    return con
+
+
+class ChampionRepositoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.con = _memory_connection()
+        self.repo = ChampionRepository(self.con)
+        self.project_repo = ProjectRepository(self.con)
+
+    def tearDown(self) -> None:
+        self.con.close()
+
+    def test_project_type_counts_bulk_uses_owner_fallback(self) -> None:
+        assigned = self.repo.create_champion({"first_name": "Anna", "last_name": "Nowak"})
+        owner = self.repo.create_champion({"first_name": "Jan", "last_name": "Kowalski"})
+        sl_project = self.project_repo.create_project(
+            {"name": "P1", "type": " sl", "work_center": "WC1", "owner_champion_id": owner}
+        )
+        custom_project = self.project_repo.create_project(
+            {"name": "P2", "type": "custom", "work_center": "WC2"}
+        )
+        self.repo.set_assigned_projects(assigned, [sl_project, custom_project])
+
+        counts = self.repo.get_project_type_counts_bulk()
+
+        self.assertEqual(counts[assigned], {"SL": 1, "RL": 0, "FL": 0, "Other": 1})
+        self.assertEqual(counts[owner], {"SL": 1, "RL": 0, "FL": 0, "Other": 0})
+
+    def test_save_with_assignments_creates_and_updates(self) -> None:
+        first = self.project_repo.create_project({"name": "P1", "work_center": "WC1"})
+        second = self.project_repo.create_project({"name": "P2", "work_center": "WC2"})
+
+        champion_id = self.repo.save_with_assignments(
+            None, {"first_name": "Anna", "last_name": "Nowak"}, [first, first]
+        )
+        self.assertEqual(self.repo.get_assigned_projects(champion_id), [first])
+
+        self.repo.save_with_assignments(champion_id, {"position": "PE"}, [second])
+        champion = self.repo.list_champions()[0]
+        self.assertEqual(champion["position"], "PE")
+        self.assertEqual(champion["first_name"], "Anna")
+        self.assertEqual(self.repo.get_assigned_projects(champion_id), [second])
+
+
+class ActionRankingAggregateTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.con = _memory_connection()
+        self.repo = ActionRepository(self.con)
+        self.con.execute("INSERT INTO champions (id, name) VALUES ('c1', 'Anna')")
+        self.con.executemany(
+            """
+            INSERT INTO actions (
+              id, title, owner_champion_id, project_id, status, created_at, closed_at,
+              due_date, category, manual_savings_amount, manual_savings_currency
+            ) VALUES (?, 't', ?, NULL, ?, ?, ?, ?, 'Cost savings', ?, ?)
+            """,
+            [
+                ("a1", "c1", "open", "2025-05-01", None, "2025-05-10", None, None),
+                ("a2", "c1", "done", "2025-04-01", "2025-04-11", "2025-04-20", 100.0, "PLN"),
+                ("a3", "c1", "done", "2025-04-01", "2025-05-01", "2025-04-20", None, None),
+                ("a4", "c1", "cancelled", "2025-04-01", None, None, None, None),
+                ("a5", None, "open", "2025-05-01", None, None, None, None),
+            ],
+        )
+
+    def tearDown(self) -> None:
+        self.con.close()
+
+    def test_aggregate_for_ranking_counts_window(self) -> None:
+        rows = self.repo.aggregate_for_ranking(
+            date_from=date(2025, 3, 1), date_to=date(2025, 6, 1), today=date(2025, 6, 1)
+        )
+
+        self.assertEqual(len(rows), 1)
+        row = rows[0]
+        self.assertEqual(row["champion_key"], "c1")
+        self.assertEqual(row["actions_total"], 3)
+        self.assertEqual(row["open_now"], 1)
+        self.assertEqual(row["overdue_now"], 1)
+        self.assertEqual(row["closed_in_window"], 2)
+        self.assertEqual(row["closed_on_time"], 1)
+        self.assertEqual(row["impact_pln_manual"], 100.0)
+        self.assertEqual(row["manual_missing"], 1)
+        durations = self.repo.list_ranking_durations(
+            date_from=date(2025, 3, 1), date_to=date(2025, 6, 1)
+        )
+        self.assertEqual(sorted(durations), [("c1", 10), ("c1", 30)])
+
+    def test_aggregate_for_ranking_includes_unassigned(self) -> None:
+        rows = self.repo.aggregate_for_ranking(today=date(2025, 6, 1), include_unassigned=True)
+        self.assertEqual({row["champion_key"] for row in rows}, {"c1", "unassigned"})
+
+
+class DiagnosticsCacheRepositoryTests(unittest.TestCase):
+    def setUp(self) -> None:
+        self.con = _memory_connection()
+        self.repo = DiagnosticsCacheRepository(self.con)
+
+    def tearDown(self) -> None:
+        self.con.close()
+
+    def test_roundtrip_and_expiry(self) -> None:
+        payload = [{"title": "Short shot", "snippet": "ciśnienie wtrysku " * 50}]
+        self.repo.put("k1", "tavily", payload, max_age_s=60)
+
+        self.assertEqual(self.repo.get("k1", max_age_s=60), payload)
+        self.assertIsNone(self.repo.get("k1", max_age_s=-1))
+        self.assertIsNone(self.repo.get("missing", max_age_s=60))
+
+    def test_put_purges_expired_entries(self) -> None:
+        self.con.execute(
+            "INSERT INTO diag_cache (key, kind, payload, created_at) VALUES ('old', 'tavily', x'00', 0)"
+        )
+        self.repo.put("new", "tavily", {"ok": True}, max_age_s=60)
+
+        keys = [row[0] for row in self.con.execute("SELECT key FROM diag_cache")]
+        self.assertEqual(keys, ["new"])
+
+    def test_put_on_file_database_writes_through_own_connection(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            con = connect(Path(tmp) / "app.db")
+            try:
+                init_db(con)
+                before = con.total_changes
+                DiagnosticsCacheRepository(con).put("k1", "tavily", [1, 2], max_age_s=60)
+
+                self.assertEqual(con.total_changes, before)
+                self.assertEqual(DiagnosticsCacheRepository(con).get("k1", max_age_s=60), [1, 2])
+            finally:
+                con.close()
+
+
+class DatabaseFingerprintTests(unittest.TestCase):
+    def test_in_memory_fingerprint_changes_after_write(self) -> None:
+        con = _memory_connection()
+        try:
+            before = database_fingerprint(con)
+            ChampionRepository(con).create_champion({"first_name": "Anna", "last_name": "Nowak"})
+
+            self.assertIsNotNone(before)
+            self.assertNotEqual(database_fingerprint(con), before)
+        finally:
+            con.close()
+
+
+class RunReadQueriesTests(unittest.TestCase):
+    def test_file_and_memory_databases_return_query_results_in_order(self) -> None:
+        queries = (
+            lambda repo: [row["first_name"] for row in repo.list_champions()],
+            lambda repo: len(repo.list_champions()),
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            file_con = connect(Path(tmp) / "app.db")
+            memory_con = _memory_connection()
+            try:
+                for con in (file_con, memory_con):
+                    init_db(con)
+                    ChampionRepository(con).create_champion({"first_name": "Anna", "last_name": "Nowak"})
+
+                    self.assertEqual(run_read_queries(con, ChampionRepository, queries), (["Anna"], 1))
+            finally:
+                file_con.close()
+                memory_con.close()
+
+
+if __name__ == "__main__":
+    unittest.main()